@@ -29,8 +29,10 @@ Classes
     :toctree: generated/
 
     Binding
+    Network
     Solvation
 """
 
 from ._binding import *
+from ._network import *
 from ._solvation import *
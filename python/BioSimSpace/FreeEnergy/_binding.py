@@ -41,7 +41,10 @@ class Binding(_free_energy.FreeEnergy):
     """A class for configuring and running binding free energy simulations."""
 
     def __init__(self, system, protocol=None, box=None, free_leg=True,
-            work_dir=None, engine=None, property_map={}):
+            work_dir=None, engine=None, chain_lambda=False,
+            chain_runtime=_Types.Time(20, "picosecond"), replica_exchange=False,
+            exchange_frequency=1000, free_system=None, concurrent_legs=False,
+            core_split=None, num_cores=None, chain_workers=None, property_map={}):
         """Constructor.
 
            Parameters
@@ -70,6 +73,52 @@ class Binding(_free_energy.FreeEnergy):
                options are "GROMACS", or "SOMD". If this argument is omitted then
                BioSimSpace will choose an appropriate engine for you.
 
+           chain_lambda : bool
+               Whether to seed each lambda window from the final configuration
+               of a short equilibration at the neighbouring lambda value.
+
+           chain_runtime : :class:`Time <BioSimSpace.Types.Time>`
+               The running time of the short equilibration used to seed each
+               lambda window when 'chain_lambda' is True.
+
+           replica_exchange : bool
+               Whether to run the lambda windows of each leg as a single
+               Hamiltonian replica exchange simulation. Only supported by
+               the "GROMACS" engine.
+
+           exchange_frequency : int
+               The number of integration steps between replica exchange
+               attempts.
+
+           free_system : :class:`System <BioSimSpace._SireWrappers.System>`
+               A pre-solvated system containing the perturbable molecule, to be
+               used for the "free" leg of the simulation. If None, then the
+               perturbable molecule is extracted from the bound system and
+               solvated using the 'box' size.
+
+           concurrent_legs : bool
+               Whether to run the bound and free legs concurrently, rather than
+               running the free leg after the bound leg has finished. Each leg
+               is analysed as soon as it completes.
+
+           core_split : float
+               The fraction of the available cores assigned to the bound leg
+               when running the legs concurrently. If None, then the cores are
+               split in proportion to the number of atoms in each leg. (Only
+               used by the "GROMACS" engine.)
+
+           num_cores : int
+               The total number of cores shared by the concurrent legs, or by
+               the equilibration and production simulations when
+               'chain_lambda' is True. If None, then all of the cores on the
+               machine are used.
+
+           chain_workers : int
+               The maximum number of production simulations that can run at
+               the same time as the equilibration when 'chain_lambda' is True.
+               If None, then the number of workers is chosen so that each
+               simulation is assigned around four cores.
+
            property_map : dict
                A dictionary that maps system "properties" to their user defined
                values. This allows the user to refer to properties with their
@@ -77,7 +126,9 @@ class Binding(_free_energy.FreeEnergy):
         """
 
         # Call the base class constructor.
-        super().__init__(protocol, work_dir, engine)
+        super().__init__(protocol, work_dir, engine, chain_lambda, chain_runtime,
+                         replica_exchange, exchange_frequency, concurrent_legs,
+                         core_split, num_cores, chain_workers)
 
         # Validate the input.
 
@@ -140,14 +191,31 @@ class Binding(_free_energy.FreeEnergy):
                 # Warn the user that we've guessed the water topology.
                 _warnings.warn("Guessed water topology: %r" % water_model)
 
+            # Use the user specified free leg system.
+            if free_system is not None:
+                if type(free_system) is not _System:
+                    raise TypeError("'free_system' must be of type 'BioSimSpace._SireWrappers.System'")
+
+                # The system must have a single perturbable molecule.
+                if free_system.nPerturbableMolecules() != 1:
+                    raise ValueError("'free_system' must contain a single perturbable molecule!")
+
+                # The system must be solvated.
+                if free_system.nWaterMolecules() == 0:
+                    raise ValueError("'free_system' must be solvated!")
+
+                # Store a copy of the free system. (Used for the second leg.)
+                self._system1 = free_system.copy()
+
             # Solvate the perturbable molecule using the same water model as
             # the original system. (This is used for the second leg.)
-            self._system1 = _Solvent.solvate(water_model, molecule=molecule, box=box)
+            else:
+                self._system1 = _Solvent.solvate(water_model, molecule=molecule, box=box)
 
-        if type(vacuum_leg) is not bool:
-            raise TypeError("'vacuum_leg' must be of type 'bool.")
+        if type(free_leg) is not bool:
+            raise TypeError("'free_leg' must be of type 'bool'.")
         else:
-            self._is_dual = False
+            self._is_dual = free_leg
 
         # Initialise the process runner with all of the simulations required
         # for each leg.
@@ -35,21 +35,28 @@ import sys as _sys
 import os as _os
 import subprocess as _subprocess
 import tempfile as _tempfile
+import time as _time
 import warnings as _warnings
 
+from Sire.Base import findExe as _findExe
 from Sire.Base import getBinDir as _getBinDir
 from Sire.Base import getShareDir as _getShareDir
-
-from Sire import IO as _SireIO
-from Sire import Mol as _SireMol
+from Sire.Base import Process as _SireProcess
 
 from BioSimSpace import _gmx_exe
 from BioSimSpace._Exceptions import MissingSoftwareError as _MissingSoftwareError
-from BioSimSpace._SireWrappers import Molecules as _Molecules
 from BioSimSpace._SireWrappers import System as _System
 from BioSimSpace import Process as _Process
 from BioSimSpace import Protocol as _Protocol
+from BioSimSpace import Types as _Types
 from BioSimSpace import Units as _Units
+from BioSimSpace import _Utils as _Utils
+
+# Try to find an MPI launcher. This is needed for replica exchange simulations.
+try:
+    _mpirun_exe = _findExe("mpirun").absoluteFilePath()
+except:
+    _mpirun_exe = None
 
 class FreeEnergy():
     """Base class for configuring and running free energy simulations."""
@@ -67,7 +74,11 @@ class FreeEnergy():
     # Create a list of supported molecular dynamics engines.
     _engines = ["GROMACS", "SOMD"]
 
-    def __init__(self, protocol=None, work_dir=None, engine=None):
+    def __init__(self, protocol=None, work_dir=None, engine=None,
+            chain_lambda=False, chain_runtime=_Types.Time(20, "picosecond"),
+            replica_exchange=False, exchange_frequency=1000,
+            concurrent_legs=False, core_split=None, num_cores=None,
+            chain_workers=None):
         """Constructor.
 
            Parameters
@@ -83,6 +94,51 @@ class FreeEnergy():
                The molecular dynamics engine used to run the simulation. Available
                options are "GROMACS", or "SOMD". If this argument is omitted then
                BioSimSpace will choose an appropriate engine for you.
+
+           chain_lambda : bool
+               Whether to seed each lambda window from the final configuration
+               of a short equilibration at the neighbouring lambda value. The
+               first window is seeded from the input system.
+
+           chain_runtime : :class:`Time <BioSimSpace.Types.Time>`
+               The running time of the short equilibration used to seed each
+               lambda window when 'chain_lambda' is True.
+
+           replica_exchange : bool
+               Whether to run the lambda windows of each leg as a single
+               Hamiltonian replica exchange simulation. This is only supported
+               by the "GROMACS" engine and requires an MPI enabled GROMACS
+               installation and an 'mpirun' launcher.
+
+           exchange_frequency : int
+               The number of integration steps between replica exchange
+               attempts. This must be a multiple of the 100 step energy
+               calculation frequency.
+
+           concurrent_legs : bool
+               Whether to run the two legs of the simulation concurrently.
+               The analysis of each leg is run as soon as the leg completes.
+
+           core_split : float
+               The fraction of the available cores that are assigned to the
+               first leg when running the legs concurrently. If None, then
+               the cores are split in proportion to the number of atoms in
+               each leg, so that both legs finish at roughly the same time.
+               (Only used by the "GROMACS" engine.)
+
+           num_cores : int
+               The total number of cores available to the concurrent legs, or
+               to the equilibration and production simulations when
+               'chain_lambda' is True. If None, then all of the cores on the
+               machine are used.
+
+           chain_workers : int
+               The maximum number of production simulations that can run at
+               the same time as the equilibration when 'chain_lambda' is True.
+               Further windows are queued until a running simulation finishes.
+               The cores are split evenly between the running simulations. If
+               None, then the number of workers is chosen so that each
+               simulation is assigned around four cores.
         """
 
 	# Don't allow user to create an instance of this base class.
@@ -139,9 +195,132 @@ class FreeEnergy():
         # Set the engine.
         self._engine = engine
 
+        # Validate the lambda chaining options.
+        if type(chain_lambda) is not bool:
+            raise TypeError("'chain_lambda' must be of type 'bool'.")
+        self._chain_lambda = chain_lambda
+
+        if type(chain_runtime) is not _Types.Time:
+            raise TypeError("'chain_runtime' must be of type 'BioSimSpace.Types.Time'")
+        if chain_runtime.magnitude() <= 0:
+            raise ValueError("'chain_runtime' must be positive!")
+        self._chain_runtime = chain_runtime
+
+        if chain_workers is not None:
+            if type(chain_workers) is not int:
+                raise TypeError("'chain_workers' must be of type 'int'.")
+            if chain_workers < 1:
+                raise ValueError("'chain_workers' must be at least 1.")
+        self._chain_workers = chain_workers
+
+        # Validate the replica exchange options.
+        if type(replica_exchange) is not bool:
+            raise TypeError("'replica_exchange' must be of type 'bool'.")
+
+        if type(exchange_frequency) is not int:
+            raise TypeError("'exchange_frequency' must be of type 'int'.")
+        if exchange_frequency <= 0 or exchange_frequency % 100 != 0:
+            raise ValueError("'exchange_frequency' must be a positive multiple of 100.")
+
+        if replica_exchange:
+            if self._engine != "GROMACS":
+                raise ValueError("Replica exchange is only supported with the 'GROMACS' engine.")
+            if chain_lambda:
+                raise ValueError("'replica_exchange' and 'chain_lambda' cannot be used together.")
+            if _mpirun_exe is None:
+                raise _MissingSoftwareError("Replica exchange simulations require an MPI "
+                                            "launcher. Unable to find 'mpirun'.")
+
+            # Locate an MPI enabled GROMACS executable.
+            self._gmx_mpi_exe = _find_gmx_mpi()
+            if self._gmx_mpi_exe is None:
+                raise _MissingSoftwareError("Replica exchange simulations require an MPI "
+                                            "enabled GROMACS installation. Unable to find "
+                                            "'gmx_mpi', and '%s' was not built with MPI "
+                                            "support." % _gmx_exe)
+
+        self._replica_exchange = replica_exchange
+        self._exchange_frequency = exchange_frequency
+
+        # Validate the concurrent leg options.
+        if type(concurrent_legs) is not bool:
+            raise TypeError("'concurrent_legs' must be of type 'bool'.")
+
+        if concurrent_legs and (chain_lambda or replica_exchange):
+            raise ValueError("'concurrent_legs' cannot be used with 'chain_lambda' or 'replica_exchange'.")
+
+        if core_split is not None:
+            if type(core_split) is int:
+                core_split = float(core_split)
+            if type(core_split) is not float:
+                raise TypeError("'core_split' must be of type 'float'.")
+            if core_split <= 0 or core_split >= 1:
+                raise ValueError("'core_split' must be between 0 and 1.")
+
+        if num_cores is not None:
+            if type(num_cores) is not int:
+                raise TypeError("'num_cores' must be of type 'int'.")
+            if num_cores < 2:
+                raise ValueError("'num_cores' must be at least 2.")
+
+        self._concurrent_legs = concurrent_legs
+        self._core_split = core_split
+        self._num_cores = num_cores
+
+        # Flag whether the analysis of each leg has been run.
+        self._is_analysed = [False, False]
+
     def run(self):
         """Run the simulation."""
-        self._runner.startAll()
+
+        # Any existing analysis is now out of date.
+        self._is_analysed = [False, False]
+
+        if self._chain_lambda:
+            self._run_chained()
+        elif self._replica_exchange:
+            self._run_replica_exchange()
+        elif self._concurrent_legs and self._is_dual:
+            self._run_concurrent()
+        else:
+            self._runner.startAll()
+
+    def getExchangeStatistics(self):
+        """Return the acceptance statistics of a replica exchange simulation.
+
+           Returns
+           -------
+
+           stats0 : [(float, float, float)]
+               The exchange statistics for the first leg of the simulation.
+               The data is a list of tuples, where each tuple contains the
+               lambda values of a pair of neighbouring windows and the
+               average exchange acceptance probability between them.
+
+           stats1 : [(float, float, float)]
+               The exchange statistics for the second leg of the simulation.
+        """
+
+        if not self._replica_exchange:
+            return None
+
+        # Get the lambda values from the protocol.
+        lam_vals = self._protocol.getLambdaValues()
+
+        # Store the number of lambda windows.
+        num_lam = len(lam_vals)
+
+        # Get the list of processes. These are ordered by leg, then lambda.
+        processes = self._runner.processes()
+
+        # Parse the statistics from the log file of the first replica in each leg.
+        stats0 = _parse_exchange_statistics(processes[0]._log_file, lam_vals)
+        if self._is_dual:
+            stats1 = _parse_exchange_statistics(processes[num_lam]._log_file, lam_vals)
+        else:
+            stats1 = None
+
+        return (stats0, stats1)
 
     def _analyse_gromacs(self):
         """Analyse the GROMACS free energy data.
@@ -163,19 +342,12 @@ class FreeEnergy():
                The free energy difference and its associated error.
         """
 
-        # Create the commands for the two legs.
-        command0 = "%s bar -f %s/lambda_*/*.xvg -o %s/bar_leg0.xvg" % (_gmx_exe, self._dir0, self._work_dir)
-        command1 = "%s bar -f %s/lambda_*/*.xvg -o %s/bar_leg1.xvg" % (_gmx_exe, self._dir1, self._work_dir)
-
-        # Run the first command.
-        proc = _subprocess.run(command0, shell=True, stdout=_subprocess.PIPE, stderr=_subprocess.PIPE)
-        if proc.returncode != 0:
+        # Run the analysis for each leg. (This is skipped for legs that
+        # were analysed as soon as they completed.)
+        if not self._analyse_leg(0):
             return None
-
-        # Run the second command.
         if self._is_dual:
-            proc = _subprocess.run(command1, shell=True, stdout=_subprocess.PIPE, stderr=_subprocess.PIPE)
-            if proc.returncode != 0:
+            if not self._analyse_leg(1):
                 return None
 
         # Initialise lists to hold the data from each leg.
@@ -312,19 +484,12 @@ class FreeEnergy():
                The free energy difference and its associated error.
         """
 
-        # Create the commands for the two legs.
-        command0 = "%s mbar -i %s/lambda_*/simfile.dat -o %s/mbar_leg0.txt" % (self._analyse_freenrg, self._dir0, self._work_dir)
-        command1 = "%s mbar -i %s/lambda_*/simfile.dat -o %s/mbar_leg1.txt" % (self._analyse_freenrg, self._dir1, self._work_dir)
-
-        # Run the first command.
-        proc = _subprocess.run(command0, shell=True, stdout=_subprocess.PIPE, stderr=_subprocess.PIPE)
-        if proc.returncode != 0:
+        # Run the analysis for each leg. (This is skipped for legs that
+        # were analysed as soon as they completed.)
+        if not self._analyse_leg(0):
             return None
-
-        # Run the second command.
         if self._is_dual:
-            proc = _subprocess.run(command1, shell=True, stdout=_subprocess.PIPE, stderr=_subprocess.PIPE)
-            if proc.returncode != 0:
+            if not self._analyse_leg(1):
                 return None
 
         # Initialise lists to hold the data from each leg.
@@ -419,6 +584,45 @@ class FreeEnergy():
 
         return (leg0, leg1, free_energy)
 
+    def _analyse_leg(self, leg):
+        """Internal helper function to run the free energy analysis for a
+           single leg of the simulation.
+
+           Parameters
+           ----------
+
+           leg : int
+               The index of the leg.
+
+           Returns
+           -------
+
+           is_success : bool
+               Whether the analysis was successful.
+        """
+
+        # This leg has already been analysed on completion.
+        if self._is_analysed[leg]:
+            return True
+
+        if leg == 0:
+            leg_dir = self._dir0
+        else:
+            leg_dir = self._dir1
+
+        # Create the command for the leg.
+        if self._engine == "GROMACS":
+            command = "%s bar -f %s/lambda_*/*.xvg -o %s/bar_leg%d.xvg" \
+                % (_gmx_exe, leg_dir, self._work_dir, leg)
+        else:
+            command = "%s mbar -i %s/lambda_*/simfile.dat -o %s/mbar_leg%d.txt" \
+                % (self._analyse_freenrg, leg_dir, self._work_dir, leg)
+
+        # Run the command.
+        proc = _subprocess.run(command, shell=True, stdout=_subprocess.PIPE, stderr=_subprocess.PIPE)
+
+        return proc.returncode == 0
+
     def _initialise_runner(self, system0, system1):
         """Internal helper function to initialise the process runner.
 
@@ -458,95 +662,422 @@ class FreeEnergy():
         else:
             raise TypeError("Unsupported FreeEnergy simulation: '%s'" % sim_type)
 
-        # Convert to an appropriate AMBER topology. (Required by SOMD.)
+        # Convert to an appropriate AMBER topology. (Required by SOMD.) The
+        # converted systems are cached so this is only done once per system.
         if self._engine == "SOMD":
-            # Try to get the water model used to solvate the system.
-            try:
-                water_model = system0._sire_object.property("water_model").toString()
-                waters0 = _SireIO.setAmberWater(system0._sire_object.search("water"), water_model)
-                if self._is_dual:
-                    waters1 = _SireIO.setAmberWater(system1._sire_object.search("water"), water_model)
+            system0._setAmberWater(is_warn=True)
+            if self._is_dual:
+                system1._setAmberWater(is_warn=True)
 
-            # If the system wasn't solvated by BioSimSpace, e.g. read from file, then try
-            # to guess the water model from the topology.
-            except:
-                num_point = system0.getWaterMolecules()[0].nAtoms()
-
-                if num_point == 3:
-                    # TODO: Assume TIP3P. Not sure how to detect SPC/E.
-                    waters0 = _SireIO.setAmberWater(system0._sire_object.search("water"), "TIP3P")
-                    if self._is_dual:
-                        waters1 = _SireIO.setAmberWater(system1._sire_object.search("water"), "TIP3P")
-                    water_model = "tip3p"
-                elif num_point == 4:
-                    waters0 = _SireIO.setAmberWater(system0._sire_object.search("water"), "TIP4P")
-                    if self._is_dual:
-                        waters1 = _SireIO.setAmberWater(system1._sire_object.search("water"), "TIP4P")
-                    water_model = "tip4p"
-                elif num_point == 5:
-                    waters0 = _SireIO.setAmberWater(system0._sire_object.search("water"), "TIP5P")
-                    if self._is_dual:
-                        waters1 = _SireIO.setAmberWater(system1._sire_object.search("water"), "TIP5P")
-                    water_model = "tip5p"
-                else:
-                    raise RuntimeError("Unsupported %d-point water model!" % num_point)
+        # Get the lambda values from the protocol.
+        lam_vals = self._protocol.getLambdaValues()
 
-                # Warn the user that we've guessed the water topology.
-                _warnings.warn("Guessed water topology: %r" % water_model)
+        # Loop over all of the lambda values.
+        for lam in lam_vals:
+            # Create and append the required processes for each leg.
+            # Nest the working directories inside self._work_dir.
+            leg0.append(self._create_process(system0, lam, lam_vals,
+                "%s/lambda_%5.4f" % (self._dir0, lam)))
 
-            # Remove the existing water molecules from the systems.
-            system0.removeWaterMolecules()
             if self._is_dual:
-                system1.removeWaterMolecules()
+                leg1.append(self._create_process(system1, lam, lam_vals,
+                    "%s/lambda_%5.4f" % (self._dir1, lam)))
 
-            # Convert the waters to BioSimSpace molecule containers.
-            waters0 = _Molecules(waters0.toMolecules())
-            if self._is_dual:
-                waters1 = _Molecules(waters1.toMolecules())
+        # Initialise the process runner. All processes have already been nested
+        # inside the working directory so no need to re-nest.
+        self._runner = _Process.ProcessRunner(leg0 + leg1, work_dir=self._work_dir, nest_dirs=False)
 
-            # Add the updated water topology back into the systems.
-            system0.addMolecules(waters0)
-            if self._is_dual:
-                system1.addMolecules(waters1)
+    def _create_process(self, system, lam, lam_vals, work_dir, runtime=None):
+        """Internal helper function to create a process for a single lambda
+           window.
+
+           Parameters
+           ----------
+
+           system : :class:`System <BioSimSpace._SireWrappers.System>`
+               The molecular system.
+
+           lam : float
+               The lambda value of the window.
+
+           lam_vals : [float]
+               The full list of lambda values.
+
+           work_dir : str
+               The working directory for the process.
+
+           runtime : :class:`Time <BioSimSpace.Types.Time>`
+               The running time. If None, then the running time of the
+               simulation protocol is used.
+
+           Returns
+           -------
+
+           process : :class:`Process <BioSimSpace.Process>`
+               The process for the lambda window.
+        """
+
+        if runtime is None:
+            runtime = self._protocol.getRunTime()
+
+        # Create a protocol for this window. Each process gets its own protocol
+        # so that the lambda value isn't shared between windows.
+        protocol = _Protocol.FreeEnergy(lam=lam,
+                                        lam_vals=list(lam_vals),
+                                        timestep=self._protocol.getTimeStep(),
+                                        runtime=runtime,
+                                        temperature=self._protocol.getTemperature(),
+                                        pressure=self._protocol.getPressure(),
+                                        frames=self._protocol.getFrames())
+
+        # SOMD.
+        if self._engine == "SOMD":
+            # Check for GPU support.
+            if "CUDA_VISIBLE_DEVICES" in _os.environ:
+                platform = "CUDA"
+            else:
+                platform = "CPU"
+
+            return _Process.Somd(system, protocol, platform=platform, work_dir=work_dir)
+
+        # GROMACS.
+        elif self._engine == "GROMACS":
+            return _Process.Gromacs(system, protocol, work_dir=work_dir)
+
+    def _run_chained(self):
+        """Internal helper function to run the lambda windows of each leg as a
+           chain. A short equilibration is run at the first lambda value and
+           each subsequent window is seeded from the final configuration of
+           its neighbour. The production simulation for each window is queued
+           as soon as the window has been seeded, so that it runs while the
+           remaining windows are being equilibrated. The available cores are
+           shared between the equilibration and at most 'chain_workers'
+           production simulations.
+        """
 
         # Get the lambda values from the protocol.
         lam_vals = self._protocol.getLambdaValues()
 
-        # Loop over all of the lambda values.
-        for lam in lam_vals:
-            # Update the protocol lambda values.
-            self._protocol.setLambdaValues(lam=lam, lam_vals=lam_vals)
+        # Store the number of lambda windows.
+        num_lam = len(lam_vals)
 
-            # Create and append the required processes for each leg.
-            # Nest the working directories inside self._work_dir.
+        # Store the working directories of each leg.
+        leg_dirs = [self._dir0]
+        if self._is_dual:
+            leg_dirs.append(self._dir1)
 
-            # SOMD.
-            if self._engine == "SOMD":
-                # Check for GPU support.
-                if "CUDA_VISIBLE_DEVICES" in _os.environ:
-                    platform = "CUDA"
+        # Get the list of processes. These are ordered by leg, then lambda.
+        processes = self._runner.processes()
+
+        # Work out the number of cores available.
+        num_cores = self._get_num_cores()
+
+        # Work out the number of production simulations that can run alongside
+        # the equilibration. By default, each simulation is assigned around
+        # four cores.
+        if self._chain_workers is None:
+            num_workers = max(1, min(len(processes), num_cores // 4 - 1))
+        else:
+            num_workers = self._chain_workers
+
+        # Split the cores evenly between the equilibration and the production
+        # simulations.
+        num_cores = max(1, num_cores // (num_workers + 1))
+
+        # The production simulations that are waiting for a worker, and
+        # those that have been started.
+        queued = []
+        running = []
+
+        # Loop over the legs.
+        for x, leg_dir in enumerate(leg_dirs):
+
+            # The first window is seeded from the input system for the leg.
+            system = processes[x*num_lam]._system
+
+            # Loop over the lambda windows in order.
+            for y, lam in enumerate(lam_vals):
+
+                # The index of the process in the runner.
+                idx = x*num_lam + y
+
+                # The working directory for the window.
+                work_dir = "%s/lambda_%5.4f" % (leg_dir, lam)
+
+                # Run a short equilibration at this lambda value, starting from
+                # the configuration of the neighbouring window. Queued
+                # production simulations are started as workers become free.
+                seed = self._create_process(system, lam, lam_vals,
+                    "%s/seed" % work_dir, runtime=self._chain_runtime)
+                self._limit_cores(seed, num_cores)
+                seed.start()
+                while seed.isRunning():
+                    running = self._start_queued(queued, running, num_workers)
+                    _time.sleep(1)
+
+                # Extract the equilibrated configuration.
+                new_system = None
+                if not seed.isError():
+                    new_system = seed.getSystem(block=True)
+
+                if new_system is None:
+                    _warnings.warn("Failed to equilibrate lambda window %5.4f. Seeding from "
+                                   "the configuration of the previous window." % lam)
                 else:
-                    platform = "CPU"
+                    system = new_system
+
+                # Recreate the production process from the seeded configuration,
+                # preserving any custom command-line arguments.
+                process = self._create_process(system, lam, lam_vals, work_dir)
+                process.setArgs(processes[idx].getArgs())
+                self._limit_cores(process, num_cores)
+                self._runner.replaceProcess(idx, process)
+
+                # Queue the production simulation.
+                queued.append(process)
+                running = self._start_queued(queued, running, num_workers)
+
+        # All of the windows have been seeded, so the cores used for the
+        # equilibration can be used by another production simulation.
+        while len(queued) > 0:
+            running = self._start_queued(queued, running, num_workers + 1)
+            if len(queued) > 0:
+                _time.sleep(1)
+
+        # Wait for the production simulations to finish, retrying any that
+        # fail.
+        self._runner.waitAll()
+
+    def _start_queued(self, queued, running, num_workers):
+        """Internal helper function to start queued processes while there are
+           free workers.
 
-                leg0.append(_Process.Somd(system0, self._protocol,
-                    platform=platform, work_dir="%s/lambda_%5.4f" % (self._dir0, lam)))
+           Parameters
+           ----------
 
-                if self._is_dual:
-                    leg1.append(_Process.Somd(system1, self._protocol,
-                        platform=platform, work_dir="%s/lambda_%5.4f" % (self._dir1, lam)))
+           queued : [:class:`Process <BioSimSpace.Process>`]
+               The processes waiting to be started. Started processes are
+               removed from the list.
 
-            # GROMACS.
-            elif self._engine == "GROMACS":
-                leg0.append(_Process.Gromacs(system0, self._protocol,
-                    work_dir="%s/lambda_%5.4f" % (self._dir0, lam)))
+           running : [:class:`Process <BioSimSpace.Process>`]
+               The processes that have been started.
 
-                if self._is_dual:
-                    leg1.append(_Process.Gromacs(system1, self._protocol,
-                        work_dir="%s/lambda_%5.4f" % (self._dir1, lam)))
+           num_workers : int
+               The maximum number of processes that can run at the same time.
 
-        # Initialise the process runner. All processes have already been nested
-        # inside the working directory so no need to re-nest.
-        self._runner = _Process.ProcessRunner(leg0 + leg1, work_dir=self._work_dir, nest_dirs=False)
+           Returns
+           -------
+
+           running : [:class:`Process <BioSimSpace.Process>`]
+               The processes that are running.
+        """
+
+        # Remove any processes that have finished.
+        running = [p for p in running if p.isRunning()]
+
+        # Start queued processes in order.
+        while len(queued) > 0 and len(running) < num_workers:
+            process = queued.pop(0)
+            process.start()
+            running.append(process)
+
+        return running
+
+    def _limit_cores(self, process, num_cores):
+        """Internal helper function to limit the number of cores used by a
+           process. The limit applies to all subsequent runs of the process.
+
+           Parameters
+           ----------
+
+           process : :class:`Process <BioSimSpace.Process>`
+               The process.
+
+           num_cores : int
+               The number of cores assigned to the process.
+        """
+
+        if self._engine == "GROMACS":
+            process.setArg("-nt", "%d" % num_cores)
+
+    def _get_num_cores(self):
+        """Internal helper function to get the total number of cores available
+           to the simulation.
+
+           Returns
+           -------
+
+           num_cores : int
+               The number of cores.
+        """
+
+        if self._num_cores is not None:
+            return self._num_cores
+
+        num_cores = _os.cpu_count()
+        if num_cores is None:
+            num_cores = 2
+
+        return num_cores
+
+    def _run_concurrent(self):
+        """Internal helper function to run the two legs of the simulation
+           concurrently. The available cores are split between the legs and
+           each leg is analysed as soon as all of its windows have finished.
+           The windows of each leg are run in serial. All processes are
+           started from the calling thread, since starting a process changes
+           the working directory of the interpreter.
+        """
+
+        # Store the number of lambda windows.
+        num_lam = len(self._protocol.getLambdaValues())
+
+        # Get the list of processes. These are ordered by leg, then lambda.
+        processes = self._runner.processes()
+        legs = [processes[:num_lam], processes[num_lam:]]
+
+        # Work out the number of cores available.
+        num_cores = self._get_num_cores()
+
+        # Split the cores in proportion to the number of atoms in each leg.
+        if self._core_split is None:
+            num_atoms0 = legs[0][0]._system.nAtoms()
+            num_atoms1 = legs[1][0]._system.nAtoms()
+            core_split = num_atoms0 / (num_atoms0 + num_atoms1)
+        else:
+            core_split = self._core_split
+
+        # Make sure that each leg gets at least one core.
+        cores0 = min(max(1, int(round(core_split * num_cores))), max(1, num_cores - 1))
+        cores1 = max(1, num_cores - cores0)
+        cores = [cores0, cores1]
+
+        # The index of the current window of each leg and the number of
+        # times that it has failed.
+        window = [0, 0]
+        num_failed = [0, 0]
+
+        # Start the first window of each leg.
+        for x in range(2):
+            self._start_process(legs[x][0], cores[x])
+
+        # Poll the legs until all of the windows have finished.
+        while window[0] < num_lam or window[1] < num_lam:
+            for x in range(2):
+                # This leg has finished.
+                if window[x] == num_lam:
+                    continue
+
+                process = legs[x][window[x]]
+
+                # The current window is still running.
+                if process.isRunning():
+                    continue
+
+                # Retry failed processes up to a maximum of 5 times.
+                if process.isError():
+                    num_failed[x] += 1
+                    if num_failed[x] < 5:
+                        self._start_process(process, cores[x])
+                        continue
+
+                # Move to the next window.
+                window[x] += 1
+                num_failed[x] = 0
+
+                if window[x] < num_lam:
+                    self._start_process(legs[x][window[x]], cores[x])
+
+                # Analyse the leg now that all of the windows have finished.
+                else:
+                    if self._analyse_leg(x):
+                        self._is_analysed[x] = True
+                    else:
+                        _warnings.warn("Failed to analyse leg %d of the free energy simulation." % x)
+
+            _time.sleep(1)
+
+    def _start_process(self, process, num_cores):
+        """Internal helper function to start a process using a limited number
+           of cores. The command-line arguments of the process are restored
+           once it has started, so the limit only applies to this run.
+
+           Parameters
+           ----------
+
+           process : :class:`Process <BioSimSpace.Process>`
+               The process to start.
+
+           num_cores : int
+               The number of cores assigned to the process.
+        """
+
+        # Store the existing command-line arguments.
+        args = process.getArgs()
+
+        # Limit the number of threads used by the process.
+        self._limit_cores(process, num_cores)
+
+        try:
+            process.start()
+        finally:
+            process.setArgs(args)
+
+    def _run_replica_exchange(self):
+        """Internal helper function to run the lambda windows of each leg as a
+           single GROMACS Hamiltonian replica exchange simulation, with one
+           replica per window.
+        """
+
+        # Get the lambda values from the protocol.
+        lam_vals = self._protocol.getLambdaValues()
+
+        # Store the number of lambda windows.
+        num_lam = len(lam_vals)
+
+        # Store the working directories of each leg.
+        leg_dirs = [self._dir0]
+        if self._is_dual:
+            leg_dirs.append(self._dir1)
+
+        # Get the list of processes. These are ordered by leg, then lambda.
+        processes = self._runner.processes()
+
+        # Loop over the legs.
+        for x, leg_dir in enumerate(leg_dirs):
+
+            # Extract the processes for this leg.
+            leg = processes[x*num_lam:(x+1)*num_lam]
+
+            # Create the command-line arguments. The windows have already been
+            # set up by the individual processes, so we start from the arguments
+            # of the first window and run all of the directories together.
+            args = _replica_exchange_args(leg[0].getArgStringList(),
+                [process.workDir() for process in leg],
+                self._exchange_frequency, self._gmx_mpi_exe)
+
+            # Run the simulation in the leg directory.
+            with _Utils.cd(leg_dir):
+
+                # Write the command-line process to a README.txt file.
+                with open("README.txt", "w") as f:
+                    f.write("# GROMACS was run with the following command:\n")
+                    f.write("%s %s\n" % (_mpirun_exe, " ".join(args)))
+
+                # Run the command, redirecting all output to file.
+                proc = _SireProcess.run(_mpirun_exe, args, "replex.out", "replex.out")
+
+            # All of the windows are run by the same process, so share it
+            # with the individual processes so that their running and error
+            # state reflects that of the replica exchange simulation.
+            for process in leg:
+                process._process = proc
+
+            # Wait for the simulation to finish.
+            proc.wait()
+
+            if proc.isError():
+                _warnings.warn("Replica exchange simulation failed. Check the output in: '%s/replex.out'" % leg_dir)
 
     def _update_run_args(self, args):
         """Internal function to update run arguments for all subprocesses.
@@ -564,3 +1095,125 @@ class FreeEnergy():
 
         for process in self._runner.processes():
             process.setArgs(args)
+
+def _find_gmx_mpi():
+    """Internal helper function to locate an MPI enabled GROMACS executable.
+
+       Returns
+       -------
+
+       exe : str
+           The path to the executable, or None if no MPI enabled GROMACS
+           installation could be found.
+    """
+
+    # First look for a 'gmx_mpi' executable alongside the GROMACS executable
+    # that BioSimSpace is using, then in the user's PATH.
+    candidates = []
+    if _gmx_exe is not None:
+        candidates.append("%s/gmx_mpi" % _os.path.dirname(_gmx_exe))
+    candidates.append("gmx_mpi")
+
+    for candidate in candidates:
+        try:
+            return _findExe(candidate).absoluteFilePath()
+        except:
+            pass
+
+    if _gmx_exe is None:
+        return None
+
+    # Otherwise, check whether the GROMACS executable itself was built with
+    # MPI support, rather than the default thread-MPI.
+    try:
+        proc = _subprocess.run([_gmx_exe, "--version"], stdout=_subprocess.PIPE,
+                               stderr=_subprocess.STDOUT, universal_newlines=True)
+    except:
+        return None
+
+    for line in proc.stdout.splitlines():
+        line = line.split(":", 1)
+        if len(line) == 2 and line[0].strip() == "MPI library":
+            if line[1].strip() == "MPI":
+                return _gmx_exe
+            break
+
+    return None
+
+def _replica_exchange_args(args, work_dirs, exchange_frequency, exe):
+    """Internal helper function to create the 'mpirun' arguments used to
+       launch a GROMACS Hamiltonian replica exchange simulation, with one
+       MPI rank per lambda window.
+
+       Parameters
+       ----------
+
+       args : [str]
+           The command-line arguments of the first lambda window.
+
+       work_dirs : [str]
+           The working directory of each lambda window, ordered by replica.
+
+       exchange_frequency : int
+           The number of integration steps between exchange attempts.
+
+       exe : str
+           The path to the MPI enabled GROMACS executable.
+
+       Returns
+       -------
+
+       args : [str]
+           The command-line arguments for 'mpirun'.
+    """
+
+    args = list(args)
+    args.append("-multidir")
+    args.extend(work_dirs)
+    args.extend(["-replex", "%d" % exchange_frequency])
+
+    return ["-np", "%d" % len(work_dirs), exe] + args
+
+def _parse_exchange_statistics(log_file, lam_vals):
+    """Internal helper function to parse replica exchange statistics from a
+       GROMACS log file.
+
+       Parameters
+       ----------
+
+       log_file : str
+           The path to the GROMACS log file.
+
+       lam_vals : [float]
+           The list of lambda values, ordered by replica.
+
+       Returns
+       -------
+
+       stats : [(float, float, float)]
+           A list of tuples containing the lambda values of each pair of
+           neighbouring replicas and the average exchange acceptance
+           probability between them.
+    """
+
+    if not _os.path.isfile(log_file):
+        return None
+
+    # Read all of the lines into a list.
+    with open(log_file) as file:
+        lines = [line.rstrip() for line in file]
+
+    # The statistics are written at the end of the run, so search backwards
+    # for the most recent set of average probabilities.
+    for x in range(len(lines) - 1, -1, -1):
+        if "Repl  average probabilities:" in lines[x]:
+            # The probabilities are on the line after the replica index header.
+            try:
+                data = lines[x+2].split()[1:]
+                probs = [float(p) for p in data]
+            except:
+                return None
+
+            return [(lam_vals[i], lam_vals[i+1], p) for i, p in enumerate(probs)]
+
+    return None
@@ -0,0 +1,494 @@
+######################################################################
+# BioSimSpace: Making biomolecular simulation a breeze!
+#
+# Copyright: 2017-2020
+#
+# Authors: Lester Hedges <lester.hedges@gmail.com>
+#
+# BioSimSpace is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# BioSimSpace is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BioSimSpace. If not, see <http://www.gnu.org/licenses/>.
+#####################################################################
+
+"""
+Functionality for running relative binding free energy calculations over
+a network of perturbations.
+"""
+
+__author__ = "Lester Hedges"
+__email_ = "lester.hedges@gmail.com"
+
+__all__ = ["Network"]
+
+import math as _math
+import os as _os
+import tempfile as _tempfile
+
+from Sire import Base as _SireBase
+
+from BioSimSpace._SireWrappers import Molecule as _Molecule
+from BioSimSpace._SireWrappers import System as _System
+from BioSimSpace import Align as _Align
+from BioSimSpace import MD as _MD
+from BioSimSpace import Process as _Process
+from BioSimSpace import Protocol as _Protocol
+from BioSimSpace import Solvent as _Solvent
+from BioSimSpace import Types as _Types
+from BioSimSpace import Units as _Units
+
+from ._binding import Binding as _Binding
+
+class Network():
+    """A class for configuring and running relative binding free energy
+       simulations over a network of ligand perturbations.
+    """
+
+    def __init__(self, protein, ligands, edges, water_model="tip3p", box=None,
+            free_box=None, equilibration=None, equilibration_workers=1,
+            protocol=None, work_dir=None, engine=None, property_map={}):
+        """Constructor.
+
+           Parameters
+           ----------
+
+           protein : :class:`Molecule <BioSimSpace._SireWrappers.Molecule>`
+               The parameterised protein.
+
+           ligands : [:class:`Molecule <BioSimSpace._SireWrappers.Molecule>`]
+               A list of parameterised ligands, positioned in the binding site.
+
+           edges : [(int, int)]
+               A list of perturbations, given as pairs of indices into the
+               'ligands' list. Duplicate edges, including those that are
+               the reverse of another edge, are only simulated once.
+
+           water_model : str
+               The water model used to solvate the bound and free systems.
+
+           box : [:class:`Length <BioSimSpace.Types.Length>`]
+               A list containing the box size in each dimension for the
+               "bound" leg of each perturbation.
+
+           free_box : [:class:`Length <BioSimSpace.Types.Length>`]
+               A list containing the box size in each dimension for the
+               "free" leg of each perturbation. If None, then the 'box'
+               size is used.
+
+           equilibration : :class:`Protocol <BioSimSpace.Protocol>`
+               An optional protocol used to equilibrate each solvated box
+               prior to creating the perturbations. Each box is only
+               equilibrated once, regardless of the number of edges that
+               it is used by.
+
+           equilibration_workers : int
+               The maximum number of equilibrations that can run at the same
+               time. Further boxes are queued until a running equilibration
+               finishes.
+
+           protocol : :class:`Protocol.FreeEnergy <BioSimSpace.Protocol.FreeEnergy>`
+               The free energy protocol used for each perturbation.
+
+           work_dir : str
+               The working directory for the simulation.
+
+           engine: str
+               The molecular dynamics engine used to run the simulation. Available
+               options are "GROMACS", or "SOMD". If this argument is omitted then
+               BioSimSpace will choose an appropriate engine for you.
+
+           property_map : dict
+               A dictionary that maps system "properties" to their user defined
+               values. This allows the user to refer to properties with their
+               own naming scheme, e.g. { "charge" : "my-charge" }
+        """
+
+        # Validate the input.
+
+        if type(protein) is not _Molecule:
+            raise TypeError("'protein' must be of type 'BioSimSpace._SireWrappers.Molecule'")
+
+        if type(ligands) is not list or not all(type(x) is _Molecule for x in ligands):
+            raise TypeError("'ligands' must be a list of 'BioSimSpace._SireWrappers.Molecule' types.")
+
+        if len(ligands) < 2:
+            raise ValueError("'ligands' must contain at least two molecules!")
+
+        if type(edges) is not list:
+            raise TypeError("'edges' must be a list of (int, int) tuples.")
+
+        for edge in edges:
+            if type(edge) not in [list, tuple] or len(edge) != 2 or \
+               not all(type(x) is int for x in edge):
+                raise TypeError("'edges' must be a list of (int, int) tuples.")
+            for x in edge:
+                if x < 0 or x >= len(ligands):
+                    raise IndexError("Edge %r references a ligand that is out of range!" % (edge,))
+            if edge[0] == edge[1]:
+                raise ValueError("Edge %r perturbs a ligand to itself!" % (edge,))
+
+        if len(edges) == 0:
+            raise ValueError("'edges' must contain at least one perturbation!")
+
+        if type(water_model) is not str:
+            raise TypeError("'water_model' must be of type 'str'.")
+
+        if box is None:
+            raise ValueError("A 'box' size must be specified!")
+
+        for b in [box, free_box]:
+            if b is not None:
+                if len(b) != 3:
+                    raise ValueError("The box must have x, y, and z size information.")
+                if not all(isinstance(x, _Types.Length) for x in b):
+                    raise ValueError("The box dimensions must be of type 'BioSimSpace.Types.Length'")
+
+        if free_box is None:
+            free_box = box
+
+        if equilibration is not None:
+            if not isinstance(equilibration, _Protocol._protocol.Protocol) or \
+               type(equilibration) is _Protocol.FreeEnergy:
+                raise TypeError("'equilibration' must be of type 'BioSimSpace.Protocol'")
+
+        if type(equilibration_workers) is not int:
+            raise TypeError("'equilibration_workers' must be of type 'int'.")
+        if equilibration_workers < 1:
+            raise ValueError("'equilibration_workers' must be at least 1.")
+
+        if protocol is not None:
+            if type(protocol) is not _Protocol.FreeEnergy:
+                raise TypeError("'protocol' must be of type 'BioSimSpace.Protocol.FreeEnergy'")
+
+        if type(property_map) is not dict:
+            raise TypeError("'property_map' must be of type 'dict'")
+
+        # Create a temporary working directory and store the directory name.
+        if work_dir is None:
+            self._tmp_dir = _tempfile.TemporaryDirectory()
+            self._work_dir = self._tmp_dir.name
+
+        # User specified working directory.
+        else:
+            self._work_dir = work_dir
+
+            # Create the directory if it doesn't already exist.
+            if not _os.path.isdir(work_dir):
+                _os.makedirs(work_dir, exist_ok=True)
+
+        self._protein = protein
+        self._ligands = ligands
+        self._water_model = water_model
+        self._property_map = property_map
+
+        # Map each requested edge to a unique edge and the sign of the free
+        # energy difference relative to it.
+        self._edges = [tuple(x) for x in edges]
+        self._unique_edges = []
+        self._edge_map = {}
+        for edge in self._edges:
+            if edge in self._unique_edges:
+                self._edge_map[edge] = (edge, 1)
+            elif edge[::-1] in self._unique_edges:
+                self._edge_map[edge] = (edge[::-1], -1)
+            else:
+                self._unique_edges.append(edge)
+                self._edge_map[edge] = (edge, 1)
+
+        # Create the solvated boxes for the ligands at the start of each unique
+        # edge. These are shared between all edges starting from that ligand.
+        box_ligands = sorted(set(edge[0] for edge in self._unique_edges))
+        self._bound_systems = {}
+        self._free_systems = {}
+        for idx in box_ligands:
+            self._bound_systems[idx] = _Solvent.solvate(water_model,
+                molecule=protein.toSystem() + ligands[idx], box=box,
+                property_map=property_map)
+            self._free_systems[idx] = _Solvent.solvate(water_model,
+                molecule=ligands[idx], box=free_box, property_map=property_map)
+
+        # Equilibrate the boxes.
+        if equilibration is not None:
+            self._equilibrate(equilibration, equilibration_workers)
+
+        # Create a binding free energy simulation for each unique edge.
+        self._bindings = {}
+        processes = []
+        for edge in self._unique_edges:
+            bound, free = self._create_systems(edge)
+            binding = _Binding(bound, protocol=protocol, free_system=free,
+                               work_dir="%s/edge_%d_%d" % (self._work_dir, *edge),
+                               engine=engine, property_map=property_map)
+            self._bindings[edge] = binding
+            processes += binding._runner.processes()
+
+        # Schedule all of the lambda windows in a single runner. All processes
+        # have already been nested inside the working directory so no need
+        # to re-nest.
+        self._runner = _Process.ProcessRunner(processes, work_dir=self._work_dir, nest_dirs=False)
+
+    def run(self):
+        """Run the simulation."""
+        self._runner.startAll()
+
+    def edges(self):
+        """Return the list of unique perturbations that are simulated.
+
+           Returns
+           -------
+
+           edges : [(int, int)]
+               The unique edges of the perturbation network.
+        """
+        return self._unique_edges.copy()
+
+    def analyse(self):
+        """Analyse the relative binding free energy for each edge.
+
+           Returns
+           -------
+
+           free_energies : {(int, int) : (:class:`Energy <BioSimSpace.Types.Energy>`, :class:`Energy <BioSimSpace.Types.Energy>`)}
+               A dictionary mapping each of the requested edges to the
+               relative binding free energy and its associated error.
+        """
+
+        # Analyse each unique edge.
+        results = {}
+        for edge, binding in self._bindings.items():
+            results[edge] = binding.analyse()[2]
+
+        # Map the results back to the requested edges, flipping the sign
+        # of any reversed edges.
+        free_energies = {}
+        for edge in self._edges:
+            unique, sign = self._edge_map[edge]
+            free_energy, error = results[unique]
+            if sign < 0:
+                free_energy = -free_energy
+            free_energies[edge] = (free_energy, error)
+
+        return free_energies
+
+    def cycleClosure(self, free_energies=None):
+        """Compute the cycle closure errors of the perturbation network.
+
+           Parameters
+           ----------
+
+           free_energies : {(int, int) : (:class:`Energy <BioSimSpace.Types.Energy>`, :class:`Energy <BioSimSpace.Types.Energy>`)}
+               The relative binding free energy for each edge, as returned
+               by :class:`analyse <BioSimSpace.FreeEnergy.Network.analyse>`.
+               If None, then the network will be analysed.
+
+           Returns
+           -------
+
+           cycles : [([int], :class:`Energy <BioSimSpace.Types.Energy>`, :class:`Energy <BioSimSpace.Types.Energy>`)]
+               A list of tuples, one for each independent cycle in the network.
+               Each tuple contains the indices of the ligands in the cycle,
+               the cycle closure error, and the error propagated from the
+               individual edges.
+        """
+
+        if free_energies is None:
+            free_energies = self.analyse()
+        elif type(free_energies) is not dict:
+            raise TypeError("'free_energies' must be of type 'dict'.")
+
+        # Store the free energy (in kcal/mol) and error for each unique edge.
+        data = {}
+        for edge in self._unique_edges:
+            if edge in free_energies:
+                free_energy, error = free_energies[edge]
+                data[edge] = (free_energy.kcal_per_mol().magnitude(),
+                              error.kcal_per_mol().magnitude())
+            elif edge[::-1] in free_energies:
+                free_energy, error = free_energies[edge[::-1]]
+                data[edge] = (-free_energy.kcal_per_mol().magnitude(),
+                              error.kcal_per_mol().magnitude())
+            else:
+                raise ValueError("Missing free energy for edge %r" % (edge,))
+
+        return _cycle_closure(data)
+
+    def _equilibrate(self, protocol, num_workers):
+        """Internal helper function to equilibrate the solvated boxes.
+
+           Parameters
+           ----------
+
+           protocol : :class:`Protocol <BioSimSpace.Protocol>`
+               The equilibration protocol.
+
+           num_workers : int
+               The maximum number of equilibrations that can run at the same
+               time.
+        """
+
+        # Create an equilibration process for each box.
+        processes = {}
+        for idx in self._bound_systems:
+            processes[("bound", idx)] = _MD.run(self._bound_systems[idx], protocol,
+                auto_start=False, work_dir="%s/boxes/bound_%d" % (self._work_dir, idx),
+                property_map=self._property_map)
+            processes[("free", idx)] = _MD.run(self._free_systems[idx], protocol,
+                auto_start=False, work_dir="%s/boxes/free_%d" % (self._work_dir, idx),
+                property_map=self._property_map)
+
+        # Run the equilibrations, limiting the number that run at once. All
+        # processes have already been nested inside the working directory so
+        # no need to re-nest.
+        runner = _Process.ProcessRunner(list(processes.values()),
+            work_dir="%s/boxes" % self._work_dir, nest_dirs=False)
+        runner.startAll(num_workers=num_workers)
+
+        # Store the equilibrated system for each box.
+        for (leg, idx), process in processes.items():
+            system = process.getSystem(block=True)
+            if system is None:
+                raise RuntimeError("Equilibration of the %s box for ligand %d failed!" % (leg, idx))
+
+            # Preserve the water model used to solvate the box. The system may
+            # share its Sire object with the process, so detach it first.
+            system._detach()
+            system._sire_object.setProperty("water_model", _SireBase.wrap(self._water_model))
+
+            if leg == "bound":
+                self._bound_systems[idx] = system
+            else:
+                self._free_systems[idx] = system
+
+    def _create_systems(self, edge):
+        """Internal helper function to create the bound and free systems for
+           a perturbation by replacing the initial ligand in each of the
+           shared boxes with a merged molecule.
+
+           Parameters
+           ----------
+
+           edge : (int, int)
+               The indices of the initial and final ligands.
+
+           Returns
+           -------
+
+           (bound, free) : (:class:`System <BioSimSpace._SireWrappers.System>`, :class:`System <BioSimSpace._SireWrappers.System>`)
+               The bound and free systems for the perturbation.
+        """
+
+        # The molecule number of the initial ligand. This is preserved in
+        # the solvated boxes.
+        mol_num = self._ligands[edge[0]]._sire_object.number()
+
+        systems = []
+        for system in [self._bound_systems[edge[0]], self._free_systems[edge[0]]]:
+            system = system.copy()
+
+            # Extract the initial ligand from the box.
+            ligand0 = _Molecule(system._sire_object[mol_num])
+
+            # Align the final ligand to the initial ligand.
+            ligand1 = self._ligands[edge[1]]
+            mapping = _Align.matchAtoms(ligand0, ligand1)
+            inv_mapping = {v:k for k, v in mapping.items()}
+            ligand1 = _Align.rmsdAlign(ligand1, ligand0, inv_mapping)
+
+            # Merge the ligands and replace the initial ligand in the box.
+            # The merged molecule retains the number of the initial ligand.
+            merged = _Align.merge(ligand0, ligand1, mapping)
+            system.updateMolecules(merged)
+
+            systems.append(system)
+
+        return tuple(systems)
+
+def _cycle_closure(data):
+    """Internal helper function to compute cycle closure errors.
+
+       Parameters
+       ----------
+
+       data : {(int, int) : (float, float)}
+           The free energy difference and error, in kcal/mol, for each edge.
+
+       Returns
+       -------
+
+       cycles : [([int], :class:`Energy <BioSimSpace.Types.Energy>`, :class:`Energy <BioSimSpace.Types.Energy>`)]
+           The ligands, closure error, and propagated error for each cycle.
+    """
+
+    # Build the adjacency list of the network. Store the free energy in the
+    # direction of travel.
+    neighbours = {}
+    for (i, j), (free_energy, error) in data.items():
+        neighbours.setdefault(i, []).append((j, free_energy, error))
+        neighbours.setdefault(j, []).append((i, -free_energy, error))
+
+    # Construct a spanning tree of each connected component using a breadth
+    # first search. Store the parent of each node, its depth, and the free
+    # energy relative to the root of the tree.
+    parent = {}
+    depth = {}
+    potential = {}
+    tree_edges = set()
+    for root in sorted(neighbours):
+        if root in parent:
+            continue
+        parent[root] = None
+        depth[root] = 0
+        potential[root] = 0.0
+        queue = [root]
+        while queue:
+            node = queue.pop(0)
+            for other, free_energy, _ in neighbours[node]:
+                if other not in parent:
+                    parent[other] = node
+                    depth[other] = depth[node] + 1
+                    potential[other] = potential[node] + free_energy
+                    tree_edges.add(frozenset((node, other)))
+                    queue.append(other)
+
+    # Each edge that isn't part of the spanning tree closes an independent cycle.
+    cycles = []
+    for (i, j), (free_energy, error) in data.items():
+        if frozenset((i, j)) in tree_edges:
+            continue
+
+        # Find the tree paths from each end of the edge to the lowest
+        # common ancestor.
+        path_i = [i]
+        path_j = [j]
+        while path_i[-1] != path_j[-1]:
+            if depth[path_i[-1]] >= depth[path_j[-1]]:
+                path_i.append(parent[path_i[-1]])
+            else:
+                path_j.append(parent[path_j[-1]])
+        cycle = path_i + path_j[-2::-1]
+
+        # The closure error is the sum of the free energies around the cycle.
+        closure = potential[i] + free_energy - potential[j]
+
+        # Propagate the errors around the cycle. (These add in quadrature.)
+        total_error = error * error
+        for x in range(len(cycle) - 1):
+            a, b = cycle[x], cycle[x+1]
+            if (a, b) in data:
+                total_error += data[(a, b)][1] * data[(a, b)][1]
+            else:
+                total_error += data[(b, a)][1] * data[(b, a)][1]
+
+        cycles.append((cycle,
+                       closure * _Units.Energy.kcal_per_mol,
+                       _math.sqrt(total_error) * _Units.Energy.kcal_per_mol))
+
+    return cycles
@@ -30,6 +30,7 @@ __email_ = "lester.hedges@gmail.com"
 __all__ = ["Solvation"]
 
 from BioSimSpace._SireWrappers import System as _System
+from BioSimSpace import Types as _Types
 
 from . import _free_energy
 
@@ -37,7 +38,9 @@ class Solvation(_free_energy.FreeEnergy):
     """A class for configuring and running solvation free energy simulations."""
 
     def __init__(self, system, protocol=None, vacuum_leg=True,
-            work_dir=None, engine=None):
+            work_dir=None, engine=None, chain_lambda=False,
+            chain_runtime=_Types.Time(20, "picosecond"), replica_exchange=False,
+            exchange_frequency=1000, num_cores=None, chain_workers=None):
         """Constructor.
 
            Parameters
@@ -60,10 +63,40 @@ class Solvation(_free_energy.FreeEnergy):
                The molecular dynamics engine used to run the simulation. Available
                options are "GROMACS", or "SOMD". If this argument is omitted then
                BioSimSpace will choose an appropriate engine for you.
+
+           chain_lambda : bool
+               Whether to seed each lambda window from the final configuration
+               of a short equilibration at the neighbouring lambda value.
+
+           chain_runtime : :class:`Time <BioSimSpace.Types.Time>`
+               The running time of the short equilibration used to seed each
+               lambda window when 'chain_lambda' is True.
+
+           replica_exchange : bool
+               Whether to run the lambda windows of each leg as a single
+               Hamiltonian replica exchange simulation. Only supported by
+               the "GROMACS" engine.
+
+           exchange_frequency : int
+               The number of integration steps between replica exchange
+               attempts.
+
+           num_cores : int
+               The total number of cores shared by the equilibration and
+               production simulations when 'chain_lambda' is True. If None,
+               then all of the cores on the machine are used.
+
+           chain_workers : int
+               The maximum number of production simulations that can run at
+               the same time as the equilibration when 'chain_lambda' is True.
+               If None, then the number of workers is chosen so that each
+               simulation is assigned around four cores.
         """
 
         # Call the base class constructor.
-        super().__init__(protocol, work_dir, engine)
+        super().__init__(protocol, work_dir, engine, chain_lambda, chain_runtime,
+                         replica_exchange, exchange_frequency,
+                         num_cores=num_cores, chain_workers=chain_workers)
 
         # Validate the input.
 
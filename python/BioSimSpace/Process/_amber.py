@@ -40,7 +40,6 @@ import warnings as _warnings
 
 from Sire import Base as _SireBase
 from Sire import IO as _SireIO
-from Sire import Mol as _SireMol
 
 from BioSimSpace import _amber_home, _isVerbose
 from BioSimSpace._Exceptions import IncompatibleError as _IncompatibleError
@@ -235,39 +234,10 @@ class Amber(_process.Process):
         system = self._system.copy()
 
         # If the system isn't created from AMBER format files, then we'll need
-        # to convert the water model topology.
+        # to convert the water model topology. The converted system is cached,
+        # so processes created from the same system share the conversion.
         if not "PRM7,RST7" in system._sire_object.property("fileformat").toString():
-
-            # Get the water molecules.
-            waters = system.getWaterMolecules()
-
-            if len(waters) > 0:
-                num_point = waters[0].nAtoms()
-
-                # Try to get the name of the water model.
-                try:
-                    water_model = system._sire_object.property("water_model").toString()
-                    waters = _SireIO.setAmberWater(system._sire_object.search("water"), water_model)
-
-                except:
-                    num_point = waters[0].nAtoms()
-
-                    # Convert to an appropriate AMBER topology.
-                    if num_point == 3:
-                        # TODO: Assume TIP3P. Not sure how to detect SPC/E.
-                        waters = _SireIO.setAmberWater(system._sire_object.search("water"), "TIP3P")
-                    elif num_point == 4:
-                        waters = _SireIO.setAmberWater(system._sire_object.search("water"), "TIP4P")
-                    elif num_point == 5:
-                        waters = _SireIO.setAmberWater(system._sire_object.search("water"), "TIP5P")
-
-                # Loop over all of the renamed water molecules, delete the old one
-                # from the system, then add the renamed one back in.
-                # TODO: This is a hack since the "update" method of Sire.System
-                # doesn't work properly at present.
-                system.removeWaterMolecules()
-                for wat in waters:
-                    system._sire_object.add(wat, _SireMol.MGName("all"))
+            system._setAmberWater()
 
         # RST file (coordinates).
         try:
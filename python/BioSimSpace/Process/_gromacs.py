@@ -327,9 +327,12 @@ class Gromacs(_process.Process):
                 num_restraint = 1
 
                 # Loop over all of the molecules and create a constraint file for
-                # each, excluding any water molecules or ions.
-                for idx, mol in enumerate(self._system):
-                    if not mol.isWater() and mol.nAtoms() > 1:
+                # each, excluding any water molecules or ions. The cached molecule
+                # types are used so that the solvent isn't re-examined.
+                for idx, mol_type in enumerate(self._system._getMoleculeTypes()):
+                    if mol_type not in ("water", "ion"):
+                        mol = self._system.getMolecule(idx)
+
                         # Create a GRO file from the molecule.
                         gro = _SireIO.Gro87(mol.toSystem()._sire_object)
 
@@ -1973,20 +1976,18 @@ class Gromacs(_process.Process):
             with _Utils.cd(self._work_dir):
 
                 # Locate the trajectory file.
-                traj_file = _find_trajectory_file()
+                traj_file = self._find_trajectory_file()
 
                 if traj_file is None:
                     return None
                 else:
                     self._traj_file = traj_file
 
-                # Use trjconv to get the frame closest to the current simulation time.
-                command = "echo 0 | %s trjconv -f %s -s %s -dump %f -o frame.gro -ndec 6" \
-                    % (self._exe, self._traj_file, self._gro_file, time.picoseconds().magnitude())
-
-                # Run the command.
-                proc = _subprocess.run(command, shell=True,
-                    stdout=_subprocess.PIPE, stderr=_subprocess.PIPE)
+                # Use the time index of the trajectory to find the frame
+                # closest to the requested time, then read it directly.
+                trajectory = _Trajectory(process=self)
+                index = trajectory._getFrameIndex(time, trajectory.nFrames(), "time")
+                trajectory._getReference(index).save_gro("frame.gro", precision=6)
 
                 # Read the frame file.
                 new_system = _IO.readMolecules(["frame.gro", self._top_file])
@@ -2008,7 +2009,7 @@ class Gromacs(_process.Process):
                 return old_system
 
         except:
-            _warnings.warn("Failed to extract trajectory frame with trjconv. "
+            _warnings.warn("Failed to extract trajectory frame. "
                            "Try running 'getSystem' again.")
             frame = "%s/frame.gro" % self._work_dir
             if _os.path.isfile(frame):
@@ -2048,6 +2049,8 @@ class Gromacs(_process.Process):
                                    "%d trr files found, %d xtc files found."
                                    % (num_trr, len(traj_file)))
                     return None
+
+            return traj_file
         else:
             return self._traj_file
 
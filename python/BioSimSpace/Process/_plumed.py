@@ -228,15 +228,8 @@ class Plumed():
                     raise __Exceptions.IncompatibleError("The collective variable is incompatible with the "
                         "system. Contains atom index %d, number of atoms in system is %d " % (idx, system.nAtoms()))
 
-                # Get the molecule numbers in this system.
-                mol_nums = system._sire_object.molNums()
-
-                # Loop over each molecule and find the one that contains this atom.
-                for x, num in enumerate(mol_nums):
-                    # The atom was in the previous molecule.
-                    if system._atom_index_tally[num] > idx:
-                        num = mol_nums[x-1]
-                        break
+                # Find the molecule that contains this atom.
+                num = system._mol_nums[system._getMoleculeIndex(idx)]
 
                 # This is a new molecule.
                 if num not in molecules:
@@ -248,7 +241,7 @@ class Plumed():
         # Create an entity for each unique molecule.
         for x, molecule in enumerate(molecules):
             # Get the start index.
-            idx = system._atom_index_tally[molecule]
+            idx = int(system._getOffsets()[system._molecule_index[molecule], 0])
 
             # Get the number of atoms in the molecule.
             num_atoms = system._sire_object.molecule(molecule).nAtoms()
@@ -30,6 +30,7 @@ __all__ = ["ProcessRunner"]
 
 import os as _os
 import tempfile as _tempfile
+import time as _time
 
 from BioSimSpace._SireWrappers import System as _System
 
@@ -190,6 +191,39 @@ class ProcessRunner():
             # Extend the list of procesess.
             self._processes.extend(self._nest_directories(processes, len(self._processes)))
 
+    def replaceProcess(self, index, process):
+        """Replace a process in the runner.
+
+           Parameters
+           ----------
+
+           index : int
+               The index of the process.
+
+           process : :class:`Process <BioSimSpace.Process>`
+               The new process.
+        """
+
+        if not isinstance(process, _Process):
+            raise TypeError("'process' must be of type 'BioSimSpace.Process'")
+
+        if process.isRunning():
+            raise ValueError("'process' must not be a running 'BioSimSpace.Process' object!")
+
+        if type(index) is not int:
+            raise TypeError("'index' must be of type 'int'")
+
+        if index < -len(self._processes) or index >= len(self._processes):
+            raise IndexError("'index' is out of range: [0-%d]" % (len(self._processes) - 1))
+
+        # Nest the directory inside the process runner's working directory.
+        if self._nest_dirs:
+            process = self._nest_directories([process])[0]
+
+        # Kill the existing process and replace it.
+        self._processes[index].kill()
+        self._processes[index] = process
+
     def removeProcess(self, index):
         """Remove a process from the runner.
 
@@ -406,32 +440,74 @@ class ProcessRunner():
         except IndexError:
             raise("'index' is out of range: [0-%d]" % len(self._processes))
 
-    def startAll(self):
-        """Start all of the processes."""
+    def startAll(self, num_workers=1):
+        """Start all of the processes. Any process that finishes in an error
+           state is restarted, up to a maximum of 5 attempts.
 
-        for p in self._processes:
-            # Initialise the error state.
-            is_error = True
+           Parameters
+           ----------
+
+           num_workers : int
+               The maximum number of processes that can run at the same time.
+               Further processes are queued until a running process finishes.
+        """
+
+        if type(num_workers) is not int:
+            raise TypeError("'num_workers' must be of type 'int'")
 
-            # Zero the tally of failed processes.
-            num_failed = 0
+        if num_workers < 1:
+            raise ValueError("'num_workers' must be at least 1.")
 
-            # Retry failed processes up to a maximum of 5 times.
-            while is_error:
+        # Run the processes in serial.
+        if num_workers == 1:
+            for p in self._processes:
                 # Start the process and wait for it to finish.
                 p.start()
-                p.wait()
+                self._wait(p)
 
-                # Check the error state.
-                is_error = p.isError()
+            return
 
-                # Increment the number of failures.
-                if is_error:
-                    num_failed += 1
+        # The indices of the processes that are waiting for a worker, and
+        # those that have been started.
+        queued = list(range(len(self._processes)))
+        running = []
 
-                    # Maximum retries reached, move to the next process.
-                    if num_failed == 5:
-                        break
+        # The tally of failures for each process.
+        num_failed = [0] * len(self._processes)
+
+        while len(queued) > 0 or len(running) > 0:
+            # Check the state of the running processes.
+            for idx in running.copy():
+                p = self._processes[idx]
+
+                if p.isRunning():
+                    continue
+
+                # Retry failed processes up to a maximum of 5 times.
+                if p.isError():
+                    num_failed[idx] += 1
+                    if num_failed[idx] < 5:
+                        p.start()
+                        continue
+
+                running.remove(idx)
+
+            # Start queued processes while there are free workers.
+            while len(queued) > 0 and len(running) < num_workers:
+                idx = queued.pop(0)
+                self._processes[idx].start()
+                running.append(idx)
+
+            if len(running) > 0:
+                _time.sleep(1)
+
+    def waitAll(self):
+        """Wait for all of the processes to finish. Any process that finishes
+           in an error state is restarted, up to a maximum of 5 attempts.
+        """
+
+        for p in self._processes:
+            self._wait(p)
 
     def kill(self, index):
         """Kill a specific process. The same can be achieved using:
@@ -480,6 +556,35 @@ class ProcessRunner():
 
         return run_time
 
+    def _wait(self, process):
+        """Helper function to wait for a process to finish, restarting it if
+           it is in an error state.
+
+           Parameters
+           ----------
+
+           process : :class:`Process <BioSimSpace.Process>`
+               The process.
+        """
+
+        process.wait()
+
+        # Zero the tally of failed processes.
+        num_failed = 0
+
+        # Retry failed processes up to a maximum of 5 times.
+        while process.isError():
+            # Increment the number of failures.
+            num_failed += 1
+
+            # Maximum retries reached, move to the next process.
+            if num_failed == 5:
+                break
+
+            # Restart the process and wait for it to finish.
+            process.start()
+            process.wait()
+
     def _nest_directories(self, processes):
         """Helper function to nest processes inside the runner's working
            directory.
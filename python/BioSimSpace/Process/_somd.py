@@ -205,14 +205,14 @@ class Somd(_process.Process):
                 # Extract the perturbable molecule.
                 pert_mol = system.getPerturbableMolecules()[0]
 
+                # Remove the perturbable molecule.
+                system.removeMolecules(pert_mol)
+
                 # Write the perturbation file and get the molecule corresponding
                 # to the lambda = 0 state.
                 pert_mol = pert_mol._toPertFile(self._pert_file, property_map=self._property_map)
                 self._input_files.append(self._pert_file)
 
-                # Remove the perturbable molecule.
-                system._sire_object.remove(pert_mol.number())
-
                 # Recreate the system, putting the perturbable molecule with
                 # renamed properties first.
                 updated_system = _System(pert_mol) + _System(system)
@@ -0,0 +1,480 @@
+######################################################################
+# BioSimSpace: Making biomolecular simulation a breeze!
+#
+# Copyright: 2017-2020
+#
+# Authors: Lester Hedges <lester.hedges@gmail.com>
+#
+# BioSimSpace is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# BioSimSpace is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BioSimSpace. If not, see <http://www.gnu.org/licenses/>.
+#####################################################################
+
+"""
+Functionality for running trajectory analyses in parallel. Trajectories are
+split into chunks of frames, which are read independently using the frame
+index, and analysis kernels are mapped over the chunks using a pool of
+worker processes.
+"""
+
+__author__ = "Lester Hedges"
+__email_ = "lester.hedges@gmail.com"
+
+__all__ = ["mapChunks", "concatenate", "mean", "rmsdKernel", "pairwiseRmsdKernel",
+           "alignedSumKernel", "distanceKernel", "contactKernel",
+           "radiusOfGyrationKernel", "hbondKernel", "sasaKernel"]
+
+from concurrent.futures import ProcessPoolExecutor as _ProcessPoolExecutor
+
+import mdtraj as _mdtraj
+import numpy as _np
+
+from scipy.spatial import cKDTree as _cKDTree
+
+from . import _index
+
+def mapChunks(kernel, traj_file, topology, chunk=100, num_workers=1,
+        atoms=None, kwargs=None):
+    """Map an analysis kernel over chunks of frames in a trajectory file.
+
+       Parameters
+       ----------
+
+       kernel : function
+           The analysis kernel. This is called with an MDTraj trajectory
+           for each chunk of frames, along with any keyword arguments. For
+           parallel execution this must be a module level function, so
+           that it can be sent to the worker processes.
+
+       traj_file : str
+           The trajectory file. This must support random access.
+
+       topology : mdtraj.core.topology.Topology
+           The topology for the trajectory.
+
+       chunk : int
+           The number of frames in each chunk.
+
+       num_workers : int
+           The number of worker processes. If 1, then the kernel is run in
+           the current process.
+
+       atoms : [int]
+           A list of atom indices to read. If None, all atoms are read.
+
+       kwargs : dict
+           Keyword arguments that are passed to the kernel. If None, then
+           no keyword arguments are passed.
+
+       Returns
+       -------
+
+       results : list
+           The result of the kernel for each chunk, in frame order.
+    """
+
+    if kwargs is None:
+        kwargs = {}
+
+    # Work out the frame ranges for each chunk.
+    n_frames = _index.getIndex(traj_file)["n_frames"]
+    ranges = [(x, min(x + chunk, n_frames)) for x in range(0, n_frames, chunk)]
+
+    # Run in the current process.
+    if num_workers == 1 or len(ranges) < 2:
+        return [_run_chunk(kernel, traj_file, topology, start, stop, atoms, kwargs)
+                    for start, stop in ranges]
+
+    # Map the kernel over the chunks using a pool of worker processes. The
+    # map preserves the order of the chunks.
+    num_workers = min(num_workers, len(ranges))
+    with _ProcessPoolExecutor(max_workers=num_workers) as executor:
+        results = executor.map(_run_chunk,
+                               [kernel] * len(ranges),
+                               [traj_file] * len(ranges),
+                               [topology] * len(ranges),
+                               [x[0] for x in ranges],
+                               [x[1] for x in ranges],
+                               [atoms] * len(ranges),
+                               [kwargs] * len(ranges))
+        return list(results)
+
+def concatenate(results):
+    """Reduce a list of per-chunk results by concatenating them in order.
+
+       Parameters
+       ----------
+
+       results : list
+           The result for each chunk.
+
+       Returns
+       -------
+
+       result : numpy.ndarray, list
+           The concatenated result.
+    """
+
+    if len(results) == 0:
+        return []
+
+    if all(isinstance(x, _np.ndarray) for x in results):
+        return _np.concatenate(results)
+
+    result = []
+    for x in results:
+        if isinstance(x, (list, tuple, _np.ndarray)):
+            result.extend(x)
+        else:
+            result.append(x)
+    return result
+
+def rmsdKernel(traj, reference, atoms=None):
+    """Compute the RMSD of each frame in a chunk relative to a reference.
+
+       Parameters
+       ----------
+
+       traj : mdtraj.core.trajectory.Trajectory
+           The chunk of frames.
+
+       reference : mdtraj.core.trajectory.Trajectory
+           The reference frame.
+
+       atoms : [int]
+           The atom indices used for the alignment and RMSD.
+
+       Returns
+       -------
+
+       rmsd : numpy.ndarray
+           The RMSD of each frame.
+    """
+    return _mdtraj.rmsd(traj, reference, 0, atoms)
+
+def pairwiseRmsdKernel(traj, reference):
+    """Compute the RMSD of each frame in a chunk relative to each frame in a
+       set of reference frames.
+
+       Parameters
+       ----------
+
+       traj : mdtraj.core.trajectory.Trajectory
+           The chunk of frames.
+
+       reference : mdtraj.core.trajectory.Trajectory
+           The reference frames.
+
+       Returns
+       -------
+
+       rmsd : numpy.ndarray
+           An array of shape (n_frames, n_reference) containing the RMSD
+           values.
+    """
+
+    rmsd = _np.zeros((traj.n_frames, reference.n_frames), dtype=_np.float32)
+
+    # Each call is vectorised over the frames in the chunk.
+    for x in range(0, reference.n_frames):
+        rmsd[:, x] = _mdtraj.rmsd(traj, reference, x)
+
+    return rmsd
+
+def alignedSumKernel(traj, reference, atoms=None, mean=None):
+    """Align the frames in a chunk to a reference, then sum the coordinates,
+       or the squared displacements from a mean structure. This is used
+       to compute the RMSF in two passes over the trajectory.
+
+       Parameters
+       ----------
+
+       traj : mdtraj.core.trajectory.Trajectory
+           The chunk of frames.
+
+       reference : mdtraj.core.trajectory.Trajectory
+           The reference frame.
+
+       atoms : [int]
+           The indices of the atoms of interest.
+
+       mean : numpy.ndarray
+           The mean coordinates of the atoms. If None, then the coordinates
+           are summed.
+
+       Returns
+       -------
+
+       (sum, n_frames) : (numpy.ndarray, int)
+           The sum and the number of frames in the chunk.
+    """
+
+    if atoms is None:
+        atoms = _np.arange(traj.n_atoms)
+
+    traj.superpose(reference, 0, atom_indices=atoms, ref_atom_indices=atoms)
+    xyz = traj.xyz[:, atoms].astype("float64")
+
+    if mean is None:
+        return (xyz.sum(axis=0), traj.n_frames)
+    else:
+        return (((xyz - mean)**2).sum(axis=(0, 2)), traj.n_frames)
+
+def mean(results):
+    """Reduce the per-chunk results of 'alignedSumKernel' to a mean.
+
+       Parameters
+       ----------
+
+       results : [(numpy.ndarray, int)]
+           The sum and number of frames for each chunk.
+
+       Returns
+       -------
+
+       mean : numpy.ndarray
+           The mean over all frames.
+    """
+    total = sum(x[0] for x in results)
+    n_frames = sum(x[1] for x in results)
+    return total / n_frames
+
+def distanceKernel(traj, pairs, periodic=True):
+    """Compute the distance between pairs of atoms for each frame in a chunk.
+
+       Parameters
+       ----------
+
+       traj : mdtraj.core.trajectory.Trajectory
+           The chunk of frames.
+
+       pairs : numpy.ndarray
+           An array of shape (n_pairs, 2) containing the atom index pairs.
+
+       periodic : bool
+           Whether to use the minimum image convention.
+
+       Returns
+       -------
+
+       distances : numpy.ndarray
+           An array of shape (n_frames, n_pairs) containing the distances.
+    """
+    return _mdtraj.compute_distances(traj, pairs, periodic=periodic)
+
+def contactKernel(traj, atoms0, atoms1=None, cutoff=0.45, periodic=True):
+    """Count the number of atom pairs within a cutoff for each frame in a
+       chunk. Pairs are found using a neighbour search, so the cost depends
+       on the number of atoms rather than the number of atom pairs.
+
+       Parameters
+       ----------
+
+       traj : mdtraj.core.trajectory.Trajectory
+           The chunk of frames.
+
+       atoms0 : numpy.ndarray
+           The indices of the atoms in the first selection.
+
+       atoms1 : numpy.ndarray
+           The indices of the atoms in the second selection. If None, then
+           pairs of distinct atoms within the first selection are counted.
+
+       cutoff : float
+           The contact cutoff in nanometers.
+
+       periodic : bool
+           Whether to use the minimum image convention.
+
+       Returns
+       -------
+
+       contacts : numpy.ndarray
+           The number of contacts in each frame.
+    """
+
+    atoms0 = _np.asarray(atoms0)
+    if atoms1 is not None:
+        atoms1 = _np.asarray(atoms1)
+
+    is_periodic = periodic and traj.unitcell_lengths is not None
+
+    # The KD-tree only supports orthorhombic boxes, so use an MDTraj
+    # neighbour list for triclinic boxes.
+    if is_periodic and not _np.allclose(traj.unitcell_angles, 90):
+        return _neighbourListContacts(traj, atoms0, atoms1, cutoff)
+
+    # The KD-tree counts pairs up to and including the search radius, so
+    # reduce it slightly so that only pairs closer than the cutoff count.
+    radius = _np.nextafter(cutoff, 0)
+
+    contacts = _np.zeros(traj.n_frames, dtype=int)
+
+    for x in range(traj.n_frames):
+        xyz = traj.xyz[x].astype("float64")
+
+        # Wrap the coordinates into the periodic box. Rounding can leave a
+        # coordinate on the upper edge, which is the same as the lower edge.
+        if is_periodic:
+            box = traj.unitcell_lengths[x].astype("float64")
+            xyz = xyz - box * _np.floor(xyz / box)
+            xyz[xyz >= box] = 0
+        else:
+            box = None
+
+        tree0 = _cKDTree(xyz[atoms0], boxsize=box)
+
+        # Each pair is counted in both directions, as is each atom with itself.
+        if atoms1 is None:
+            contacts[x] = (tree0.count_neighbors(tree0, radius) - len(atoms0)) // 2
+
+        # Remove the atoms that are in both selections, paired with themselves.
+        else:
+            tree1 = _cKDTree(xyz[atoms1], boxsize=box)
+            contacts[x] = tree0.count_neighbors(tree1, radius) \
+                        - len(_np.intersect1d(atoms0, atoms1))
+
+    return contacts
+
+def radiusOfGyrationKernel(traj, masses, atoms=None):
+    """Compute the mass weighted radius of gyration for each frame in a chunk.
+
+       Parameters
+       ----------
+
+       traj : mdtraj.core.trajectory.Trajectory
+           The chunk of frames.
+
+       masses : numpy.ndarray
+           The mass of each atom of interest.
+
+       atoms : [int]
+           The indices of the atoms of interest. If None, all atoms are used.
+
+       Returns
+       -------
+
+       radius_of_gyration : numpy.ndarray
+           The radius of gyration of each frame.
+    """
+
+    if atoms is None:
+        xyz = traj.xyz.astype("float64")
+    else:
+        xyz = traj.xyz[:, atoms].astype("float64")
+
+    weights = masses / masses.sum()
+    com = _np.einsum("fai,a->fi", xyz, weights)
+    return _np.sqrt(_np.einsum("fa,a->f", ((xyz - com[:, None, :])**2).sum(axis=2), weights))
+
+def hbondKernel(traj, atoms=None, periodic=True):
+    """Find the hydrogen bonds in each frame in a chunk using the criterion
+       of Wernet and Nilsson.
+
+       Parameters
+       ----------
+
+       traj : mdtraj.core.trajectory.Trajectory
+           The chunk of frames.
+
+       atoms : [int]
+           The indices of the atoms of interest. Only hydrogen bonds where
+           both the donor and acceptor are in this list are kept. If None,
+           all hydrogen bonds are kept.
+
+       periodic : bool
+           Whether to use the minimum image convention.
+
+       Returns
+       -------
+
+       hbonds : [numpy.ndarray]
+           An array of shape (n_hbonds, 3) for each frame, containing the
+           donor, hydrogen, and acceptor atom indices.
+    """
+
+    hbonds = _mdtraj.wernet_nilsson(traj, periodic=periodic)
+
+    if atoms is not None:
+        hbonds = [x[_np.isin(x[:, 0], atoms) & _np.isin(x[:, 2], atoms)] for x in hbonds]
+
+    return hbonds
+
+def sasaKernel(traj, atoms=None, probe_radius=0.14):
+    """Compute the solvent accessible surface area for each frame in a chunk
+       using the Shrake-Rupley algorithm.
+
+       Parameters
+       ----------
+
+       traj : mdtraj.core.trajectory.Trajectory
+           The chunk of frames.
+
+       atoms : [int]
+           The indices of the atoms of interest. The surface area is computed
+           in the presence of all atoms, then summed over these atoms. If
+           None, all atoms are used.
+
+       probe_radius : float
+           The radius of the solvent probe in nanometers.
+
+       Returns
+       -------
+
+       sasa : numpy.ndarray
+           The surface area of each frame.
+    """
+
+    sasa = _mdtraj.shrake_rupley(traj, probe_radius=probe_radius, mode="atom")
+
+    if atoms is None:
+        return sasa.sum(axis=1)
+    else:
+        return sasa[:, atoms].sum(axis=1)
+
+def _neighbourListContacts(traj, atoms0, atoms1, cutoff):
+    """Internal helper function to count the number of atom pairs within a
+       cutoff for each frame in a chunk with a triclinic periodic box.
+    """
+
+    # Only keep the atoms in the selections.
+    if atoms1 is None:
+        atoms = atoms0
+    else:
+        atoms = _np.union1d(atoms0, atoms1)
+    traj = traj.atom_slice(atoms)
+
+    # Flag the atoms in each selection.
+    is_atom0 = _np.isin(atoms, atoms0)
+    if atoms1 is None:
+        is_atom1 = is_atom0
+    else:
+        is_atom1 = _np.isin(atoms, atoms1)
+
+    contacts = _np.zeros(traj.n_frames, dtype=int)
+
+    for x in range(traj.n_frames):
+        # Get the neighbours of each atom. These exclude the atom itself.
+        neighbours = _mdtraj.compute_neighborlist(traj, cutoff, frame=x, periodic=True)
+
+        contacts[x] = sum(is_atom1[neighbours[y]].sum() for y in _np.where(is_atom0)[0])
+
+    # Each pair within a single selection is counted in both directions.
+    if atoms1 is None:
+        contacts //= 2
+
+    return contacts
+
+def _run_chunk(kernel, traj_file, topology, start, stop, atoms, kwargs):
+    """Internal helper function to read a chunk of frames and apply a kernel."""
+    traj = _index.readFrames(traj_file, topology, range(start, stop), atoms)
+    return kernel(traj, **kwargs)
@@ -0,0 +1,129 @@
+######################################################################
+# BioSimSpace: Making biomolecular simulation a breeze!
+#
+# Copyright: 2017-2020
+#
+# Authors: Lester Hedges <lester.hedges@gmail.com>
+#
+# BioSimSpace is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# BioSimSpace is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BioSimSpace. If not, see <http://www.gnu.org/licenses/>.
+#####################################################################
+
+"""
+Functionality for clustering trajectory frames from a matrix of pairwise
+distances.
+"""
+
+__author__ = "Lester Hedges"
+__email_ = "lester.hedges@gmail.com"
+
+__all__ = ["gromos", "kMedoids"]
+
+import numpy as _np
+
+def kMedoids(distances, num_clusters, max_iterations=100):
+    """Partition a set of frames into clusters using the k-medoids algorithm.
+       Medoids are initialised deterministically, starting from the most
+       central frame and repeatedly adding the frame furthest from the
+       existing medoids.
+
+       Parameters
+       ----------
+
+       distances : numpy.ndarray
+           A square matrix of pairwise distances.
+
+       num_clusters : int
+           The number of clusters.
+
+       max_iterations : int
+           The maximum number of iterations.
+
+       Returns
+       -------
+
+       medoids : numpy.ndarray
+           The index of the medoid of each cluster.
+    """
+
+    num_frames = distances.shape[0]
+    num_clusters = min(num_clusters, num_frames)
+
+    # Initialise the medoids.
+    medoids = [int(_np.argmin(distances.sum(axis=1)))]
+    min_dist = distances[medoids[0]].copy()
+    while len(medoids) < num_clusters:
+        medoid = int(_np.argmax(min_dist))
+        medoids.append(medoid)
+        min_dist = _np.minimum(min_dist, distances[medoid])
+    medoids = _np.array(medoids)
+
+    for x in range(0, max_iterations):
+        # Assign each frame to its closest medoid.
+        labels = _np.argmin(distances[:, medoids], axis=1)
+
+        # Update each medoid to the member with the smallest total distance
+        # to the other members of the cluster.
+        new_medoids = medoids.copy()
+        for y in range(0, num_clusters):
+            members = _np.flatnonzero(labels == y)
+            if len(members) > 0:
+                cost = distances[_np.ix_(members, members)].sum(axis=1)
+                new_medoids[y] = members[_np.argmin(cost)]
+
+        # The medoids have converged.
+        if (new_medoids == medoids).all():
+            break
+
+        medoids = new_medoids
+
+    return medoids
+
+def gromos(distances, cutoff):
+    """Cluster a set of frames using the GROMOS algorithm of Daura et al. The
+       frame with the most neighbours within the cutoff is taken as the centre
+       of the first cluster, and it is removed along with its neighbours. This
+       is repeated until no frames remain.
+
+       Parameters
+       ----------
+
+       distances : numpy.ndarray
+           A square matrix of pairwise distances.
+
+       cutoff : float
+           The neighbour cutoff, in the same units as the distances.
+
+       Returns
+       -------
+
+       centres : numpy.ndarray
+           The index of the central frame of each cluster.
+    """
+
+    neighbours = distances <= cutoff
+    remaining = _np.ones(distances.shape[0], dtype=bool)
+
+    centres = []
+    while remaining.any():
+        # Count the remaining neighbours of each remaining frame.
+        counts = (neighbours & remaining).sum(axis=1)
+        counts[~remaining] = -1
+
+        centre = int(_np.argmax(counts))
+        centres.append(centre)
+
+        remaining &= ~neighbours[centre]
+        remaining[centre] = False
+
+    return _np.array(centres)
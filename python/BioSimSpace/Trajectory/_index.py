@@ -0,0 +1,680 @@
+######################################################################
+# BioSimSpace: Making biomolecular simulation a breeze!
+#
+# Copyright: 2017-2020
+#
+# Authors: Lester Hedges <lester.hedges@gmail.com>
+#
+# BioSimSpace is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# BioSimSpace is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BioSimSpace. If not, see <http://www.gnu.org/licenses/>.
+#####################################################################
+
+"""
+Functionality for indexing trajectory files, allowing random access to
+individual frames without loading the entire trajectory.
+"""
+
+__author__ = "Lester Hedges"
+__email_ = "lester.hedges@gmail.com"
+
+__all__ = ["findFrame", "findFrames", "getIndex", "isIndexable", "memoryMap", "readFrames"]
+
+import mdtraj as _mdtraj
+import mmap as _mmap
+import numpy as _np
+import os as _os
+import struct as _struct
+import warnings as _warnings
+
+from scipy.io import netcdf_file as _netcdf_file
+
+# The trajectory formats that can be indexed, keyed by file extension.
+_formats = { "dcd"    : "DCD",
+             "nc"     : "NETCDF",
+             "ncdf"   : "NETCDF",
+             "netcdf" : "NETCDF",
+             "trr"    : "TRR",
+             "xtc"    : "XTC" }
+
+# An in-memory cache of frame indices, keyed by the path to the trajectory.
+_index_cache = {}
+
+# An in-memory cache of memory-mapped coordinate arrays, keyed by the path to
+# the trajectory. Each entry holds the file handle that backs the array.
+_mmap_cache = {}
+_mmap_cache_size = 4
+
+def isIndexable(traj_file):
+    """Whether the trajectory file format supports random access.
+
+       Parameters
+       ----------
+
+       traj_file : str
+           The trajectory file.
+
+       Returns
+       -------
+
+       is_indexable : bool
+           Whether the file can be indexed.
+    """
+    return _format(traj_file) is not None
+
+def getIndex(traj_file):
+    """Get the frame index for a trajectory file. The index is built once and
+       cached beside the trajectory. It is rebuilt if the size or modification
+       time of the trajectory changes.
+
+       Parameters
+       ----------
+
+       traj_file : str
+           The trajectory file.
+
+       Returns
+       -------
+
+       index : dict
+           The frame index. This contains the number of frames, "n_frames",
+           the byte offset of each frame, "offsets", where the format
+           requires it, and the time stamp of each frame in picoseconds,
+           "times", where the format stores it. Partially written frames at the end of the file are
+           ignored, and the index of a GROMACS trajectory that has grown
+           since it was last indexed is extended, rather than rebuilt.
+    """
+
+    format = _format(traj_file)
+    if format is None:
+        raise ValueError("Unsupported trajectory format: '%s'" % traj_file)
+
+    path = _os.path.abspath(traj_file)
+    key = _key(path)
+
+    # Check the in-memory cache.
+    previous = _index_cache.get(path)
+
+    # Check the cache file beside the trajectory.
+    index_file = _index_file(path)
+    if previous is None and _os.path.isfile(index_file):
+        try:
+            with _np.load(index_file) as data:
+                previous = { "key"      : tuple(int(x) for x in data["key"]),
+                             "n_frames" : int(data["n_frames"]),
+                             "offsets"  : data["offsets"],
+                             "times"    : data["times"],
+                             "end"      : int(data["end"]) }
+        except:
+            previous = None
+
+    # The index is up to date.
+    if previous is not None and previous["key"] == key:
+        _index_cache[path] = previous
+        return previous
+
+    index = None
+
+    # The trajectory has grown, e.g. it is still being written, so only
+    # index the new frames.
+    if previous is not None and format in ["TRR", "XTC"] and key[0] >= previous["key"][0]:
+        try:
+            index = _extend_index(path, format, previous)
+        except:
+            index = None
+
+    # Build the index from scratch.
+    if index is None:
+        index = _build_index(path, format)
+
+    index["key"] = key
+
+    # Write the index to file. This is non-fatal, since the trajectory
+    # may be in a read-only location.
+    try:
+        with open(index_file, "wb") as file:
+            _np.savez(file, key=_np.array(key, dtype=_np.int64),
+                      n_frames=index["n_frames"], offsets=index["offsets"],
+                      times=index["times"], end=index["end"])
+    except:
+        pass
+
+    _index_cache[path] = index
+
+    return index
+
+def readFrames(traj_file, topology, indices, atoms=None):
+    """Read specific frames from a trajectory file by seeking directly to
+       each frame.
+
+       Parameters
+       ----------
+
+       traj_file : str
+           The trajectory file.
+
+       topology : mdtraj.core.topology.Topology
+           The topology for the trajectory.
+
+       indices : [int]
+           The indices of the frames to read. Negative indices are
+           counted from the end of the trajectory.
+
+       atoms : [int]
+           A list of atom indices to read. If None, all atoms are read.
+
+       Returns
+       -------
+
+       trajectory : mdtraj.core.trajectory.Trajectory
+           A trajectory containing the requested frames.
+    """
+
+    index = getIndex(traj_file)
+    n_frames = index["n_frames"]
+
+    # Convert negative indices and make sure that all indices are in range.
+    indices = list(indices)
+    for x, idx in enumerate(indices):
+        if idx < 0:
+            idx += n_frames
+        if idx < 0 or idx >= n_frames:
+            raise ValueError("Frame index (%d) of of range (0 to %d)." % (indices[x], n_frames - 1))
+        indices[x] = idx
+
+    frames = []
+    with _mdtraj.open(traj_file) as file:
+        # Use the cached offsets rather than scanning the file.
+        if _format(traj_file) in ["TRR", "XTC"]:
+            file.offsets = index["offsets"]
+
+        # Read each run of consecutive frames in a single call.
+        x = 0
+        while x < len(indices):
+            num = 1
+            while x + num < len(indices) and indices[x + num] == indices[x] + num:
+                num += 1
+
+            file.seek(indices[x])
+            frames.append(file.read_as_traj(topology, n_frames=num, atom_indices=atoms))
+
+            x += num
+
+    return _mdtraj.join(frames, check_topology=False)
+
+def findFrame(times, time):
+    """Find the frame with the time stamp closest to a given time using a
+       binary search.
+
+       Parameters
+       ----------
+
+       times : numpy.ndarray
+           The time stamp of each frame. These must be in ascending order.
+
+       time : float
+           The time value, in the same units as the time stamps.
+
+       Returns
+       -------
+
+       index : int
+           The index of the closest frame.
+    """
+
+    if len(times) == 0:
+        raise ValueError("The trajectory contains no frames!")
+
+    idx = int(_np.searchsorted(times, time))
+
+    # The time lies beyond the first or last frame.
+    if idx == 0:
+        return 0
+    if idx == len(times):
+        return len(times) - 1
+
+    # Pick the closest of the neighbouring frames.
+    if time - times[idx - 1] <= times[idx] - time:
+        return idx - 1
+    else:
+        return idx
+
+def findFrames(times, start=None, end=None):
+    """Find the range of frames with time stamps within a time window using
+       a binary search.
+
+       Parameters
+       ----------
+
+       times : numpy.ndarray
+           The time stamp of each frame. These must be in ascending order.
+
+       start : float
+           The start of the window (inclusive). If None, the window starts
+           at the first frame.
+
+       end : float
+           The end of the window (inclusive). If None, the window ends at
+           the last frame.
+
+       Returns
+       -------
+
+       frames : range
+           The indices of the frames within the window.
+    """
+
+    first = 0 if start is None else int(_np.searchsorted(times, start, side="left"))
+    last = len(times) if end is None else int(_np.searchsorted(times, end, side="right"))
+
+    return range(first, max(first, last))
+
+def memoryMap(traj_file):
+    """Return a read-only memory-mapped array of the coordinates in a DCD or
+       NetCDF trajectory file.
+
+       Parameters
+       ----------
+
+       traj_file : str
+           The trajectory file.
+
+       Returns
+       -------
+
+       coordinates : numpy.ndarray
+           An array of shape (n_frames, n_atoms, 3) containing the
+           coordinates in Angstrom. None if the file can't be memory
+           mapped.
+    """
+
+    format = _format(traj_file)
+    if format not in ["DCD", "NETCDF"]:
+        return None
+
+    path = _os.path.abspath(traj_file)
+    key = _key(path)
+
+    # Check the in-memory cache.
+    try:
+        cached_key, _, coordinates = _mmap_cache[path]
+        if cached_key == key:
+            return coordinates
+    except KeyError:
+        pass
+
+    # Release any stale entry for this file, then evict the oldest entry if
+    # the cache is full.
+    _release_mmap(path)
+    if len(_mmap_cache) >= _mmap_cache_size:
+        _release_mmap(next(iter(_mmap_cache)))
+
+    handle = None
+
+    try:
+        if format == "DCD":
+            layout = _dcd_layout(path)
+            if layout is None:
+                return None
+            n_frames, n_atoms, header_bytes, frame_bytes, x_offset, dtype = layout
+
+            with open(path, "rb") as file:
+                handle = _mmap.mmap(file.fileno(), 0, access=_mmap.ACCESS_READ)
+
+            # Create a strided view of the x, y, and z records of each frame,
+            # then swap the last two axes to give (n_frames, n_atoms, 3).
+            coordinates = _np.ndarray(shape=(n_frames, 3, n_atoms), dtype=dtype,
+                                      buffer=handle, offset=header_bytes + x_offset,
+                                      strides=(frame_bytes, 4*n_atoms + 8, 4))
+            coordinates = coordinates.transpose(0, 2, 1)
+
+        else:
+            # The file handle must be kept open while the array is in use.
+            handle = _netcdf_file(path, mode="r", mmap=True)
+            coordinates = handle.variables["coordinates"].data
+
+    except:
+        if handle is not None:
+            _close_mmap(handle)
+        return None
+
+    _mmap_cache[path] = (key, handle, coordinates)
+
+    return coordinates
+
+def _release_mmap(path):
+    """Internal helper function to remove a memory-mapped array from the
+       cache and close the file handle that backs it.
+
+       Parameters
+       ----------
+
+       path : str
+           The absolute path to the trajectory file.
+    """
+
+    try:
+        _, handle, coordinates = _mmap_cache.pop(path)
+    except KeyError:
+        return
+
+    # Drop the cached reference to the array before closing the handle.
+    del coordinates
+    _close_mmap(handle)
+
+def _close_mmap(handle):
+    """Internal helper function to close the file handle backing a
+       memory-mapped array. If arrays that refer to the mapped data are still
+       in use elsewhere, then the mapping is released once they are garbage
+       collected.
+
+       Parameters
+       ----------
+
+       handle : mmap.mmap, scipy.io.netcdf_file
+           The file handle.
+    """
+
+    with _warnings.catch_warnings():
+        _warnings.simplefilter("ignore", RuntimeWarning)
+        try:
+            handle.close()
+        except BufferError:
+            pass
+
+def _format(traj_file):
+    """Internal helper function to get the format of a trajectory file from
+       its extension.
+    """
+    extension = _os.path.splitext(traj_file)[1][1:].lower()
+    return _formats.get(extension)
+
+def _key(path):
+    """Internal helper function to get the cache key for a file."""
+    stat = _os.stat(path)
+    return (stat.st_size, stat.st_mtime_ns)
+
+def _index_file(path):
+    """Internal helper function to get the path of the index cache file."""
+    dirname, basename = _os.path.split(path)
+    return _os.path.join(dirname, ".%s.index.npz" % basename)
+
+def _build_index(path, format):
+    """Internal helper function to build the frame index for a file."""
+
+    offsets = _np.zeros(0, dtype=_np.int64)
+    times = _np.zeros(0, dtype=_np.float64)
+    end = 0
+
+    # GROMACS formats have variable length frames, so we need to store the
+    # byte offset of each frame. The time stamps are read from the frame
+    # headers.
+    if format in ["TRR", "XTC"]:
+        with open(path, "rb") as file:
+            offsets, times, end = _scan_frames(file, format, 0, _os.path.getsize(path))
+        offsets = _np.array(offsets, dtype=_np.int64)
+        times = _np.array(times, dtype=_np.float64)
+        n_frames = len(offsets)
+
+    # DCD frames have a fixed length, so the number of frames can be worked
+    # out from the header and the size of the file.
+    elif format == "DCD":
+        layout = _dcd_layout(path)
+        if layout is None:
+            with _mdtraj.open(path) as file:
+                n_frames = len(file)
+        else:
+            n_frames = layout[0]
+            times = _dcd_times(path, n_frames)
+
+    # NetCDF stores the number of frames in the header, along with the time
+    # stamp of each frame.
+    else:
+        with _mdtraj.open(path) as file:
+            n_frames = len(file)
+        try:
+            handle = _netcdf_file(path, mode="r", mmap=False)
+            try:
+                times = _np.array(handle.variables["time"].data[:n_frames], dtype=_np.float64)
+            finally:
+                handle.close()
+        except:
+            pass
+
+    return { "n_frames" : n_frames,
+             "offsets"  : offsets,
+             "times"    : times,
+             "end"      : end }
+
+def _extend_index(path, format, index):
+    """Internal helper function to extend the frame index of a GROMACS
+       trajectory file that has grown since it was indexed.
+    """
+
+    with open(path, "rb") as file:
+        new_offsets, new_times, end = _scan_frames(file, format, index["end"], _os.path.getsize(path))
+
+    offsets = _np.concatenate([index["offsets"], _np.array(new_offsets, dtype=_np.int64)])
+    times = _np.concatenate([index["times"], _np.array(new_times, dtype=_np.float64)])
+
+    return { "n_frames" : len(offsets),
+             "offsets"  : offsets,
+             "times"    : times,
+             "end"      : end }
+
+def _scan_frames(file, format, offset, size):
+    """Internal helper function to find the byte offsets and time stamps of
+       the complete frames in a GROMACS XTC or TRR file by reading the header
+       of each frame.
+
+       Parameters
+       ----------
+
+       file : file
+           The trajectory file, opened in binary mode.
+
+       format : str
+           The format of the file, "XTC" or "TRR".
+
+       offset : int
+           The byte offset at which to start scanning. This must be the
+           start of a frame.
+
+       size : int
+           The size of the file in bytes.
+
+       Returns
+       -------
+
+       (offsets, times, end) : ([int], [float], int)
+           The byte offsets and time stamps (in picoseconds) of each complete
+           frame, and the end of the last complete frame. Any partially
+           written frame at the end of the file is ignored.
+    """
+
+    offsets = []
+    times = []
+
+    while True:
+        file.seek(offset)
+        header = file.read(100)
+
+        if format == "XTC":
+            if len(header) < 56:
+                break
+
+            magic, num_atoms = _struct.unpack(">ii", header[:8])
+            if magic != 1995:
+                raise IOError("Invalid XTC frame header at byte %d" % offset)
+
+            # The header stores the step and time after the number of atoms.
+            time = _struct.unpack(">f", header[12:16])[0]
+
+            # Small systems are stored uncompressed.
+            if num_atoms <= 9:
+                frame_size = 56 + 12*num_atoms
+
+            # Otherwise, the header is followed by the size of the compressed
+            # coordinates, which are padded to a multiple of 4 bytes.
+            else:
+                if len(header) < 92:
+                    break
+                num_bytes = _struct.unpack(">i", header[88:92])[0]
+                frame_size = 92 + 4*((num_bytes + 3) // 4)
+
+        else:
+            if len(header) < 76:
+                break
+
+            magic = _struct.unpack(">i", header[:4])[0]
+            if magic != 1993:
+                raise IOError("Invalid TRR frame header at byte %d" % offset)
+
+            # The sizes of each block in the frame, followed by the number of atoms.
+            sizes = _struct.unpack(">13i", header[24:76])
+            num_atoms = sizes[10]
+
+            # Work out whether the file is single or double precision.
+            if sizes[2] > 0:
+                real_size = sizes[2] // 9
+            elif num_atoms > 0:
+                real_size = max(sizes[7:10]) // (3*num_atoms)
+            else:
+                real_size = 4
+
+            # The header is followed by the time and lambda values.
+            if len(header) < 76 + real_size:
+                break
+            if real_size == 8:
+                time = _struct.unpack(">d", header[76:84])[0]
+            else:
+                time = _struct.unpack(">f", header[76:80])[0]
+            frame_size = 76 + 2*real_size + sum(sizes[:10])
+
+        # This frame is incomplete.
+        if offset + frame_size > size:
+            break
+
+        offsets.append(offset)
+        times.append(time)
+        offset += frame_size
+
+    return (offsets, times, offset)
+
+def _dcd_layout(path):
+    """Internal helper function to parse the layout of a DCD file.
+
+       Returns
+       -------
+
+       layout : (int, int, int, int, int, numpy.dtype)
+           The number of frames, number of atoms, size of the header in bytes,
+           size of each frame in bytes, offset of the x coordinates from the
+           start of each frame, and the coordinate data type. None if the
+           layout isn't supported, e.g. DCD files with fixed atoms.
+    """
+
+    with open(path, "rb") as file:
+        # Work out the byte order from the size of the first record.
+        data = file.read(4)
+        if len(data) < 4:
+            return None
+        if _struct.unpack("<i", data)[0] == 84:
+            endian = "<"
+        elif _struct.unpack(">i", data)[0] == 84:
+            endian = ">"
+        else:
+            return None
+
+        # The first record: "CORD" followed by 20 control integers.
+        data = file.read(88)
+        if data[:4] != b"CORD":
+            return None
+        control = _struct.unpack(endian + "20i", data[4:84])
+
+        # Fixed atoms aren't supported.
+        if control[8] != 0:
+            return None
+
+        # Whether this is a CHARMM format file with unit cell information,
+        # and whether the file contains 4D coordinates.
+        is_charmm = control[19] != 0
+        has_cell = is_charmm and control[10] != 0
+        has_4d = is_charmm and control[11] == 1
+
+        # The title record.
+        size = _struct.unpack(endian + "i", file.read(4))[0]
+        file.seek(size + 4, 1)
+
+        # The number of atoms record.
+        file.read(4)
+        n_atoms = _struct.unpack(endian + "i", file.read(4))[0]
+        file.read(4)
+
+        header_bytes = file.tell()
+
+    # Work out the size of each frame.
+    coord_bytes = 4*n_atoms + 8
+    if has_4d:
+        frame_bytes = 4*coord_bytes
+    else:
+        frame_bytes = 3*coord_bytes
+    x_offset = 4
+    if has_cell:
+        frame_bytes += 56
+        x_offset += 56
+
+    # Only count complete frames. (The header may be out of date if the
+    # trajectory is still being written.)
+    n_frames = (_os.path.getsize(path) - header_bytes) // frame_bytes
+
+    return (n_frames, n_atoms, header_bytes, frame_bytes, x_offset,
+            _np.dtype(endian + "f4"))
+
+def _dcd_times(path, n_frames):
+    """Internal helper function to work out the time stamps of the frames in a
+       DCD file from the header, which stores the first step, the number of
+       steps between frames, and the integration time step.
+
+       Returns
+       -------
+
+       times : numpy.ndarray
+           The time stamp of each frame in picoseconds. This is empty if the
+           header doesn't contain the timing information.
+    """
+
+    # The AKMA time unit in picoseconds.
+    akma = 0.04888821
+
+    with open(path, "rb") as file:
+        data = file.read(4)
+        if _struct.unpack("<i", data)[0] == 84:
+            endian = "<"
+        else:
+            endian = ">"
+        data = file.read(88)
+
+    control = _struct.unpack(endian + "20i", data[4:84])
+    start, interval = control[1], control[2]
+
+    # The time step is a 32-bit float in CHARMM files and a 64-bit float in
+    # X-PLOR files.
+    if control[19] != 0:
+        timestep = _struct.unpack(endian + "f", data[40:44])[0]
+    else:
+        timestep = _struct.unpack(endian + "d", data[40:48])[0]
+
+    if interval <= 0 or timestep <= 0:
+        return _np.zeros(0, dtype=_np.float64)
+
+    return (start + interval*_np.arange(n_frames, dtype=_np.float64)) * timestep * akma
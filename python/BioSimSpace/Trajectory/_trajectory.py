@@ -29,27 +29,61 @@ __email_ = "lester.hedges@gmail.com"
 __all__ = ["getFrame", "Trajectory"]
 
 import MDAnalysis as _mdanalysis
+from MDAnalysis.topology.core import get_parser_for as _get_parser_for
 import mdtraj as _mdtraj
+import numpy as _np
 import os as _os
 import shutil as _shutil
+import tempfile as _tempfile
 import warnings as _warnings
 
 from Sire import IO as _SireIO
+from Sire import Maths as _SireMaths
 from Sire import Mol as _SireMol
+from Sire import Vol as _SireVol
 
 from BioSimSpace import _isVerbose
 from BioSimSpace._Exceptions import IncompatibleError as _IncompatibleError
 from BioSimSpace.Process._process import Process as _Process
 from BioSimSpace._SireWrappers import System as _System
+from BioSimSpace.Types import Length as _Length
 from BioSimSpace.Types import Time as _Time
 
 from BioSimSpace import IO as _IO
 from BioSimSpace import _SireWrappers as _SireWrappers
 
+from . import _analysis
+from . import _cluster
+from . import _index
+
 # A dictionary mapping the Sire file format extension to those expected by MDTraj.
 _extensions = { "Gro87" : "gro",
                 "PRM7"   : "parm7" }
 
+# Topology file extensions that are recognised by MDTraj.
+_mdtraj_extensions = ["arc", "gro", "h5", "hdf5", "hoomdxml", "lh5", "mol2",
+                      "parm7", "pdb", "prm7", "prmtop", "psf"]
+
+# A dictionary mapping MDTraj topology extensions to MDAnalysis formats.
+_mdanalysis_formats = { "parm7"  : "PRMTOP",
+                        "prm7"   : "PRMTOP",
+                        "prmtop" : "PRMTOP" }
+
+# Trajectory formats supported by Trajectory.write, mapped to the MDTraj
+# file class used to stream frames to disk.
+_write_formats = { "dcd" : _mdtraj.formats.DCDTrajectoryFile,
+                   "nc"  : _mdtraj.formats.NetCDFTrajectoryFile,
+                   "xtc" : _mdtraj.formats.XTCTrajectoryFile }
+
+# A cache of topology information, keyed by the path to the topology file.
+_topology_cache = {}
+_topology_cache_size = 8
+
+# A cache of template systems used to convert trajectory frames into System
+# objects, keyed by the path, size, and modification time of the topology.
+_template_cache = {}
+_template_cache_size = 4
+
 def getFrame(trajectory, topology, index):
     """Extract a single frame from a trajectory file.
 
@@ -83,52 +117,16 @@ def getFrame(trajectory, topology, index):
 
     # Try to load the frame.
     try:
-        frame = _mdtraj.load_frame(trajectory, index, top=topology)
-    except:
-        # Get the file format of the topology file.
-        try:
-            # Load the topology file to determine the file format.
-            file_format = _IO.readMolecules(topology).fileFormat()
-
-            # Set the extension.
-            extension = _extensions.get(file_format, file_format.lower())
-
-            # Set the path to the temporary topology file.
-            top_file = _os.getcwd() + "/.topology." + extension
-
-            # Copy the topology to a file with the correct extension.
-            _shutil.copyfile(topology, top_file)
-
-            frame = _mdtraj.load_frame(trajectory, index, top=top_file)
-        except:
-            _os.remove(top_file)
-            raise IOError("MDTraj failed to read frame %d from: traj=%s, top=%s" % (index, trajectory, topology))
-
-        # Remove the temporary topology file.
-        _os.remove(top_file)
-
-    # The name of the frame coordinate file.
-    frame_file = ".frame.nc"
-
-    # Save the coordinates to file.
-    frame.save(frame_file)
-
-    # Load the frame into a System object.
-    try:
-        system = _System(_SireIO.MoleculeParser.read([topology, frame_file]))
+        frame = _mdtraj.load_frame(trajectory, index, top=_get_mdtraj_topology(topology))
     except Exception as e:
-        _os.remove(frame_file)
-        msg = "Failed to read trajectory frame: '%s'" % frame_file
+        msg = "MDTraj failed to read frame %d from: traj=%s, top=%s" % (index, trajectory, topology)
         if _isVerbose():
             raise IOError(msg) from e
         else:
             raise IOError(msg) from None
 
-    # Remove the temporary frame coordinate file.
-    _os.remove(frame_file)
-
-    # Return the system.
-    return system
+    # Convert the frame to a System object.
+    return _frame_to_system(frame, topology)
 
 class Trajectory():
     """A class for reading a manipulating biomolecular trajectories."""
@@ -194,8 +192,15 @@ class Trajectory():
             raise ValueError("BioSimSpace.Trajectory requires a BioSimSpace.Process object, "
                              "or a trajectory and topology file.")
 
-        # Get the current trajectory.
-        self._trajectory = self.getTrajectory()
+        # The trajectory is loaded into memory on demand. Analyses are streamed
+        # from file in chunks unless the trajectory is already in memory.
+        self._trajectory = None
+
+        # A cache of atom indices for search queries.
+        self._selections = {}
+
+        # The cached time stamp of each frame.
+        self._times = None
 
     def __str__(self):
         """Return a human readable string representation of the object."""
@@ -225,65 +230,105 @@ class Trajectory():
             _warnings.warn("Invalid trajectory format. Using default (mdtraj).")
             format = "mdtraj"
 
-        # Set the location of the trajectory and topology files.
-        if self._process is not None:
-            traj_file = self._process._traj_file
-
-            # Weirdly, the GRO file is used as the topology.
-            if self._process_name.upper() == "GROMACS":
-                top_file = self._process._gro_file
-            else:
-                top_file = self._process._top_file
-        else:
-            traj_file = self._traj_file
-            top_file = self._top_file
-
-        # Check that the trajectory and topology files exist.
-        if not _os.path.isfile(traj_file):
-            raise IOError("Trajectory file doesn't exist: '%s'" % traj_file)
-
-        if not _os.path.isfile(top_file):
-            raise IOError("Topology file doesn't exist: '%s'" % top_file)
-
-        # Load the topology file to determine the file format.
-        file_format = _IO.readMolecules(top_file).fileFormat()
-
-        # Set the extension.
-        extension = _extensions.get(file_format, file_format.lower())
-
-        # Set the path to the temporary topology file.
-        new_top_file = _os.getcwd() + "/.topology." + extension
-
-        # Copy the topology to a file with the correct extension.
-        _shutil.copyfile(top_file, new_top_file)
+        # Get the location of the trajectory and topology files.
+        traj_file, top_file = self._getFiles()
 
         # Return an MDTraj object.
         if format == "mdtraj":
 
             try:
-                traj = _mdtraj.load(traj_file, top=new_top_file)
+                traj = _mdtraj.load(traj_file, top=self._getTopology(top_file))
             except:
                 _warnings.warn("MDTraj failed to read: traj=%s, top=%s" % (traj_file, top_file))
                 traj = None
 
-            # Remove the temporary topology file.
-            _os.remove(new_top_file)
-
             return traj
 
         # Return an MDAnalysis Universe.
         else:
             try:
-                universe = _mdanalysis.Universe(new_top_file, traj_file)
+                universe = _mdanalysis.Universe(_get_mdanalysis_topology(top_file), traj_file)
             except:
                 _warnings.warn("MDAnalysis failed to read: traj=%s, top=%s" % (traj_file, top_file))
                 universe = None
 
-            # Remove the temporary topology file.
-            _os.remove(new_top_file)
-
             return universe
 
+    def iterChunks(self, chunk=100, stride=1, atoms=None):
+        """Iterate over the trajectory in chunks of frames. Only a single chunk
+           is held in memory at a time, so this can be used to analyse
+           trajectories that are too large to load in their entirety.
+
+           Parameters
+           ----------
+
+           chunk : int
+               The number of frames in each chunk.
+
+           stride : int
+               Only read every stride-th frame.
+
+           atoms : [int]
+               A list of atom indices to read. If None, all atoms are read.
+
+           Returns
+           -------
+
+           chunks : generator
+               A generator yielding chunks of the trajectory as
+               mdtraj.core.trajectory.Trajectory objects.
+        """
+
+        if type(chunk) is not int:
+            raise TypeError("'chunk' must be of type 'int'")
+        if chunk < 1:
+            raise ValueError("'chunk' must be a positive integer.")
+
+        if type(stride) is not int:
+            raise TypeError("'stride' must be of type 'int'")
+        if stride < 1:
+            raise ValueError("'stride' must be a positive integer.")
+
+        if atoms is not None:
+            # Check that all of the atom indices are integers.
+            if not all(_is_integer(x) for x in atoms):
+                raise TypeError("'atom' indices must be of type 'int'")
+
+        # Get the location of the trajectory and topology files.
+        traj_file, top_file = self._getFiles()
+
+        # Load the topology.
+        topology = self._getTopology(top_file)
+
+        return _mdtraj.iterload(traj_file, chunk=chunk, top=topology,
+                                stride=stride, atom_indices=atoms)
+
+    def iterFrames(self, stride=1, chunk=100):
+        """Iterate over the trajectory frames as System objects. Frames are
+           read from file in chunks, so only a single chunk is held in memory
+           at a time.
+
+           Parameters
+           ----------
+
+           stride : int
+               Only read every stride-th frame.
+
+           chunk : int
+               The number of frames read from file at a time.
+
+           Returns
+           -------
+
+           frames : generator
+               A generator yielding each frame as a
+               :class:`System <BioSimSpace._SireWrappers.System>`.
+        """
+
+        for traj in self.iterChunks(chunk=chunk, stride=stride):
+            for x in range(0, traj.n_frames):
+                yield self._toSystem(traj[x])
+
     def getFrames(self, indices=None):
         """Get trajectory frames as a list of System objects.
 
@@ -291,7 +336,8 @@ class Trajectory():
            ----------
 
            indices : [int], [:class:`Time <BioSimSpace.Types.Time>`]
-               A list of trajectory frame indices, or time stamps (in ns).
+               A list of trajectory frame indices, or time stamps. Time
+               stamps are matched to the frame with the closest time.
 
            Returns
            -------
@@ -300,58 +346,44 @@ class Trajectory():
                The list of System objects.
         """
 
-        # The process is running. Grab the latest trajectory.
-        if self._process is not None and self._process.isRunning():
-            self._trajectory = self.getTrajectory()
+        # If the trajectory isn't already in memory and the file supports
+        # random access, then only the requested frames are read.
+        if self._trajectory is None and self._isIndexable():
+            traj_file, top_file = self._getFiles()
+            n_frames = _index.getIndex(traj_file)["n_frames"]
 
-            # There is no trajectory.
-            if self._trajectory is None:
+        # Load the trajectory into memory. If the process is running this
+        # will grab the latest trajectory.
+        else:
+            if self._loadTrajectory() is None:
                 return None
+            traj_file = None
 
-        # Store the number of frames.
-        n_frames = self._trajectory.n_frames
-
-        # Work out the frame spacing in nanoseconds.
-        # TODO:
-        # How can we do this in a robust way if the trajectory is loaded from file?
-        # Some formats do not store time information as part of the trajectory.
-        if n_frames > 1:
-            if self._process is not None:
-                time_interval = self._process._protocol.getRunTime() / self._process._protocol.getFrames()
-            else:
-                time_interval = self._trajectory.timestep / 1000
+            # Store the number of frames.
+            n_frames = self._trajectory.n_frames
 
         # Create the indices array.
 
         # Default to all frames.
         if indices is None:
-            indices = [x for x in range(0, self._trajectory.n_frames)]
+            indices = [x for x in range(0, n_frames)]
 
         # A single frame index.
-        elif type(indices) is int:
+        elif _is_integer(indices):
             indices = [indices]
 
-        # A single time stamp.
+        # A single time stamp. Find the frame with the closest time stamp.
         elif type(indices) is _Time:
-            if n_frames > 1:
-                # Round time stamp to nearest frame index.
-                indices = [round(indices.nanoseconds().magnitude() / time_interval) - 1]
-            else:
-                raise _IncompatibleError("Cannot determine time stamps for a trajectory "
-                                         "with only one frame!")
+            indices = [_index.findFrame(self._getTimes(), indices.picoseconds().magnitude())]
 
         # A list of frame indices.
-        elif all(isinstance(x, int) for x in indices):
+        elif all(_is_integer(x) for x in indices):
             pass
 
         # A list of time stamps.
         elif all(isinstance(x, _Time) for x in indices):
-            if n_frames <= 1:
-                raise _IncompatibleError("Cannot determine time stamps for a trajectory "
-                                         "with only one frame!")
-
-            # Round time stamps to nearest frame indices.
-            indices = [round(x.nanoseconds().magnitude() / time_interval) - 1 for x in indices]
+            times = self._getTimes()
+            indices = [_index.findFrame(times, x.picoseconds().magnitude()) for x in indices]
 
         # Unsupported argument.
         else:
@@ -359,44 +391,64 @@ class Trajectory():
                              "must be an 'int' or 'BioSimSpace.Types.Time', or list of 'int' or "
                              "'BioSimSpace.Types.Time' types.")
 
-        # Intialise the list of frames.
-        frames = []
-
-        # Loop over all indices.
+        # Make sure the frame indices are within range.
         for x in indices:
-
-            # Make sure the frame index is within range.
             if x > 0 and x >= n_frames:
                 raise ValueError("Frame index (%d) of of range (0 to %d)." % (x, n_frames - 1))
             elif x < -n_frames:
                 raise ValueError("Frame index (%d) of of range (-1 to -%d)." % (x, n_frames))
 
-            # The name of the frame coordinate file.
-            frame_file = ".frame.nc"
-
-            # Write the current frame as a NetCDF file.
-            self._trajectory[x].save(frame_file)
+        # Read the requested frames directly from file.
+        if traj_file is not None:
+            traj = _index.readFrames(traj_file, self._getTopology(top_file), indices)
+            indices = range(0, traj.n_frames)
+        else:
+            traj = self._trajectory
 
-            # Load the frame and create a System object.
-            try:
-                system = _System(_SireIO.MoleculeParser.read([self._top_file, frame_file]))
-            except Exception as e:
-                _os.remove(frame_file)
-                msg = "Failed to read trajectory frame: '%s'" % frame_file
-                if _isVerbose():
-                    raise IOError(msg) from e
-                else:
-                    raise IOError(msg) from None
+        # Intialise the list of frames.
+        frames = []
 
+        # Loop over all indices.
+        for x in indices:
             # Append the system to the list of frames.
-            frames.append(system)
-
-        # Remove the temporary frame coordinate file.
-        _os.remove(frame_file)
+            frames.append(self._toSystem(traj[x]))
 
         # Return the frames.
         return frames
 
+    def getFrameIndices(self, start=None, end=None):
+        """Get the indices of the frames with time stamps within a time window.
+
+           Parameters
+           ----------
+
+           start : :class:`Time <BioSimSpace.Types.Time>`
+               The start of the time window. If None, the window starts at
+               the first frame.
+
+           end : :class:`Time <BioSimSpace.Types.Time>`
+               The end of the time window. If None, the window ends at the
+               last frame.
+
+           Returns
+           -------
+
+           indices : [int]
+               The indices of the frames within the window.
+        """
+
+        if start is not None:
+            if type(start) is not _Time:
+                raise TypeError("'start' must be of type 'BioSimSpace.Types.Time'")
+            start = start.picoseconds().magnitude()
+
+        if end is not None:
+            if type(end) is not _Time:
+                raise TypeError("'end' must be of type 'BioSimSpace.Types.Time'")
+            end = end.picoseconds().magnitude()
+
+        return list(_index.findFrames(self._getTimes(), start, end))
+
     def nFrames(self):
         """Return the current number of trajectory frames.
 
@@ -407,9 +459,14 @@ class Trajectory():
                The number of trajectory frames.
         """
 
-        # First get the current MDTraj object.
-        if self._process is not None and self._process.isRunning():
-            self._trajectory = self.getTrajectory()
+        # The trajectory hasn't been loaded into memory, so count the frames
+        # in the trajectory file.
+        if self._trajectory is None:
+            return self._nFramesOnDisk()
+
+        # First get the current MDTraj object. For a running process, this
+        # only reads frames that have been written since the last call.
+        self._loadTrajectory()
 
         # There is no trajectory.
         if self._trajectory is None:
@@ -417,8 +474,79 @@ class Trajectory():
         else:
             return self._trajectory.n_frames
 
-    def rmsd(self, frame=None, atoms=None):
-        """Compute the root mean squared displacement.
+    def getCoordinates(self):
+        """Return a read-only, memory-mapped array containing the coordinates
+           of every frame in the trajectory. Coordinates are only read from
+           disk when they are accessed. This is only supported for DCD and
+           NetCDF trajectories.
+
+           Returns
+           -------
+
+           coordinates : numpy.ndarray
+               An array of shape (n_frames, n_atoms, 3) containing the
+               coordinates in Angstrom.
+        """
+
+        traj_file, _ = self._getFiles()
+
+        coordinates = _index.memoryMap(traj_file)
+
+        if coordinates is None:
+            raise _IncompatibleError("Unable to memory map the trajectory file: '%s'. "
+                                     "Only DCD and NetCDF files are supported." % traj_file)
+
+        return coordinates
+
+    def analyse(self, kernel, chunk=100, num_workers=1, reduce=None, **kwargs):
+        """Map an analysis kernel over the trajectory. The trajectory is split
+           into chunks of frames and the kernel is applied to each chunk in
+           turn. If the trajectory file supports random access, then the
+           chunks can be processed in parallel by a pool of worker processes.
+
+           Parameters
+           ----------
+
+           kernel : function
+               The analysis kernel. This is called with an MDTraj trajectory
+               for each chunk of frames, along with any additional keyword
+               arguments. For parallel execution this must be a module level
+               function, so that it can be sent to the worker processes.
+
+           chunk : int
+               The number of frames in each chunk.
+
+           num_workers : int
+               The number of worker processes.
+
+           reduce : function
+               A function used to combine the list of per-chunk results. If
+               None, then the results are concatenated in frame order.
+
+           kwargs : dict
+               Additional keyword arguments that are passed to the kernel.
+
+           Returns
+           -------
+
+           result :
+               The reduced result of the analysis.
+        """
+
+        if not callable(kernel):
+            raise TypeError("'kernel' must be a callable object.")
+
+        if reduce is None:
+            reduce = _analysis.concatenate
+        elif not callable(reduce):
+            raise TypeError("'reduce' must be a callable object.")
+
+        return reduce(self._mapChunks(kernel, kwargs, chunk=chunk, num_workers=num_workers))
+
+    def rmsd(self, frame=None, atoms=None, chunk=100, num_workers=1):
+        """Compute the root mean squared displacement. If the trajectory
+           hasn't been loaded into memory, then it is streamed from file
+           in chunks.
 
            Parameters
            ----------
@@ -426,8 +554,15 @@ class Trajectory():
            frame : int
                The index of the reference frame.
 
-           atoms : [int]
-               A list of reference atom indices.
+           atoms : [int], str
+               A list of reference atom indices, or a search query used to
+               select them, e.g. "element C".
+
+           chunk : int
+               The number of frames read from file at a time when streaming.
+
+           num_workers : int
+               The number of worker processes used to analyse the chunks.
 
            Returns
            -------
@@ -436,30 +571,14 @@ class Trajectory():
                A list containing the RMSD value at each time point.
         """
 
-        # Default to the first frame.
-        if frame is None:
-            frame = 0
-        else:
-            if type(frame) is not int:
-                raise TypeError("'frame' must be of type 'int'")
-            else:
-                # Store the number of frames.
-                n_frames = self._trajectory.n_frames
-
-                # Make sure the frame index is within range.
-                if frame > 0 and frame >= n_frames:
-                    raise ValueError("Frame index (%d) of of range (0 to %d)." %s (frame, n_frames - 1))
-                elif frame < -n_frames:
-                    raise ValueError("Frame index (%d) of of range (-1 to -%d)." %s (frame, n_frames))
-
-        if atoms is not None:
-            # Check that all of the atom indices are integers.
-            if not all(isinstance(x, int) for x in atoms):
-                raise TypeError("'atom' indices must be of type 'int'")
+        atoms = self._getAtomIndices(atoms)
+        reference = self._getReference(frame)
 
         # Use MDTraj to compute the RMSD.
         try:
-            rmsd = _mdtraj.rmsd(self._trajectory, self._trajectory, frame, atoms)
+            rmsd = _analysis.concatenate(self._mapChunks(_analysis.rmsdKernel,
+                {"reference" : reference, "atoms" : atoms}, chunk=chunk, num_workers=num_workers))
+
         except Exception as e:
             msg = "Atom indices not found in the system."
             if _isVerbose():
@@ -469,3 +588,1453 @@ class Trajectory():
 
         # Convert to a list and return.
         return list(rmsd)
+
+    def rmsf(self, frame=None, atoms=None, chunk=100, num_workers=1):
+        """Compute the root mean squared fluctuation of each atom. Frames are
+           aligned to a reference frame, then the fluctuations about the
+           mean structure are computed. This requires two passes over the
+           trajectory, but only a single chunk of frames is held in memory
+           at a time.
+
+           Parameters
+           ----------
+
+           frame : int
+               The index of the reference frame used for alignment.
+
+           atoms : [int], str
+               A list of atom indices, or a search query used to select them.
+               If None, all atoms are used.
+
+           chunk : int
+               The number of frames read from file at a time when streaming.
+
+           num_workers : int
+               The number of worker processes used to analyse the chunks.
+
+           Returns
+           -------
+
+           rmsf : [float]
+               A list containing the RMSF value of each atom.
+        """
+
+        atoms = self._getAtomIndices(atoms)
+        reference = self._getReference(frame)
+
+        try:
+            # First pass: compute the mean structure.
+            mean = _analysis.mean(self._mapChunks(_analysis.alignedSumKernel,
+                {"reference" : reference, "atoms" : atoms},
+                chunk=chunk, num_workers=num_workers))
+
+            # Second pass: compute the mean squared fluctuation.
+            rmsf = _np.sqrt(_analysis.mean(self._mapChunks(_analysis.alignedSumKernel,
+                {"reference" : reference, "atoms" : atoms, "mean" : mean},
+                chunk=chunk, num_workers=num_workers)))
+
+        except Exception as e:
+            msg = "Atom indices not found in the system."
+            if _isVerbose():
+                raise ValueError(msg) from e
+            else:
+                raise ValueError(msg) from None
+
+        return list(rmsf)
+
+    def distances(self, selection0, selection1, periodic=True, chunk=100, num_workers=1):
+        """Compute the distance between pairs of atoms for each frame. The
+           n-th atom in the first selection is paired with the n-th atom in
+           the second selection.
+
+           Parameters
+           ----------
+
+           selection0 : [int], str
+               A list of atom indices, or a search query used to select them.
+
+           selection1 : [int], str
+               A list of atom indices, or a search query used to select them.
+               This must contain the same number of atoms as 'selection0'.
+
+           periodic : bool
+               Whether to use the minimum image convention.
+
+           chunk : int
+               The number of frames read from file at a time when streaming.
+
+           num_workers : int
+               The number of worker processes used to analyse the chunks.
+
+           Returns
+           -------
+
+           distances : numpy.ndarray
+               An array of shape (n_frames, n_pairs) containing the distances
+               in nanometers.
+        """
+
+        atoms0 = self._getAtomIndices(selection0)
+        atoms1 = self._getAtomIndices(selection1)
+
+        if atoms0 is None or atoms1 is None:
+            raise ValueError("Both 'selection0' and 'selection1' must be specified.")
+
+        if len(atoms0) != len(atoms1):
+            raise ValueError("'selection0' and 'selection1' must contain the same "
+                             "number of atoms: %d != %d" % (len(atoms0), len(atoms1)))
+
+        if type(periodic) is not bool:
+            raise TypeError("'periodic' must be of type 'bool'")
+
+        pairs = _np.stack([atoms0, atoms1], axis=1)
+
+        return _analysis.concatenate(self._mapChunks(_analysis.distanceKernel,
+            {"pairs" : pairs, "periodic" : periodic}, chunk=chunk, num_workers=num_workers))
+
+    def contacts(self, selection0, selection1=None, cutoff=_Length(4.5, "angstrom"),
+            periodic=True, chunk=100, num_workers=1):
+        """Count the number of atomic contacts between two selections for each
+           frame.
+
+           Parameters
+           ----------
+
+           selection0 : [int], str
+               A list of atom indices, or a search query used to select them.
+
+           selection1 : [int], str
+               A list of atom indices, or a search query used to select them.
+               If None, then contacts within 'selection0' are counted.
+
+           cutoff : :class:`Length <BioSimSpace.Types.Length>`
+               The distance below which two atoms are in contact.
+
+           periodic : bool
+               Whether to use the minimum image convention.
+
+           chunk : int
+               The number of frames read from file at a time when streaming.
+
+           num_workers : int
+               The number of worker processes used to analyse the chunks.
+
+           Returns
+           -------
+
+           contacts : numpy.ndarray
+               The number of atom pairs in contact in each frame.
+        """
+
+        atoms0 = self._getAtomIndices(selection0)
+        atoms1 = self._getAtomIndices(selection1)
+
+        if atoms0 is None:
+            raise ValueError("'selection0' must be specified.")
+
+        if type(cutoff) is not _Length:
+            raise TypeError("'cutoff' must be of type 'BioSimSpace.Types.Length'")
+
+        if type(periodic) is not bool:
+            raise TypeError("'periodic' must be of type 'bool'")
+
+        # Pairs are found with a neighbour search for each frame, so there's
+        # no need to enumerate all of the pairs of atoms.
+        return _analysis.concatenate(self._mapChunks(_analysis.contactKernel,
+            {"atoms0" : atoms0, "atoms1" : atoms1, "cutoff" : cutoff.nanometers().magnitude(),
+             "periodic" : periodic}, chunk=chunk, num_workers=num_workers))
+
+    def radiusOfGyration(self, atoms=None, chunk=100, num_workers=1):
+        """Compute the mass weighted radius of gyration for each frame.
+
+           Parameters
+           ----------
+
+           atoms : [int], str
+               A list of atom indices, or a search query used to select them.
+               If None, all atoms are used.
+
+           chunk : int
+               The number of frames read from file at a time when streaming.
+
+           num_workers : int
+               The number of worker processes used to analyse the chunks.
+
+           Returns
+           -------
+
+           radius_of_gyration : [float]
+               A list containing the radius of gyration of each frame in
+               nanometers.
+        """
+
+        atoms = self._getAtomIndices(atoms)
+
+        # Get the atomic masses from the topology.
+        _, top_file = self._getFiles()
+        masses = _np.array([x.element.mass for x in self._getTopology(top_file).atoms])
+        if atoms is not None:
+            masses = masses[atoms]
+
+        return list(_analysis.concatenate(self._mapChunks(_analysis.radiusOfGyrationKernel,
+            {"masses" : masses, "atoms" : atoms}, chunk=chunk, num_workers=num_workers)))
+
+    def hbonds(self, atoms=None, periodic=True, chunk=100, num_workers=1):
+        """Find the hydrogen bonds in each frame using the criterion of
+           Wernet and Nilsson.
+
+           Parameters
+           ----------
+
+           atoms : [int], str
+               A list of atom indices, or a search query used to select them.
+               Only hydrogen bonds where both the donor and acceptor are
+               selected are returned. If None, all atoms are used.
+
+           periodic : bool
+               Whether to use the minimum image convention.
+
+           chunk : int
+               The number of frames read from file at a time when streaming.
+
+           num_workers : int
+               The number of worker processes used to analyse the chunks.
+
+           Returns
+           -------
+
+           hbonds : [numpy.ndarray]
+               An array of shape (n_hbonds, 3) for each frame, containing the
+               donor, hydrogen, and acceptor atom indices.
+        """
+
+        atoms = self._getAtomIndices(atoms)
+
+        if type(periodic) is not bool:
+            raise TypeError("'periodic' must be of type 'bool'")
+
+        return _analysis.concatenate(self._mapChunks(_analysis.hbondKernel,
+            {"atoms" : atoms, "periodic" : periodic}, chunk=chunk, num_workers=num_workers))
+
+    def sasa(self, atoms=None, probe_radius=_Length(1.4, "angstrom"), chunk=100, num_workers=1):
+        """Compute the solvent accessible surface area for each frame using
+           the Shrake-Rupley algorithm.
+
+           Parameters
+           ----------
+
+           atoms : [int], str
+               A list of atom indices, or a search query used to select them.
+               The surface area is computed in the presence of all atoms,
+               then summed over the selection. If None, all atoms are used.
+
+           probe_radius : :class:`Length <BioSimSpace.Types.Length>`
+               The radius of the solvent probe.
+
+           chunk : int
+               The number of frames read from file at a time when streaming.
+
+           num_workers : int
+               The number of worker processes used to analyse the chunks.
+
+           Returns
+           -------
+
+           sasa : [float]
+               A list containing the surface area of each frame in square
+               nanometers.
+        """
+
+        atoms = self._getAtomIndices(atoms)
+
+        if type(probe_radius) is not _Length:
+            raise TypeError("'probe_radius' must be of type 'BioSimSpace.Types.Length'")
+
+        return list(_analysis.concatenate(self._mapChunks(_analysis.sasaKernel,
+            {"atoms" : atoms, "probe_radius" : probe_radius.nanometers().magnitude()},
+            chunk=chunk, num_workers=num_workers)))
+
+    def cluster(self, atoms=None, method="kmedoids", num_clusters=10,
+            cutoff=_Length(2, "angstrom"), landmarks=1000, chunk=100, num_workers=1):
+        """Cluster the trajectory frames by RMSD. The full pairwise RMSD
+           matrix is only computed for a set of landmark frames, spaced
+           evenly through the trajectory, which are then clustered. Every
+           frame is then assigned to the cluster with the closest centre,
+           streaming the trajectory in chunks. This keeps memory usage
+           bounded for trajectories with a large number of frames. If the
+           trajectory has no more frames than the number of landmarks, then
+           the clustering is exact.
+
+           Parameters
+           ----------
+
+           atoms : [int], str
+               A list of atom indices, or a search query used to select them.
+               If None, all atoms are used.
+
+           method : str
+               The clustering method: "kmedoids", or "gromos".
+
+           num_clusters : int
+               The number of clusters for the "kmedoids" method.
+
+           cutoff : :class:`Length <BioSimSpace.Types.Length>`
+               The RMSD cutoff for the "gromos" method.
+
+           landmarks : int
+               The maximum number of landmark frames.
+
+           chunk : int
+               The number of frames read from file at a time when streaming.
+
+           num_workers : int
+               The number of worker processes used to analyse the chunks.
+
+           Returns
+           -------
+
+           (representatives, labels) : ([:class:`System <BioSimSpace._SireWrappers.System>`], [int])
+               The central frame of each cluster, ordered by decreasing
+               cluster size, and the cluster index of each frame.
+        """
+
+        if type(method) is not str:
+            raise TypeError("'method' must be of type 'str'")
+        method = method.lower().replace("-", "")
+        if method not in ["kmedoids", "gromos"]:
+            raise ValueError("'method' must be either 'kmedoids' or 'gromos'")
+
+        if type(num_clusters) is not int:
+            raise TypeError("'num_clusters' must be of type 'int'")
+        if num_clusters < 1:
+            raise ValueError("'num_clusters' must be a positive integer.")
+
+        if type(cutoff) is not _Length:
+            raise TypeError("'cutoff' must be of type 'BioSimSpace.Types.Length'")
+
+        if type(landmarks) is not int:
+            raise TypeError("'landmarks' must be of type 'int'")
+        if landmarks < 1:
+            raise ValueError("'landmarks' must be a positive integer.")
+
+        atoms = self._getAtomIndices(atoms)
+
+        n_frames = self.nFrames()
+        if n_frames == 0:
+            raise _IncompatibleError("The trajectory contains no frames!")
+
+        # Work out the landmark frames, spaced evenly through the trajectory.
+        indices = _np.unique(_np.linspace(0, n_frames - 1, min(landmarks, n_frames)).round().astype(int))
+        traj = self._readFrames(indices, atoms)
+
+        # Compute the pairwise RMSD matrix for the landmarks, then cluster.
+        distances = _analysis.pairwiseRmsdKernel(traj, traj)
+        if method == "kmedoids":
+            centres = _cluster.kMedoids(distances, num_clusters)
+        else:
+            centres = _cluster.gromos(distances, cutoff.nanometers().magnitude())
+
+        # Assign every frame to the closest cluster centre.
+        labels = _analysis.concatenate([_np.argmin(x, axis=1) for x in
+            self._mapChunks(_analysis.pairwiseRmsdKernel, {"reference" : traj[centres]},
+                chunk=chunk, num_workers=num_workers, atoms=atoms)])
+
+        # Order the clusters by decreasing size.
+        order = _np.argsort(-_np.bincount(labels, minlength=len(centres)), kind="stable")
+        rank = _np.empty(len(order), dtype=int)
+        rank[order] = _np.arange(len(order))
+
+        representatives = self.getFrames([int(x) for x in indices[centres][order]])
+
+        return (representatives, [int(x) for x in rank[labels]])
+
+    def write(self, filebase, format="xtc", atoms=None, start=None, end=None,
+            stride=1, image=False, center=False, topology=True, chunk=100):
+        """Write a reduced copy of the trajectory to file. Frames are streamed
+           from the input trajectory in chunks, so this can be used on
+           trajectories that are too large to load into memory. Atoms can be
+           stripped, e.g. to remove solvent, frames can be subsampled, and
+           the output can be written in the compressed XTC format.
+
+           Parameters
+           ----------
+
+           filebase : str
+               The base name of the output files.
+
+           format : str
+               The trajectory format: "xtc", "dcd", or "nc".
+
+           atoms : [int], str
+               A list of atom indices to keep, or a search query used to
+               select them, e.g. "not water". If None, all atoms are kept.
+
+           start : int, :class:`Time <BioSimSpace.Types.Time>`
+               The index, or time stamp, of the first frame to write.
+
+           end : int, :class:`Time <BioSimSpace.Types.Time>`
+               The index, or time stamp, of the last frame to write.
+
+           stride : int
+               Only write every stride-th frame.
+
+           image : bool
+               Whether to wrap molecules back into the periodic box, keeping
+               them whole.
+
+           center : bool
+               Whether to centre the atoms in the periodic box, or at the
+               origin if there is no box.
+
+           topology : bool
+               Whether to write a topology matching the reduced trajectory.
+               If only whole molecules are kept, then this is written in the
+               format of the original topology, otherwise a PDB file is
+               written.
+
+           chunk : int
+               The number of frames read from file at a time.
+
+           Returns
+           -------
+
+           files : [str]
+               The list of files that were generated.
+        """
+
+        if type(filebase) is not str:
+            raise TypeError("'filebase' must be of type 'str'")
+
+        if type(format) is not str:
+            raise TypeError("'format' must be of type 'str'")
+        format = format.lower()
+        if format not in _write_formats:
+            raise ValueError("Unsupported trajectory format '%s'. Options are: %s"
+                             % (format, ", ".join(_write_formats)))
+
+        if type(stride) is not int:
+            raise TypeError("'stride' must be of type 'int'")
+        if stride < 1:
+            raise ValueError("'stride' must be a positive integer.")
+
+        if type(image) is not bool:
+            raise TypeError("'image' must be of type 'bool'")
+
+        if type(center) is not bool:
+            raise TypeError("'center' must be of type 'bool'")
+
+        if type(topology) is not bool:
+            raise TypeError("'topology' must be of type 'bool'")
+
+        if type(chunk) is not int:
+            raise TypeError("'chunk' must be of type 'int'")
+        if chunk < 1:
+            raise ValueError("'chunk' must be a positive integer.")
+
+        atoms = self._getAtomIndices(atoms)
+
+        # Convert the frame window to indices. The end index is inclusive.
+        n_frames = self.nFrames()
+        start = 0 if start is None else self._getFrameIndex(start, n_frames, "start")
+        end = n_frames - 1 if end is None else self._getFrameIndex(end, n_frames, "end")
+        if end < start:
+            raise ValueError("The 'end' frame (%d) is before the 'start' frame (%d)." % (end, start))
+
+        # The number of frames to write.
+        n_write = (end - start) // stride + 1
+
+        traj_file, top_file = self._getFiles()
+        mdtraj_top = self._getTopology(top_file)
+
+        # Imaging needs the bonds between all atoms, so atoms are only
+        # stripped after the frames are read.
+        if image:
+            read_atoms = None
+        else:
+            read_atoms = atoms
+
+        # Make sure the output directory exists.
+        filebase = _os.path.abspath(filebase)
+        dirname = _os.path.dirname(filebase)
+        if not _os.path.isdir(dirname):
+            _os.makedirs(dirname)
+
+        traj_out = "%s.%s" % (filebase, format)
+        if traj_out == _os.path.abspath(traj_file):
+            raise ValueError("Cannot overwrite the input trajectory: '%s'" % traj_file)
+
+        files = [traj_out]
+
+        # Stream the frames to the output file.
+        n_written = 0
+        with _write_formats[format](traj_out, "w") as file:
+            for traj in _mdtraj.iterload(traj_file, chunk=chunk, top=mdtraj_top,
+                    skip=start, stride=stride, atom_indices=read_atoms):
+
+                # Discard any frames beyond the end of the window.
+                if n_written + traj.n_frames > n_write:
+                    traj = traj[:n_write - n_written]
+
+                if image:
+                    try:
+                        traj.image_molecules(inplace=True)
+                    except Exception as e:
+                        msg = "Unable to image the trajectory. This requires a periodic box."
+                        if _isVerbose():
+                            raise _IncompatibleError(msg) from e
+                        else:
+                            raise _IncompatibleError(msg) from None
+                    if atoms is not None:
+                        traj = traj.atom_slice(atoms)
+
+                if center:
+                    traj.center_coordinates()
+                    if traj.unitcell_lengths is not None:
+                        traj.xyz += 0.5 * traj.unitcell_lengths[:, None, :]
+
+                _write_chunk(file, format, traj)
+
+                n_written += traj.n_frames
+                if n_written == n_write:
+                    break
+
+        # Write the topology.
+        if topology:
+            files += self._writeTopology(filebase, atoms, start)
+
+        return files
+
+    def _getAtomIndices(self, atoms):
+        """Internal helper function to resolve an atom selection to a list of
+           atom indices. Search queries are resolved once against a System
+           created from the topology, then cached.
+
+           Parameters
+           ----------
+
+           atoms : [int], str
+               A list of atom indices, or a search query.
+
+           Returns
+           -------
+
+           atoms : numpy.ndarray
+               The atom indices, or None if no selection was passed.
+        """
+
+        if atoms is None:
+            return None
+
+        # A list of atom indices.
+        if type(atoms) is not str:
+            # Check that all of the atom indices are integers.
+            if not all(_is_integer(x) for x in atoms):
+                raise TypeError("'atom' indices must be of type 'int'")
+
+            return _np.array(atoms, dtype="int32")
+
+        # A search query. The cache is keyed by the state of the topology
+        # file, since this can change for a running process.
+        _, top_file = self._getFiles()
+        stat = _os.stat(top_file)
+        key = (atoms, _os.path.abspath(top_file), stat.st_size, stat.st_mtime_ns)
+
+        try:
+            return self._selections[key]
+        except KeyError:
+            pass
+
+        # Create a System from the topology, using the first frame for any
+        # formats that need coordinates.
+        template, _ = _get_template(self._getReference(0), top_file)
+        system = _System(template)
+
+        indices = system.getIndices(system.search(atoms))
+
+        if len(indices) == 0:
+            raise ValueError("The search query matched no atoms: %r" % atoms)
+
+        indices = _np.unique(indices).astype("int32")
+
+        self._selections[key] = indices
+
+        return indices
+
+    def _getFiles(self):
+        """Internal helper function to get the location of the trajectory and
+           topology files.
+
+           Returns
+           -------
+
+           (traj_file, top_file) : (str, str)
+               The trajectory and topology files.
+        """
+
+        # Set the location of the trajectory and topology files.
+        if self._process is not None:
+            traj_file = self._process._traj_file
+
+            # Weirdly, the GRO file is used as the topology.
+            if self._process_name.upper() == "GROMACS":
+                top_file = self._process._gro_file
+            else:
+                top_file = self._process._top_file
+        else:
+            traj_file = self._traj_file
+            top_file = self._top_file
+
+        # Check that the trajectory and topology files exist.
+        if not _os.path.isfile(traj_file):
+            raise IOError("Trajectory file doesn't exist: '%s'" % traj_file)
+
+        if not _os.path.isfile(top_file):
+            raise IOError("Topology file doesn't exist: '%s'" % top_file)
+
+        return (traj_file, top_file)
+
+    def _getFrameIndex(self, index, n_frames, name="index"):
+        """Internal helper function to convert a frame index, or time stamp,
+           to a positive frame index.
+
+           Parameters
+           ----------
+
+           index : int, :class:`Time <BioSimSpace.Types.Time>`
+               The frame index, or time stamp.
+
+           n_frames : int
+               The number of frames in the trajectory.
+
+           name : str
+               The name of the argument, used in error messages.
+
+           Returns
+           -------
+
+           index : int
+               The frame index.
+        """
+
+        # Find the frame with the closest time stamp.
+        if type(index) is _Time:
+            index = _index.findFrame(self._getTimes(), index.picoseconds().magnitude())
+
+        elif type(index) is not int:
+            raise TypeError("'%s' must be of type 'int' or 'BioSimSpace.Types.Time'" % name)
+
+        # Make sure the frame index is within range.
+        if index > 0 and index >= n_frames:
+            raise ValueError("Frame index (%d) of of range (0 to %d)." % (index, n_frames - 1))
+        elif index < -n_frames:
+            raise ValueError("Frame index (%d) of of range (-1 to -%d)." % (index, n_frames))
+
+        if index < 0:
+            index += n_frames
+
+        return index
+
+    def _getReference(self, frame=None):
+        """Internal helper function to get a single reference frame.
+
+           Parameters
+           ----------
+
+           frame : int
+               The index of the frame. If None, the first frame is used.
+
+           Returns
+           -------
+
+           reference : mdtraj.core.trajectory.Trajectory
+               The reference frame.
+        """
+
+        # Default to the first frame.
+        if frame is None:
+            frame = 0
+        else:
+            if type(frame) is not int:
+                raise TypeError("'frame' must be of type 'int'")
+
+        # Make sure that the in-memory trajectory is up to date.
+        if self._trajectory is not None:
+            self._loadTrajectory()
+
+        # Store the number of frames.
+        if self._trajectory is not None:
+            n_frames = self._trajectory.n_frames
+        else:
+            n_frames = self._nFramesOnDisk()
+
+        # Make sure the frame index is within range.
+        if frame > 0 and frame >= n_frames:
+            raise ValueError("Frame index (%d) of of range (0 to %d)." % (frame, n_frames - 1))
+        elif frame < -n_frames:
+            raise ValueError("Frame index (%d) of of range (-1 to -%d)." % (frame, n_frames))
+
+        if self._trajectory is not None:
+            return self._trajectory[frame]
+
+        if frame < 0:
+            frame += n_frames
+        traj_file, top_file = self._getFiles()
+        topology = self._getTopology(top_file)
+        if self._isIndexable():
+            return _index.readFrames(traj_file, topology, [frame])
+
+        # Not all formats support seeking to a frame, e.g. multi-frame GRO
+        # files, so fall back to streaming the file until the frame is found.
+        try:
+            return _mdtraj.load_frame(traj_file, frame, top=topology)
+        except:
+            start = 0
+            for chunk in _mdtraj.iterload(traj_file, chunk=100, top=topology):
+                if frame < start + chunk.n_frames:
+                    return chunk[frame - start]
+                start += chunk.n_frames
+
+            raise ValueError("Frame index (%d) of of range (0 to %d)." % (frame, start - 1))
+
+    def _getTimes(self):
+        """Internal helper function to get the time stamp of each frame. These
+           are read from the frame index where the trajectory format stores
+           them, otherwise they are derived once, then cached.
+
+           Returns
+           -------
+
+           times : numpy.ndarray
+               The time stamp of each frame in picoseconds.
+        """
+
+        traj_file, _ = self._getFiles()
+        stat = _os.stat(traj_file)
+        key = (_os.path.abspath(traj_file), stat.st_size, stat.st_mtime_ns)
+
+        # The time stamps are up to date.
+        if self._times is not None and self._times[0] == key:
+            return self._times[1]
+
+        times = None
+
+        # DCD headers only store the step interval and an AKMA time step,
+        # which not all engines set consistently with the protocol. Prefer
+        # the protocol's frame interval when a process is attached.
+        use_protocol = (self._process is not None and
+                        _index._format(traj_file) == "DCD" and
+                        hasattr(self._process._protocol, "getFrames"))
+
+        # Read the time stamps from the frame headers.
+        if self._isIndexable() and not use_protocol:
+            index = _index.getIndex(traj_file)
+            times = _validate_times(index["times"], index["n_frames"])
+
+        # Use the time stamps of the in-memory trajectory.
+        elif self._trajectory is not None and not use_protocol:
+            self._loadTrajectory()
+            times = _validate_times(self._trajectory.time, self._trajectory.n_frames)
+
+        # Work out the time stamps from the protocol. Frames are written at
+        # the end of each interval.
+        if times is None and self._process is not None and \
+                hasattr(self._process._protocol, "getFrames"):
+            interval = (self._process._protocol.getRunTime() /
+                        self._process._protocol.getFrames()).picoseconds().magnitude()
+            times = interval * _np.arange(1, self.nFrames() + 1, dtype="float64")
+
+        # Stream the trajectory once, only storing the time stamps.
+        if times is None:
+            times = _np.concatenate([_np.zeros(0)] +
+                [traj.time for traj in self.iterChunks(atoms=[0])])
+            times = _validate_times(times, len(times))
+
+            if times is None:
+                raise _IncompatibleError("The trajectory doesn't contain valid time stamps: '%s'"
+                                         % traj_file)
+
+        self._times = (key, times)
+
+        return times
+
+    def _getTopology(self, top_file):
+        """Internal helper function to load an MDTraj topology.
+
+           Parameters
+           ----------
+
+           top_file : str
+               The topology file.
+
+           Returns
+           -------
+
+           topology : mdtraj.core.topology.Topology
+               The MDTraj topology.
+        """
+        return _get_mdtraj_topology(top_file)
+
+    def _isIndexable(self):
+        """Internal helper function to check whether the trajectory file
+           supports random access to frames.
+
+           Returns
+           -------
+
+           is_indexable : bool
+               Whether the trajectory file can be indexed.
+        """
+        traj_file, _ = self._getFiles()
+        return _index.isIndexable(traj_file)
+
+    def _loadTrajectory(self):
+        """Internal helper function to load the trajectory into memory. If the
+           process is running, then any new frames are appended to the
+           in-memory trajectory.
+
+           Returns
+           -------
+
+           trajectory : mdtraj.core.trajectory.Trajectory
+               The in-memory trajectory.
+        """
+
+        # The trajectory may still be being written to.
+        is_running = self._process is not None and self._process.isRunning()
+
+        # The file doesn't support random access, so reload the entire trajectory.
+        if not self._isIndexable():
+            if self._trajectory is None or is_running:
+                self._trajectory = self.getTrajectory()
+            return self._trajectory
+
+        traj_file, top_file = self._getFiles()
+
+        # Get the number of complete frames in the file. The index ignores any
+        # partially written frame at the end of the file.
+        n_frames = _index.getIndex(traj_file)["n_frames"]
+
+        if self._trajectory is None:
+            n_read = 0
+        elif is_running:
+            n_read = self._trajectory.n_frames
+        else:
+            return self._trajectory
+
+        # The file has been truncated, e.g. the process was restarted, so we
+        # need to read it from the start.
+        if n_frames < n_read:
+            self._trajectory = None
+            n_read = 0
+
+        # Read any new frames and append them to the trajectory.
+        if n_frames > n_read:
+            try:
+                traj = _index.readFrames(traj_file, self._getTopology(top_file),
+                                         range(n_read, n_frames))
+            except:
+                _warnings.warn("MDTraj failed to read: traj=%s, top=%s" % (traj_file, top_file))
+                return self._trajectory
+
+            if self._trajectory is None:
+                self._trajectory = traj
+            else:
+                self._trajectory = self._trajectory.join(traj, check_topology=False)
+
+        return self._trajectory
+
+    def _mapChunks(self, kernel, kwargs=None, chunk=100, num_workers=1, atoms=None):
+        """Internal helper function to map an analysis kernel over chunks of
+           the trajectory.
+
+           Parameters
+           ----------
+
+           kernel : function
+               The analysis kernel.
+
+           kwargs : dict
+               Keyword arguments that are passed to the kernel. If None, then
+               no keyword arguments are passed.
+
+           chunk : int
+               The number of frames in each chunk.
+
+           num_workers : int
+               The number of worker processes.
+
+           atoms : [int]
+               A list of atom indices to read. If None, all atoms are read.
+
+           Returns
+           -------
+
+           results : list
+               The result of the kernel for each chunk, in frame order.
+        """
+
+        if type(chunk) is not int:
+            raise TypeError("'chunk' must be of type 'int'")
+        if chunk < 1:
+            raise ValueError("'chunk' must be a positive integer.")
+
+        if type(num_workers) is not int:
+            raise TypeError("'num_workers' must be of type 'int'")
+        if num_workers < 1:
+            raise ValueError("'num_workers' must be a positive integer.")
+
+        if kwargs is None:
+            kwargs = {}
+
+        # Make sure that the in-memory trajectory is up to date.
+        if self._trajectory is not None:
+            self._loadTrajectory()
+
+        # Read chunks directly from file. This is only used for an in-memory
+        # trajectory when running in parallel, since the workers would
+        # otherwise need to be sent a copy of the coordinates.
+        if self._isIndexable() and (self._trajectory is None or num_workers > 1):
+            traj_file, top_file = self._getFiles()
+            return _analysis.mapChunks(kernel, traj_file, self._getTopology(top_file),
+                chunk=chunk, num_workers=num_workers, atoms=atoms, kwargs=kwargs)
+
+        # Slice the in-memory trajectory.
+        if self._trajectory is not None:
+            traj = self._trajectory
+            if atoms is not None:
+                traj = traj.atom_slice(atoms)
+            return [kernel(traj[x:x+chunk], **kwargs) for x in range(0, traj.n_frames, chunk)]
+
+        # Stream the trajectory from file.
+        return [kernel(traj, **kwargs) for traj in self.iterChunks(chunk=chunk, atoms=atoms)]
+
+    def _nFramesOnDisk(self):
+        """Internal helper function to count the number of frames in the
+           trajectory file without loading it into memory.
+
+           Returns
+           -------
+
+           n_frames : int
+               The number of trajectory frames.
+        """
+
+        traj_file, _ = self._getFiles()
+
+        # Use the frame index.
+        if self._isIndexable():
+            return _index.getIndex(traj_file)["n_frames"]
+
+        try:
+            with _mdtraj.open(traj_file) as file:
+                return len(file)
+        except:
+            n_frames = 0
+            for traj in self.iterChunks():
+                n_frames += traj.n_frames
+            return n_frames
+
+    def _readFrames(self, indices, atoms=None):
+        """Internal helper function to read specific frames into memory.
+
+           Parameters
+           ----------
+
+           indices : [int]
+               The indices of the frames, in ascending order.
+
+           atoms : [int]
+               A list of atom indices to read. If None, all atoms are read.
+
+           Returns
+           -------
+
+           trajectory : mdtraj.core.trajectory.Trajectory
+               A trajectory containing the requested frames.
+        """
+
+        # Make sure that the in-memory trajectory is up to date.
+        if self._trajectory is not None:
+            self._loadTrajectory()
+            traj = self._trajectory[indices]
+            if atoms is not None:
+                traj = traj.atom_slice(atoms)
+            return traj
+
+        traj_file, top_file = self._getFiles()
+
+        # Seek directly to each frame.
+        if self._isIndexable():
+            return _index.readFrames(traj_file, self._getTopology(top_file), indices, atoms)
+
+        # Stream the trajectory, keeping the requested frames from each chunk.
+        frames = []
+        offset = 0
+        for traj in self.iterChunks(atoms=atoms):
+            keep = [x - offset for x in indices if offset <= x < offset + traj.n_frames]
+            if len(keep) > 0:
+                frames.append(traj[keep])
+            offset += traj.n_frames
+
+        # Make sure that all of the frames were found. The trajectory may
+        # have been truncated since the number of frames was last counted.
+        if sum(traj.n_frames for traj in frames) != len(indices):
+            raise ValueError("Frame indices out of range. The trajectory contains %d frames." % offset)
+
+        return _mdtraj.join(frames, check_topology=False)
+
+    def _toSystem(self, frame):
+        """Internal helper function to convert a single MDTraj frame to a
+           System object.
+
+           Parameters
+           ----------
+
+           frame : mdtraj.core.trajectory.Trajectory
+               A single trajectory frame.
+
+           Returns
+           -------
+
+           system : :class:`System <BioSimSpace._SireWrappers.System>`
+               The System object of the corresponding frame.
+        """
+
+        return _frame_to_system(frame, self._top_file)
+
+    def _writeTopology(self, filebase, atoms=None, frame=0):
+        """Internal helper function to write a topology matching a reduced
+           trajectory.
+
+           Parameters
+           ----------
+
+           filebase : str
+               The base name of the output files.
+
+           atoms : numpy.ndarray
+               The indices of the atoms that were kept. If None, all atoms
+               were kept.
+
+           frame : int
+               The index of the frame used for the topology coordinates.
+
+           Returns
+           -------
+
+           files : [str]
+               The list of files that were generated.
+        """
+
+        _, top_file = self._getFiles()
+
+        # All atoms were kept, so copy the original topology.
+        if atoms is None:
+            extension = _os.path.splitext(top_file)[1]
+            new_top_file = filebase + extension
+            if new_top_file != _os.path.abspath(top_file):
+                _shutil.copyfile(top_file, new_top_file)
+            return [new_top_file]
+
+        reference = self._getReference(frame)
+
+        # Work out which molecules have been kept.
+        template, _ = _get_template(reference, top_file)
+        is_kept = _np.zeros(reference.n_atoms, dtype=bool)
+        is_kept[atoms] = True
+
+        molecules = []
+        offset = 0
+        is_whole = True
+        for idx in range(0, template.nMolecules()):
+            num_atoms = template.molecule(_SireMol.MolIdx(idx)).nAtoms()
+            num_kept = is_kept[offset:offset+num_atoms].sum()
+            if num_kept == num_atoms:
+                molecules.append(idx)
+            elif num_kept > 0:
+                is_whole = False
+                break
+            offset += num_atoms
+
+        # Only whole molecules were kept, so write a topology in the original
+        # format. This preserves the force field parameters.
+        if is_whole:
+            system = _frame_to_system(reference, top_file)
+            system = _System([system[idx] for idx in molecules])
+            try:
+                return _IO.saveMolecules(filebase, system, system.fileFormat())
+            except:
+                _warnings.warn("Unable to write the reduced topology in the original "
+                               "format. Writing a PDB file instead.")
+
+        # Otherwise, write a PDB file.
+        pdb_file = filebase + ".pdb"
+        reference.atom_slice(atoms).save_pdb(pdb_file)
+        return [pdb_file]
+
+def _is_integer(value):
+    """Internal helper function to check whether a value is an integer,
+       including NumPy integer types.
+
+       Parameters
+       ----------
+
+       value : object
+           The value to check.
+
+       Returns
+       -------
+
+       is_integer : bool
+           Whether the value is an integer.
+    """
+    return _np.issubdtype(type(value), _np.integer)
+
+def _validate_times(times, n_frames):
+    """Internal helper function to validate trajectory time stamps.
+
+       Parameters
+       ----------
+
+       times : numpy.ndarray
+           The time stamp of each frame.
+
+       n_frames : int
+           The number of frames in the trajectory.
+
+       Returns
+       -------
+
+       times : numpy.ndarray
+           The time stamps, or None if they are missing or not in ascending
+           order.
+    """
+
+    if times is None or len(times) != n_frames:
+        return None
+
+    times = _np.asarray(times, dtype="float64")
+
+    if n_frames > 1 and not (_np.diff(times) > 0).all():
+        return None
+
+    return times
+
+def _get_topology_info(top_file):
+    """Internal helper function to get the cached information for a topology
+       file. This is keyed by the path, size, and modification time of the
+       file, so the topology is only re-parsed when the file changes.
+
+       Parameters
+       ----------
+
+       top_file : str
+           The topology file.
+
+       Returns
+       -------
+
+       info : dict
+           The cached information for the topology file.
+    """
+
+    path = _os.path.abspath(top_file)
+    stat = _os.stat(path)
+    key = (stat.st_size, stat.st_mtime_ns)
+
+    try:
+        info = _topology_cache[path]
+        if info["key"] == key:
+            return info
+    except KeyError:
+        pass
+
+    # Work out the MDTraj file extension for the topology. Only parse the file
+    # with Sire if the format can't be determined from its extension.
+    extension = _os.path.splitext(path)[1][1:].lower()
+    if extension not in _mdtraj_extensions:
+        file_format = _IO.readMolecules(path).fileFormat()
+        extension = _extensions.get(file_format, file_format.lower())
+
+    # Replace any stale entry for this file, then evict the oldest entry if
+    # the cache is full.
+    info = { "key" : key, "extension" : extension }
+    _topology_cache.pop(path, None)
+    if len(_topology_cache) >= _topology_cache_size:
+        del _topology_cache[next(iter(_topology_cache))]
+    _topology_cache[path] = info
+
+    return info
+
+def _get_mdtraj_topology(top_file):
+    """Internal helper function to get the (cached) MDTraj topology for a
+       topology file.
+
+       Parameters
+       ----------
+
+       top_file : str
+           The topology file.
+
+       Returns
+       -------
+
+       topology : mdtraj.core.topology.Topology
+           The MDTraj topology.
+    """
+
+    info = _get_topology_info(top_file)
+
+    try:
+        return info["mdtraj"]
+    except KeyError:
+        pass
+
+    path = _os.path.abspath(top_file)
+
+    # MDTraj recognises the format from the extension.
+    if path.lower().endswith("." + info["extension"]):
+        topology = _mdtraj.load_topology(path)
+
+    # Otherwise, link to the file from a temporary directory using an
+    # extension that MDTraj recognises.
+    else:
+        with _tempfile.TemporaryDirectory() as tmp_dir:
+            link = "%s/topology.%s" % (tmp_dir, info["extension"])
+            try:
+                _os.symlink(path, link)
+            except OSError:
+                _shutil.copyfile(path, link)
+            topology = _mdtraj.load_topology(link)
+
+    info["mdtraj"] = topology
+
+    return topology
+
+def _get_mdanalysis_topology(top_file):
+    """Internal helper function to get the (cached) MDAnalysis topology for a
+       topology file.
+
+       Parameters
+       ----------
+
+       top_file : str
+           The topology file.
+
+       Returns
+       -------
+
+       topology : MDAnalysis.core.topology.Topology
+           A copy of the MDAnalysis topology.
+    """
+
+    info = _get_topology_info(top_file)
+
+    try:
+        return info["mdanalysis"].copy()
+    except KeyError:
+        pass
+
+    # Work out the MDAnalysis format and parse the topology.
+    format = _mdanalysis_formats.get(info["extension"], info["extension"].upper())
+    parser = _get_parser_for(top_file, format=format)
+    with parser(top_file) as p:
+        topology = p.parse()
+
+    info["mdanalysis"] = topology
+
+    return topology.copy()
+
+def _frame_to_system(frame, top_file, property_map={}):
+    """Internal helper function to convert a single MDTraj frame to a System
+       object. The coordinates and box of the frame are copied into a template
+       system that is parsed once for each topology file.
+
+       Parameters
+       ----------
+
+       frame : mdtraj.core.trajectory.Trajectory
+           A single trajectory frame.
+
+       top_file : str
+           The topology file.
+
+       property_map : dict
+           A dictionary that maps system "properties" to their user defined
+           values. This allows the user to refer to properties with their
+           own naming scheme, e.g. { "charge" : "my-charge" }
+
+       Returns
+       -------
+
+       system : :class:`System <BioSimSpace._SireWrappers.System>`
+           The System object of the corresponding frame.
+    """
+
+    # Get the template system.
+    template, cut_groups = _get_template(frame, top_file)
+
+    if template.nAtoms() != frame.n_atoms:
+        raise _IncompatibleError("The trajectory frame contains a different number of "
+                                 "atoms to the topology. Expected '%d', found '%d'"
+                                 % (template.nAtoms(), frame.n_atoms))
+
+    # Work out the name of the "coordinates" property.
+    prop = property_map.get("coordinates", "coordinates")
+
+    # The frame coordinates in Angstrom.
+    xyz = 10 * frame.xyz[0].astype("float64")
+
+    # Create the updated molecules.
+    molecules = _SireMol.Molecules()
+    for idx, groups in enumerate(cut_groups):
+        # Create the coordinates for each CutGroup in the molecule.
+        coords = _SireVol.CoordGroupArray(
+            [_SireVol.CoordGroup([_SireMaths.Vector(*c) for c in xyz[group].tolist()])
+                for group in groups])
+
+        try:
+            mol = template.molecule(_SireMol.MolIdx(idx))
+            mol = mol.edit().setProperty(prop, _SireMol.AtomCoords(coords)).molecule().commit()
+        except Exception as e:
+            msg = "Unable to update 'coordinates' for molecule index '%d'" % idx
+            if _isVerbose():
+                raise _IncompatibleError(msg) from e
+            else:
+                raise _IncompatibleError(msg) from None
+
+        molecules.add(mol)
+
+    # Copy the template and update all of the molecules at once.
+    system = template.__deepcopy__()
+    system.update(molecules)
+    system = _System(system)
+
+    # The copy of the template is only referenced by the new System, so it
+    # can be edited in place.
+    system._is_shared = False
+
+    # Set the periodic box. Sire only supports orthorhombic periodic boxes,
+    # so raise an error rather than silently discarding a triclinic box.
+    if frame.unitcell_lengths is not None:
+        if not all(abs(x - 90) < 1e-3 for x in frame.unitcell_angles[0]):
+            raise _IncompatibleError("The trajectory frame has a triclinic box with angles "
+                                     "%s. Only orthorhombic boxes are supported."
+                                     % ", ".join("%.2f" % x for x in frame.unitcell_angles[0]))
+        system.setBox([_Length(10 * float(x), "angstrom") for x in frame.unitcell_lengths[0]],
+                      property_map)
+
+    return system
+
+def _get_template(frame, top_file):
+    """Internal helper function to get the template system for a topology.
+
+       Parameters
+       ----------
+
+       frame : mdtraj.core.trajectory.Trajectory
+           A single trajectory frame. This is used to create the template if
+           the topology can't be read on its own.
+
+       top_file : str
+           The topology file.
+
+       Returns
+       -------
+
+       (template, cut_groups) : (Sire.System.System, [[numpy.ndarray]])
+           The template system, along with the indices of the atoms in each
+           CutGroup of each molecule, in CutGroup order.
+    """
+
+    stat = _os.stat(top_file)
+    key = (_os.path.abspath(top_file), stat.st_size, stat.st_mtime_ns)
+
+    try:
+        return _template_cache[key]
+    except KeyError:
+        pass
+
+    # First try to read the topology on its own.
+    try:
+        template = _SireIO.MoleculeParser.read([top_file])
+        if template.nAtoms() != frame.n_atoms:
+            raise ValueError("Atom count mismatch.")
+
+    # Otherwise, some formats require coordinates, so read the topology
+    # along with the frame.
+    except:
+        with _tempfile.TemporaryDirectory() as tmp_dir:
+            frame_file = "%s/frame.nc" % tmp_dir
+            frame.save(frame_file)
+
+            try:
+                template = _SireIO.MoleculeParser.read([top_file, frame_file])
+            except Exception as e:
+                msg = "Failed to read trajectory frame with topology: '%s'" % top_file
+                if _isVerbose():
+                    raise IOError(msg) from e
+                else:
+                    raise IOError(msg) from None
+
+    # Work out the atoms in each CutGroup, since molecule coordinates are
+    # stored by CutGroup. The indices are relative to the start of the frame.
+    cut_groups = []
+    offset = 0
+    for idx in range(0, template.nMolecules()):
+        mol = template.molecule(_SireMol.MolIdx(idx))
+        info = mol.info()
+
+        groups = [[] for x in range(0, info.nCutGroups())]
+        for x in range(0, mol.nAtoms()):
+            cg_atom_idx = info.cgAtomIdx(_SireMol.AtomIdx(x))
+            groups[cg_atom_idx.cutGroup().value()].append((cg_atom_idx.atom().value(), offset + x))
+
+        cut_groups.append([_np.array([x[1] for x in sorted(group)], dtype=int) for group in groups])
+        offset += mol.nAtoms()
+
+    # Remove any out of date template for this topology file, then limit the
+    # size of the cache, since templates can be large.
+    for k in [k for k in _template_cache if k[0] == key[0]]:
+        del _template_cache[k]
+    if len(_template_cache) >= _template_cache_size:
+        del _template_cache[next(iter(_template_cache))]
+    _template_cache[key] = (template, cut_groups)
+
+    return _template_cache[key]
+
+def _write_chunk(file, format, traj):
+    """Internal helper function to write a chunk of frames to an open
+       trajectory file.
+
+       Parameters
+       ----------
+
+       file : mdtraj.formats
+           The open trajectory file.
+
+       format : str
+           The trajectory format.
+
+       traj : mdtraj.core.trajectory.Trajectory
+           The chunk of frames.
+    """
+
+    # XTC files store coordinates in nanometers.
+    if format == "xtc":
+        file.write(traj.xyz, time=traj.time, box=traj.unitcell_vectors)
+        return
+
+    # DCD and NetCDF files store coordinates in Angstrom.
+    if traj.unitcell_lengths is None:
+        cell_lengths = None
+        cell_angles = None
+    else:
+        cell_lengths = 10 * traj.unitcell_lengths
+        cell_angles = traj.unitcell_angles
+
+    if format == "dcd":
+        file.write(10 * traj.xyz, cell_lengths=cell_lengths, cell_angles=cell_angles)
+    else:
+        file.write(10 * traj.xyz, time=traj.time, cell_lengths=cell_lengths,
+                   cell_angles=cell_angles)
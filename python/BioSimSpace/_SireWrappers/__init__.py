@@ -34,6 +34,7 @@ Classes
     Residue
     System
     SearchResult
+    Snapshot
 """
 
 from ._atom import *
@@ -41,4 +42,5 @@ from ._molecule import *
 from ._molecules import *
 from ._residue import *
 from ._search_result import *
+from ._snapshot import *
 from ._system import *
@@ -31,12 +31,15 @@ __all__ = ["Molecule"]
 
 from pytest import approx as _approx
 
+import numpy as _np
+import operator as _operator
 import os.path as _path
 import random as _random
 import string as _string
 
 from Sire import Base as _SireBase
 from Sire import CAS as _SireCAS
+from Sire import Maths as _SireMaths
 from Sire import MM as _SireMM
 from Sire import Mol as _SireMol
 from Sire import Units as _SireUnits
@@ -50,6 +53,9 @@ from ._sire_wrapper import SireWrapper as _SireWrapper
 class Molecule(_SireWrapper):
     """A container class for storing a molecule."""
 
+    # Attributes that are restored when unpickling a molecule.
+    _pickled_attributes = ("_forcefield", "_molecule0", "_molecule1", "_is_merged")
+
     def __init__(self, molecule):
         """Constructor.
 
@@ -325,6 +331,109 @@ class Molecule(_SireWrapper):
         """
         return _System(self)
 
+    def getCoordinates(self, property_map={}):
+        """Return the coordinates of the atoms in the molecule.
+
+           Parameters
+           ----------
+
+           property_map : dict
+               A dictionary that maps system "properties" to their user defined
+               values. This allows the user to refer to properties with their
+               own naming scheme, e.g. { "charge" : "my-charge" }
+
+           Returns
+           -------
+
+           coordinates : numpy.ndarray
+               An array of shape (nAtoms, 3) containing the coordinates of
+               each atom in Angstrom.
+        """
+
+        if type(property_map) is not dict:
+            raise TypeError("'property_map' must be of type 'dict'")
+
+        return _get_coordinates(self._sire_object,
+            _get_property_name(self._sire_object, "coordinates", property_map))
+
+    def setCoordinates(self, coordinates, property_map={}):
+        """Set the coordinates of the atoms in the molecule.
+
+           Parameters
+           ----------
+
+           coordinates : numpy.ndarray
+               An array of shape (nAtoms, 3) containing the coordinates of
+               each atom in Angstrom.
+
+           property_map : dict
+               A dictionary that maps system "properties" to their user defined
+               values. This allows the user to refer to properties with their
+               own naming scheme, e.g. { "charge" : "my-charge" }
+        """
+
+        if type(property_map) is not dict:
+            raise TypeError("'property_map' must be of type 'dict'")
+
+        coordinates = _validate_array(coordinates, self.nAtoms(), "coordinates")
+
+        self._sire_object = _set_coordinates(self._sire_object,
+            _get_property_name(self._sire_object, "coordinates", property_map), coordinates)
+
+    def getVelocities(self, property_map={}):
+        """Return the velocities of the atoms in the molecule.
+
+           Parameters
+           ----------
+
+           property_map : dict
+               A dictionary that maps system "properties" to their user defined
+               values. This allows the user to refer to properties with their
+               own naming scheme, e.g. { "charge" : "my-charge" }
+
+           Returns
+           -------
+
+           velocities : numpy.ndarray
+               An array of shape (nAtoms, 3) containing the velocity of each
+               atom in Angstrom per picosecond, or None if the molecule has
+               no velocities.
+        """
+
+        if type(property_map) is not dict:
+            raise TypeError("'property_map' must be of type 'dict'")
+
+        prop = _get_property_name(self._sire_object, "velocity", property_map)
+
+        if not self._sire_object.hasProperty(prop):
+            return None
+
+        return _get_velocities(self._sire_object, prop)
+
+    def setVelocities(self, velocities, property_map={}):
+        """Set the velocities of the atoms in the molecule.
+
+           Parameters
+           ----------
+
+           velocities : numpy.ndarray
+               An array of shape (nAtoms, 3) containing the velocity of each
+               atom in Angstrom per picosecond.
+
+           property_map : dict
+               A dictionary that maps system "properties" to their user defined
+               values. This allows the user to refer to properties with their
+               own naming scheme, e.g. { "charge" : "my-charge" }
+        """
+
+        if type(property_map) is not dict:
+            raise TypeError("'property_map' must be of type 'dict'")
+
+        velocities = _validate_array(velocities, self.nAtoms(), "velocities")
+
+        self._sire_object = _set_velocities(self._sire_object,
+            _get_property_name(self._sire_object, "velocity", property_map), velocities)
+
     def search(self, query):
         """Search the molecule for atoms and residues. Search results will be
            reduced to their minimal representation, i.e. a residue containing
@@ -367,7 +476,7 @@ class Molecule(_SireWrapper):
 
         try:
             # Query the Sire system.
-            search_result = self._sire_object.search(query)
+            search_result = _select(self._sire_object, query)
 
         except Exception as e:
             msg = "'Invalid search query: %r" % query
@@ -2986,6 +3095,269 @@ def _is_dummy(mol, idxs, is_lambda1=False):
 
     return is_dummy
 
+def _get_property_name(mol, name, property_map={}):
+    """Internal helper function to get the name of a per-atom property of a
+       molecule. The lambda = 0 property is used for perturbable molecules.
+
+       Parameters
+       ----------
+
+       mol : Sire.Mol.Molecule
+           The molecule.
+
+       name : str
+           The default name of the property.
+
+       property_map : dict
+           A dictionary that maps system "properties" to their user defined
+           values.
+
+       Returns
+       -------
+
+       prop : str
+           The name of the property.
+    """
+
+    if name in property_map:
+        return property_map[name]
+    elif mol.hasProperty("is_perturbable"):
+        return name + "0"
+    else:
+        return name
+
+def _validate_array(array, num_atoms, name):
+    """Internal helper function to validate an array of per-atom vectors.
+
+       Parameters
+       ----------
+
+       array : numpy.ndarray
+           The array.
+
+       num_atoms : int
+           The expected number of atoms.
+
+       name : str
+           The name of the array, used in error messages.
+
+       Returns
+       -------
+
+       array : numpy.ndarray
+           The array, converted to a float array of shape (num_atoms, 3).
+    """
+
+    try:
+        array = _np.asarray(array, dtype=float)
+    except:
+        raise TypeError("'%s' must be of type 'numpy.ndarray'" % name)
+
+    if array.shape != (num_atoms, 3):
+        raise ValueError("'%s' must have shape (%d, 3), found %s"
+                         % (name, num_atoms, array.shape))
+
+    return array
+
+def _cut_group_order(mol):
+    """Internal helper function to work out the order in which per-atom
+       properties of a molecule are stored. These are stored by CutGroup,
+       which needn't match the atom order.
+
+       Parameters
+       ----------
+
+       mol : Sire.Mol.Molecule
+           The molecule.
+
+       Returns
+       -------
+
+       order : numpy.ndarray
+           The index of the atom for each stored value.
+    """
+
+    info = mol.info()
+    num_atoms = mol.nAtoms()
+
+    # Most molecules have a single CutGroup, so the order is unchanged.
+    if info.nCutGroups() == 1:
+        return _np.arange(num_atoms)
+
+    keys = []
+    for x in range(0, num_atoms):
+        cg_atom_idx = info.cgAtomIdx(_SireMol.AtomIdx(x))
+        keys.append((cg_atom_idx.cutGroup().value(), cg_atom_idx.atom().value()))
+
+    return _np.array(sorted(range(0, num_atoms), key=keys.__getitem__), dtype=int)
+
+def _get_coordinates(mol, prop):
+    """Internal helper function to get the coordinates of a molecule as an
+       array in atom order.
+
+       Parameters
+       ----------
+
+       mol : Sire.Mol.Molecule
+           The molecule.
+
+       prop : str
+           The name of the coordinates property.
+
+       Returns
+       -------
+
+       coordinates : numpy.ndarray
+           An array of shape (nAtoms, 3) containing the coordinates in Angstrom.
+    """
+
+    try:
+        values = mol.property(prop).toVector()
+    except Exception as e:
+        msg = "Molecule has no '%s' property." % prop
+        if _isVerbose():
+            raise _IncompatibleError(msg) from e
+        else:
+            raise _IncompatibleError(msg) from None
+
+    order = _cut_group_order(mol)
+
+    # Extract the components of the vectors in a single pass over the
+    # property array, which is stored in CutGroup order.
+    coordinates = _np.empty((len(values), 3))
+    coordinates[order] = _np.array([list(map(_SireMaths.Vector.x, values)),
+                                    list(map(_SireMaths.Vector.y, values)),
+                                    list(map(_SireMaths.Vector.z, values))]).T
+
+    return coordinates
+
+def _set_coordinates(mol, prop, coordinates):
+    """Internal helper function to set the coordinates of a molecule from an
+       array in atom order.
+
+       Parameters
+       ----------
+
+       mol : Sire.Mol.Molecule
+           The molecule.
+
+       prop : str
+           The name of the coordinates property.
+
+       coordinates : numpy.ndarray
+           An array of shape (nAtoms, 3) containing the coordinates in Angstrom.
+
+       Returns
+       -------
+
+       mol : Sire.Mol.Molecule
+           The updated molecule.
+    """
+
+    order = _cut_group_order(mol)
+    x, y, z = coordinates[order].T.tolist()
+
+    try:
+        # Copy the vectors into the property array in a single call. The
+        # values must be in CutGroup order.
+        atom_coords = _SireMol.AtomCoords(mol.info())
+        atom_coords.copyFrom(list(map(_SireMaths.Vector, x, y, z)))
+
+        return mol.edit().setProperty(prop, atom_coords).molecule().commit()
+    except Exception as e:
+        msg = "Unable to update '%s' property." % prop
+        if _isVerbose():
+            raise _IncompatibleError(msg) from e
+        else:
+            raise _IncompatibleError(msg) from None
+
+def _get_velocities(mol, prop):
+    """Internal helper function to get the velocities of a molecule as an
+       array in atom order.
+
+       Parameters
+       ----------
+
+       mol : Sire.Mol.Molecule
+           The molecule.
+
+       prop : str
+           The name of the velocity property.
+
+       Returns
+       -------
+
+       velocities : numpy.ndarray
+           An array of shape (nAtoms, 3) containing the velocities in Angstrom
+           per picosecond.
+    """
+
+    unit = _SireUnits.angstrom / _SireUnits.picosecond
+
+    try:
+        values = mol.property(prop).toVector()
+    except Exception as e:
+        msg = "Molecule has no '%s' property." % prop
+        if _isVerbose():
+            raise _IncompatibleError(msg) from e
+        else:
+            raise _IncompatibleError(msg) from None
+
+    order = _cut_group_order(mol)
+
+    # Extract the components of the vectors in internal units, then convert
+    # the whole array at once.
+    value = _operator.methodcaller("value")
+    velocities = _np.empty((len(values), 3))
+    velocities[order] = _np.array([list(map(value, map(_SireMol.Velocity3D.x, values))),
+                                   list(map(value, map(_SireMol.Velocity3D.y, values))),
+                                   list(map(value, map(_SireMol.Velocity3D.z, values)))]).T
+
+    return velocities / unit.value()
+
+def _set_velocities(mol, prop, velocities):
+    """Internal helper function to set the velocities of a molecule from an
+       array in atom order.
+
+       Parameters
+       ----------
+
+       mol : Sire.Mol.Molecule
+           The molecule.
+
+       prop : str
+           The name of the velocity property.
+
+       velocities : numpy.ndarray
+           An array of shape (nAtoms, 3) containing the velocities in Angstrom
+           per picosecond.
+
+       Returns
+       -------
+
+       mol : Sire.Mol.Molecule
+           The updated molecule.
+    """
+
+    unit = _SireUnits.angstrom / _SireUnits.picosecond
+
+    order = _cut_group_order(mol)
+    x, y, z = (map(unit.__rmul__, v) for v in velocities[order].T.tolist())
+
+    try:
+        # Copy the velocities into the property array in a single call. The
+        # values must be in CutGroup order.
+        atom_velocities = _SireMol.AtomVelocities(mol.info())
+        atom_velocities.copyFrom(list(map(_SireMol.Velocity3D, x, y, z)))
+
+        return mol.edit().setProperty(prop, atom_velocities).molecule().commit()
+    except Exception as e:
+        msg = "Unable to update '%s' property." % prop
+        if _isVerbose():
+            raise _IncompatibleError(msg) from e
+        else:
+            raise _IncompatibleError(msg) from None
+
 def _random_suffix(basename, size=4, chars=_string.ascii_uppercase + _string.digits):
     """Internal helper function to generate a random atom name suffix to avoid
        naming clashes.
@@ -3185,4 +3557,5 @@ from ._atom import Atom as _Atom
 from ._molecules import Molecules as _Molecules
 from ._residue import Residue as _Residue
 from ._search_result import SearchResult as _SearchResult
+from ._search_result import _select
 from ._system import System as _System
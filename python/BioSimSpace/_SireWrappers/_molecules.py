@@ -113,8 +113,8 @@ class Molecules(_SireWrapper):
         if type(other) is tuple:
             other = list(other)
 
-        # Extract the molecules.
-        molecules = self._sire_object
+        # Copy the molecules, so that this object isn't modified.
+        molecules = self._sire_object.__deepcopy__()
 
         # Validate the input.
 
@@ -313,6 +313,9 @@ class Molecules(_SireWrapper):
         if type(property_map) is not dict:
             raise TypeError("'property_map' must be of type 'dict'")
 
+        # Make sure the Sire container isn't shared before editing.
+        self._detach()
+
         # Translate each of the molecules in the container.
         for n in self._sire_object.molNums():
             # Copy the property map.
@@ -367,7 +370,7 @@ class Molecules(_SireWrapper):
 
         try:
             # Query the Sire system.
-            search_result = self._sire_object.search(query)
+            search_result = _select(self._sire_object, query)
 
         except Exception as e:
             msg = "'Invalid search query: %r" % query
@@ -395,9 +398,10 @@ class Molecules(_SireWrapper):
            aabox : Sire.Vol.AABox
                The axis-aligned bounding box for the molecule.
         """
-        return self.toSystem()._getAABox()
+        return self.toSystem()._getAABox(property_map)
 
 # Import at bottom of module to avoid circular dependency.
 from ._molecule import Molecule as _Molecule
 from ._search_result import SearchResult as _SearchResult
+from ._search_result import _select
 from ._system import System as _System
@@ -260,7 +260,7 @@ class Residue(_SireWrapper):
 
         try:
             # Query the Sire system.
-            search_result = self._sire_object.search(query)
+            search_result = _select(self._sire_object, query)
 
         except Exception as e:
             msg = "'Invalid search query: %r" % query
@@ -275,3 +275,4 @@ class Residue(_SireWrapper):
 from ._atom import Atom as _Atom
 from ._molecule import Molecule as _Molecule
 from ._search_result import SearchResult as _SearchResult
+from ._search_result import _select
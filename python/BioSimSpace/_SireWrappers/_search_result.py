@@ -29,8 +29,14 @@ __email_ = "lester.hedges@gmail.com"
 
 __all__ = ["SearchResult"]
 
+from collections import OrderedDict as _OrderedDict
+
 from Sire import Mol as _SireMol
 
+# A cache of compiled search queries, keyed by the query string.
+_select_cache = _OrderedDict()
+_select_cache_size = 256
+
 class SearchResult():
     """A thin wrapper around Sire.Mol.SelectResult."""
 
@@ -236,6 +242,40 @@ class SearchResult():
         """
         return self._sire_object
 
+def _select(sire_object, query):
+    """Internal helper function to search a Sire object using a compiled
+       search query. Queries are only parsed the first time they are used.
+
+       Parameters
+       ----------
+
+       sire_object : Sire.System.System, Sire.Mol.Molecules, Sire.Mol.MoleculeView
+           The object to search.
+
+       query : str
+           The search query.
+
+       Returns
+       -------
+
+       search_result : Sire.Mol.SelectResult
+           The result of the search.
+    """
+
+    try:
+        select = _select_cache[query]
+        _select_cache.move_to_end(query)
+    except KeyError:
+        select = _SireMol.Select(query)
+
+        # Store the compiled query, discarding the least recently used entry
+        # if the cache is full.
+        _select_cache[query] = select
+        if len(_select_cache) > _select_cache_size:
+            _select_cache.popitem(last=False)
+
+    return select(sire_object)
+
 # Import at bottom of module to avoid circular dependency.
 from ._atom import Atom as _Atom
 from ._molecule import Molecule as _Molecule
@@ -31,6 +31,7 @@ __all__ = ["SireWrapper"]
 
 from Sire import Maths as _SireMaths
 from Sire import Mol as _SireMol
+from Sire import Stream as _SireStream
 from Sire import Vol as _SireVol
 
 from BioSimSpace import _isVerbose
@@ -40,6 +41,10 @@ from BioSimSpace import Units as _Units
 class SireWrapper():
     """A base class for wrapping Sire objects."""
 
+    # Attributes that are restored when unpickling an object. All other
+    # attributes are re-created from the Sire object by the constructor.
+    _pickled_attributes = ()
+
     def __init__(self, object):
         """Constructor.
 
@@ -50,8 +55,12 @@ class SireWrapper():
                A Sire object.
         """
 
-        # Store a deep copy of the Sire object.
-        self._sire_object = object.__deepcopy__()
+        # Store a reference to the Sire object. This is shared until the first
+        # in-place edit, at which point a deep copy is made. Edits to a single
+        # molecule, residue, or atom always replace the Sire object, so only
+        # in-place edits of System and Molecules containers need a copy.
+        self._sire_object = object
+        self._is_shared = True
 
         # Intialise flags.
         self._is_multi_atom = False
@@ -79,6 +88,13 @@ class SireWrapper():
         """Hash operator."""
         return hash(self._sire_object)
 
+    def __reduce__(self):
+        """Pickle the object. The Sire object is stored in Sire's binary
+           stream format.
+        """
+        state = { attr : getattr(self, attr) for attr in self._pickled_attributes }
+        return (_unpickle, (type(self), _serialise(self._sire_object), state))
+
     def copy(self):
         """Return a copy of this object. The return type is same as the object
            on which copy is called.
@@ -93,7 +109,13 @@ class SireWrapper():
                     :class:`System <BioSimSpace._SireWrappers.System>`
                A copy of the object.
         """
-        return type(self)(self)
+        # Wrapping this object marks it as shared. The copy is detached
+        # straight away, so restore the original state of this object.
+        is_shared = self._is_shared
+        copy = type(self)(self)
+        copy._detach()
+        self._is_shared = is_shared
+        return copy
 
     def charge(self, property_map={}, is_lambda1=False):
         """Return the charge.
@@ -222,6 +244,14 @@ class SireWrapper():
 
         return box_min, box_max
 
+    def _detach(self):
+        """Make a deep copy of the Sire object if it is shared with another
+           object. This must be called before editing the Sire object in place.
+        """
+        if self._is_shared:
+            self._sire_object = self._sire_object.__deepcopy__()
+            self._is_shared = False
+
     def _getSireObject(self):
         """Return the underlying Sire object.
 
@@ -284,3 +314,71 @@ class SireWrapper():
 
         # Return the AABox for the coordinates.
         return _SireVol.AABox(coord)
+
+def _serialise(object):
+    """Internal helper function to serialise a Sire object using Sire's binary
+       stream format.
+
+       Parameters
+       ----------
+
+       object : Sire.System.System, Sire.Mol.Molecule, Sire.Mol.Residue, Sire.Mol.Atom
+           A Sire object.
+
+       Returns
+       -------
+
+       data : bytes
+           The serialised object.
+    """
+    return _SireStream.save(object)
+
+def _deserialise(data):
+    """Internal helper function to restore a Sire object that was serialised
+       using '_serialise'.
+
+       Parameters
+       ----------
+
+       data : bytes
+           The serialised object.
+
+       Returns
+       -------
+
+       object : Sire.System.System, Sire.Mol.Molecule, Sire.Mol.Residue, Sire.Mol.Atom
+           The Sire object.
+    """
+    return _SireStream.load(data)
+
+def _unpickle(cls, data, state):
+    """Internal helper function to restore a pickled wrapper object.
+
+       Parameters
+       ----------
+
+       cls : type
+           The type of the wrapper object.
+
+       data : bytes
+           The serialised Sire object.
+
+       state : dict
+           The pickled attributes of the object.
+
+       Returns
+       -------
+
+       object : :class:`SireWrapper <BioSimSpace._SireWrappers.SireWrapper>`
+           The restored object.
+    """
+
+    object = cls(_deserialise(data))
+
+    # The restored Sire object isn't referenced by anything else.
+    object._is_shared = False
+
+    for attr, value in state.items():
+        setattr(object, attr, value)
+
+    return object
@@ -0,0 +1,254 @@
+######################################################################
+# BioSimSpace: Making biomolecular simulation a breeze!
+#
+# Copyright: 2017-2020
+#
+# Authors: Lester Hedges <lester.hedges@gmail.com>
+#
+# BioSimSpace is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# BioSimSpace is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BioSimSpace. If not, see <http://www.gnu.org/licenses/>.
+#####################################################################
+
+"""
+A picklable binary snapshot of a system. This is an internal package and should
+not be directly exposed to the user.
+"""
+
+__author__ = "Lester Hedges"
+__email_ = "lester.hedges@gmail.com"
+
+__all__ = ["Snapshot"]
+
+import numpy as _np
+import os as _os
+import sys as _sys
+import weakref as _weakref
+
+# Shared memory requires Python 3.8 or later.
+try:
+    from multiprocessing import resource_tracker as _resource_tracker
+    from multiprocessing.shared_memory import SharedMemory as _SharedMemory
+    _has_shared_memory = True
+except ImportError:
+    _has_shared_memory = False
+
+from ._sire_wrapper import _deserialise, _serialise
+
+class Snapshot():
+    """A compact, picklable binary snapshot of a system. The system is stored
+       in Sire's binary stream format, and the coordinates can optionally be
+       placed in a shared memory buffer so that they can be read and updated
+       by worker processes without being pickled. The buffer is released when
+       the snapshot is closed, either explicitly, on leaving a 'with' block,
+       or when the snapshot is garbage collected.
+    """
+
+    def __init__(self, system, shared_memory=False, property_map={}):
+        """Constructor.
+
+           Parameters
+           ----------
+
+           system : :class:`System <BioSimSpace._SireWrappers.System>`
+               The system.
+
+           shared_memory : bool
+               Whether to place the coordinates in a shared memory buffer.
+
+           property_map : dict
+               A dictionary that maps system "properties" to their user defined
+               values. This allows the user to refer to properties with their
+               own naming scheme, e.g. { "charge" : "my-charge" }
+        """
+
+        if type(system) is not _System:
+            raise TypeError("'system' must be of type 'BioSimSpace._SireWrappers.System'")
+
+        if type(shared_memory) is not bool:
+            raise TypeError("'shared_memory' must be of type 'bool'")
+
+        if type(property_map) is not dict:
+            raise TypeError("'property_map' must be of type 'dict'")
+
+        self._property_map = property_map.copy()
+
+        self._shared_memory = None
+        self._shared_memory_name = None
+        self._shape = None
+        self._is_owner = False
+        self._owner_pid = None
+        self._finalizer = None
+
+        # Copy the coordinates into a shared memory buffer.
+        if shared_memory:
+            if not _has_shared_memory:
+                raise ValueError("Shared memory requires Python 3.8 or later.")
+
+            coordinates = system.getCoordinates(property_map=property_map)
+
+            self._shared_memory = _SharedMemory(create=True, size=max(coordinates.nbytes, 1))
+            self._shared_memory_name = self._shared_memory.name
+            self._shape = coordinates.shape
+            self._is_owner = True
+            self._owner_pid = _os.getpid()
+            self._finalizer = _weakref.finalize(self, _release, self._shared_memory, True)
+
+            self.getCoordinates()[:] = coordinates
+
+            # The coordinates are restored from the buffer, so zero them in
+            # the streamed system to keep the binary data compact.
+            system = system.copy()
+            system.setCoordinates(_np.zeros(coordinates.shape), property_map=property_map)
+
+        # Serialise the system.
+        self._data = _serialise(system._sire_object)
+
+    def __str__(self):
+        """Return a human readable string representation of the object."""
+        return "<BioSimSpace.Snapshot: nBytes=%d, isShared=%r>" \
+            % (len(self._data), self._shared_memory_name is not None)
+
+    def __repr__(self):
+        """Return a string showing how to instantiate the object."""
+        return self.__str__()
+
+    def __getstate__(self):
+        """Return the state of the object for pickling. The shared memory
+           buffer is passed by name.
+        """
+        state = self.__dict__.copy()
+        state["_shared_memory"] = None
+        state["_is_owner"] = False
+        state["_finalizer"] = None
+        return state
+
+    def __setstate__(self, state):
+        """Restore the state of the object, attaching to any shared memory
+           buffer.
+        """
+        self.__dict__.update(state)
+        if self._shared_memory_name is not None:
+            # Only the process that created the buffer should unlink it. Stop
+            # the resource tracker from unlinking the buffer when an attaching
+            # process exits.
+            if _sys.version_info >= (3, 13):
+                self._shared_memory = _SharedMemory(name=self._shared_memory_name, track=False)
+            else:
+                self._shared_memory = _SharedMemory(name=self._shared_memory_name)
+                if _os.getpid() != self._owner_pid:
+                    _resource_tracker.unregister(self._shared_memory._name, "shared_memory")
+
+            self._finalizer = _weakref.finalize(self, _release, self._shared_memory, False)
+
+    def __enter__(self):
+        """Enter a context, returning the snapshot."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Exit the context, closing the shared memory buffer."""
+        self.close()
+
+    def isShared(self):
+        """Whether the coordinates are stored in a shared memory buffer.
+
+           Returns
+           -------
+
+           is_shared : bool
+               Whether the coordinates are shared.
+        """
+        return self._shared_memory_name is not None
+
+    def getCoordinates(self):
+        """Return the coordinates in the shared memory buffer. The array is a
+           view of the buffer, so changes are seen by all processes.
+
+           Returns
+           -------
+
+           coordinates : numpy.ndarray
+               An array of shape (n_atoms, 3) containing the coordinates of
+               each atom in Angstrom, or None if the coordinates aren't
+               shared.
+        """
+
+        if self._shared_memory is None:
+            return None
+
+        return _np.ndarray(self._shape, dtype=_np.float64, buffer=self._shared_memory.buf)
+
+    def toSystem(self):
+        """Restore the system. If the coordinates are shared, then the current
+           coordinates in the shared memory buffer are used.
+
+           Returns
+           -------
+
+           system : :class:`System <BioSimSpace._SireWrappers.System>`
+               The system.
+        """
+
+        system = _System(_deserialise(self._data))
+
+        # The restored Sire system isn't referenced by anything else.
+        system._is_shared = False
+
+        if self._shared_memory is not None:
+            system.setCoordinates(self.getCoordinates(), property_map=self._property_map)
+
+        return system
+
+    def close(self):
+        """Close the shared memory buffer. The buffer is released once it has
+           been closed by the process that created the snapshot.
+        """
+
+        if self._shared_memory is None:
+            return
+
+        # Release the buffer. The finalizer only runs once.
+        self._finalizer()
+
+        self._shared_memory = None
+        self._finalizer = None
+
+def _release(shared_memory, is_owner):
+    """Internal helper function to close a shared memory buffer, unlinking it
+       if it is owned by the current process.
+
+       Parameters
+       ----------
+
+       shared_memory : multiprocessing.shared_memory.SharedMemory
+           The shared memory buffer.
+
+       is_owner : bool
+           Whether the buffer was created by this process.
+    """
+    try:
+        shared_memory.close()
+    except BufferError:
+        # An array view of the buffer is still alive. The buffer is closed
+        # when the last reference to it is released.
+        pass
+
+    if is_owner:
+        # Processes that attached to the buffer may share our resource tracker
+        # and will have unregistered the buffer from it, so register it again
+        # before unlinking. Registering an existing buffer has no effect.
+        if _sys.version_info < (3, 13):
+            _resource_tracker.register(shared_memory._name, "shared_memory")
+        shared_memory.unlink()
+
+# Import at bottom of module to avoid circular dependency.
+from ._system import System as _System
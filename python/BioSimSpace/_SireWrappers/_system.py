@@ -29,6 +29,14 @@ __email_ = "lester.hedges@gmail.com"
 
 __all__ = ["System"]
 
+from collections import OrderedDict as _OrderedDict
+
+import numpy as _np
+import warnings as _warnings
+
+from scipy.spatial import cKDTree as _cKDTree
+
+from Sire import IO as _SireIO
 from Sire import Maths as _SireMaths
 from Sire import Mol as _SireMol
 from Sire import System as _SireSystem
@@ -41,6 +49,21 @@ from BioSimSpace import Units as _Units
 
 from ._sire_wrapper import SireWrapper as _SireWrapper
 
+# A cache of systems whose water molecules have been converted to an AMBER
+# compatible topology. This is keyed by the unique identifier and version of
+# the original system, along with the water model.
+_amber_water_cache = _OrderedDict()
+_amber_water_cache_size = 4
+
+# The maximum number of search results cached by each system.
+_search_cache_size = 32
+
+# Residue names used to classify a molecule as a protein.
+_amino_acids = {"ALA", "ARG", "ASH", "ASN", "ASP", "CYM", "CYS", "CYX", "GLH",
+                "GLN", "GLU", "GLY", "HID", "HIE", "HIP", "HIS", "HYP", "ILE",
+                "LEU", "LYN", "LYS", "MET", "PHE", "PRO", "SER", "THR", "TRP",
+                "TYR", "VAL", "ACE", "NME"}
+
 class _MolWithResName(_SireMol.MolWithResID):
     def __init__(self, resname):
         super().__init__(_SireMol.ResName(resname))
@@ -48,6 +71,9 @@ class _MolWithResName(_SireMol.MolWithResID):
 class System(_SireWrapper):
     """A container class for storing molecular systems."""
 
+    # Attributes that are restored when unpickling a system.
+    _pickled_attributes = ("_sizes", "_offsets", "_mol_types")
+
     def __init__(self, system):
         """Constructor.
 
@@ -68,31 +94,33 @@ class System(_SireWrapper):
         if type(system) is tuple:
             system = list(system)
 
+        # Any molecules that need to be added to a new Sire system.
+        molecules = None
+
         # A Sire System object.
         if type(system) is _SireSystem.System:
-            super().__init__(system)
+            sire_object = system
 
-        # Another BioSimSpace System object.
+        # Another BioSimSpace System object. The Sire system is now shared by
+        # both wrappers, so each must copy it before editing in place.
         elif type(system) is System:
-            super().__init__(system._sire_object)
+            sire_object = system._sire_object
+            system._is_shared = True
 
         # A Sire Molecule object.
         elif type(system) is _SireMol.Molecule:
             sire_object = _SireSystem.System("BioSimSpace System.")
-            super().__init__(sire_object)
-            self.addMolecules(_Molecule(system))
+            molecules = _Molecule(system)
 
         # A BioSimSpace Molecule object.
         elif type(system) is _Molecule:
             sire_object = _SireSystem.System("BioSimSpace System.")
-            super().__init__(sire_object)
-            self.addMolecules(system)
+            molecules = system
 
         # A BioSimSpace Molecules object.
         elif type(system) is _Molecules:
             sire_object = _SireSystem.System("BioSimSpace System.")
-            super().__init__(sire_object)
-            self.addMolecules(system)
+            molecules = system
 
         # A list of BioSimSpace Molecule objects.
         elif type(system) is list:
@@ -100,8 +128,7 @@ class System(_SireWrapper):
                 raise TypeError("'system' must contain a list of 'BioSimSpace._SireWrappers.Molecule' types.")
             else:
                 sire_object = _SireSystem.System("BioSimSpace System.")
-                super().__init__(sire_object)
-                self.addMolecules(system)
+                molecules = system
 
         # Invalid type.
         else:
@@ -109,19 +136,37 @@ class System(_SireWrapper):
                             " Sire.Mol.Molecule', 'BioSimSpace._SireWrappers.Molecule', "
                             "or a list of 'BioSimSpace._SireWrappers.Molecule' types.")
 
+        super().__init__(sire_object)
+
         # Flag that this object holds multiple atoms.
         self._is_multi_atom = True
 
-        # Initalise dictionaries mapping MolNums to the number cumulative
-        # number of atoms/residues in the system, up to that MolNum.
-        self._atom_index_tally = {}
-        self._residue_index_tally = {}
+        # Initialise the version counter, which is incremented whenever the
+        # system is edited, and the cache of search results.
+        self._version = 0
+        self._search_cache = {}
 
-        # Initialise dictionary to map MolNum to MolIdx.
-        self._molecule_index = {}
+        # Initialise the spatial index, which is built on demand.
+        self._neighbour_index = None
 
-        # Store the molecule numbers.
-        self._mol_nums = self._sire_object.molNums()
+        # Initialise the molecule numbers, the dictionary mapping MolNum to
+        # MolIdx, and the index of molecule sizes. This must be done before
+        # any molecules are added.
+        self._reset_mappings()
+
+        # Re-use the index of molecule sizes from the other system.
+        if type(system) is System and system._offsets is not None:
+            self._sizes = system._sizes.copy()
+            self._offsets = system._offsets.copy()
+
+        # Re-use the molecule types from the other system.
+        if type(system) is System and system._mol_types is not None:
+            self._mol_types = system._mol_types.copy()
+
+        # Add the molecules to the new Sire system.
+        if molecules is not None:
+            self._is_shared = False
+            self.addMolecules(molecules)
 
         # Intialise the iterator counter.
         self._iter_count = 0
@@ -138,7 +183,7 @@ class System(_SireWrapper):
         """Addition operator."""
 
         # Create a copy of the current system.
-        system = System(self._sire_object.__deepcopy__())
+        system = self.copy()
 
         # Add the new molecules.
         system.addMolecules(other)
@@ -150,7 +195,7 @@ class System(_SireWrapper):
         """Subtraction operator."""
 
         # Create a copy of the current system.
-        system = System(self._sire_object.__deepcopy__())
+        system = self.copy()
 
         # Remove the molecules from the other system.
         if type(other) is System:
@@ -243,13 +288,7 @@ class System(_SireWrapper):
            num_residues : int
                The number of residues in the system.
         """
-
-        tally = 0
-
-        for n in self._sire_object.molNums():
-            tally += self._sire_object[n].nResidues()
-
-        return tally
+        return int(self._getOffsets()[-1, 1])
 
     def nChains(self):
         """Return the number of chains in the system.
@@ -260,13 +299,7 @@ class System(_SireWrapper):
            num_chains : int
                The number of chains in the system.
         """
-
-        tally = 0
-
-        for n in self._sire_object.molNums():
-            tally += self._sire_object[n].nChains()
-
-        return tally
+        return int(self._getOffsets()[-1, 2])
 
     def nAtoms(self):
         """Return the number of atoms in the system.
@@ -277,13 +310,7 @@ class System(_SireWrapper):
            num_atoms : int
                The number of atoms in the system.
         """
-
-        tally = 0
-
-        for n in self._sire_object.molNums():
-            tally += self._sire_object[n].nAtoms()
-
-        return tally
+        return int(self._getOffsets()[-1, 0])
 
     def charge(self, property_map={}, is_lambda1=False):
         """Return the total molecular charge.
@@ -344,7 +371,7 @@ class System(_SireWrapper):
         except:
             return None
 
-    def addMolecules(self, molecules):
+    def addMolecules(self, molecules, renumber=False):
         """Add a molecule, or list of molecules to the system.
 
            Parameters
@@ -355,8 +382,16 @@ class System(_SireWrapper):
                        [:class:`Molecule <BioSimSpace._SireWrappers.Molecule>`], \
                        :class:`System <BioSimSpace._SireWrappers.System>`
               A Molecule, Molecules object, a list of Molecule objects, or a System containing molecules.
+
+           renumber : bool
+              Whether to renumber the molecules, residues, and atoms that are
+              added so that they follow on from those in the system. This can
+              be skipped if the numbers are already known to be unique.
         """
 
+        if type(renumber) is not bool:
+            raise TypeError("'renumber' must be of type 'bool'")
+
         # Whether the molecules are in a Sire container.
         is_sire_container = False
 
@@ -386,12 +421,28 @@ class System(_SireWrapper):
                             ", 'BioSimSpace._SireWrappers.System', or a list of "
                             "'BioSimSpace._SireWrappers.Molecule' types.")
 
+        # Renumber the molecules. These are added as a list, since a Sire
+        # Molecules container doesn't preserve the order of the molecules.
+        if renumber:
+            if type(molecules) is System:
+                molecules = molecules.getMolecules()
+            molecules = self._renumberMolecules(list(molecules))
+            is_sire_container = False
+
+        # Store the current number of molecules.
+        num_molecules = self.nMolecules()
+
         # The system is empty: create a new Sire system from the molecules.
-        if self._sire_object.nMolecules() == 0:
+        if num_molecules == 0:
             self._sire_object = self._createSireSystem(molecules)
+            self._is_shared = False
+            self._version += 1
 
         # Otherwise, add the molecules to the existing "all" group.
         else:
+            # Make sure the Sire system isn't shared before editing.
+            self._detach()
+
             if is_sire_container:
                 if type(molecules) is _Molecules:
                     molecules = molecules._sire_object
@@ -405,11 +456,8 @@ class System(_SireWrapper):
                 for mol in molecules:
                     self._sire_object.add(mol._sire_object, _SireMol.MGName("all"))
 
-        # Reset the index mappings.
-        self._reset_mappings()
-
-        # Update the molecule numbers.
-        self._mol_nums = self._sire_object.molNums()
+        # Update the index mappings for the new molecules.
+        self._append_mappings(num_molecules)
 
     def removeMolecules(self, molecules):
         """Remove a molecule, or list of molecules from the system.
@@ -447,18 +495,20 @@ class System(_SireWrapper):
             raise TypeError("'molecules' must be of type 'BioSimSpace._SireWrappers.Molecule' "
                             "or a list of 'BioSimSpace._SireWrappers.Molecule' types.")
 
+        # Make sure the Sire system isn't shared before editing.
+        self._detach()
+
         # Remove the molecules in the system.
         if is_sire_container:
+            mol_nums = molecules._sire_object.molNums()
             self._sire_object.remove(molecules._sire_object, _SireMol.MGName("all"))
         else:
-            for mol in molecules:
-                self._sire_object.remove(mol._sire_object.number())
-
-        # Reset the index mappings.
-        self._reset_mappings()
+            mol_nums = [mol._sire_object.number() for mol in molecules]
+            for num in mol_nums:
+                self._sire_object.remove(num)
 
-        # Update the molecule numbers.
-        self._mol_nums = self._sire_object.molNums()
+        # Update the index mappings.
+        self._remove_mappings(mol_nums)
 
     def removeWaterMolecules(self):
         """Remove all of the water molecules from the system."""
@@ -466,14 +516,14 @@ class System(_SireWrapper):
         # Get the list of water molecules.
         waters = self.getWaterMolecules()
 
+        # Make sure the Sire system isn't shared before editing.
+        self._detach()
+
         # Remove the molecules in the system.
         self._sire_object.remove(waters._sire_object, _SireMol.MGName("all"))
 
-        # Reset the index mappings.
-        self._reset_mappings()
-
-        # Update the molecule numbers.
-        self._mol_nums = self._sire_object.molNums()
+        # Update the index mappings.
+        self._remove_mappings(waters._sire_object.molNums())
 
     def updateMolecules(self, molecules):
         """Update a molecule, or list of molecules in the system.
@@ -507,18 +557,23 @@ class System(_SireWrapper):
         # TODO: Currently the Sire.System.update method doesn't work correctly
         # for certain changes to the Molecule molInfo object. As such, we remove
         # the old molecule from the system, then add the new one in.
+        self._detach()
+        is_reordered = False
         for mol in molecules:
             try:
                 self._sire_object.update(mol._sire_object)
             except:
                 self._sire_object.remove(mol._sire_object.number())
                 self._sire_object.add(mol._sire_object, _SireMol.MGName("all"))
+                is_reordered = True
 
-        # Reset the index mappings.
-        self._reset_mappings()
-
-        # Update the molecule numbers.
-        self._mol_nums = self._sire_object.molNums()
+        # Update the index mappings. Molecules that were removed and added
+        # back in have moved to the end of the system, so the mappings
+        # must be rebuilt.
+        if is_reordered:
+            self._reset_mappings()
+        else:
+            self._update_mappings([mol._sire_object.number() for mol in molecules])
 
     def getMolecule(self, index):
         """Return the molecule at the given index.
@@ -575,7 +630,7 @@ class System(_SireWrapper):
                A container of water molecule objects.
         """
 
-        return _Molecules(self._sire_object.search("water").toMolecules())
+        return _Molecules(self._search("water").toMolecules())
 
     def nWaterMolecules(self):
         """Return the number of water molecules in the system.
@@ -586,7 +641,7 @@ class System(_SireWrapper):
            num_waters : int
                The number of water molecules in the system.
         """
-        return len(self.getWaterMolecules())
+        return int((self._getMoleculeTypes() == "water").sum())
 
     def getPerturbableMolecules(self):
         """Return a list containing all of the perturbable molecules in the system.
@@ -600,8 +655,8 @@ class System(_SireWrapper):
 
         molecules = []
 
-        for mol in self._sire_object.search("perturbable"):
-            molecules.append(_Molecule(mol))
+        for idx in _np.flatnonzero(self._getMoleculeTypes() == "perturbable"):
+            molecules.append(_Molecule(self._sire_object.molecule(self._mol_nums[idx])))
 
         return molecules
 
@@ -614,7 +669,7 @@ class System(_SireWrapper):
            num_perturbable : int
                The number of perturbable molecules in the system.
         """
-        return len(self.getPerturbableMolecules())
+        return int((self._getMoleculeTypes() == "perturbable").sum())
 
     def search(self, query):
         """Search the system for atoms, residues, and molecules. Search results
@@ -662,21 +717,7 @@ class System(_SireWrapper):
         if type(query) is not str:
             raise TypeError("'query' must be of type 'str'")
 
-        # Intialise a list to hold the search results.
-        results = []
-
-        try:
-            # Query the Sire system.
-            search_result = self._sire_object.search(query)
-
-        except Exception as e:
-            msg = "'Invalid search query: %r" % query
-            if _isVerbose():
-                raise ValueError(msg) from e
-            else:
-                raise ValueError(msg) from None
-
-        return _SearchResult(search_result)
+        return _SearchResult(self._search(query))
 
     def getIndex(self, item):
         """Convert indices of atoms and residues to their absolute values in
@@ -709,22 +750,13 @@ class System(_SireWrapper):
         for x in item:
             # Atom.
             if type(x) is _Atom:
-                # Only compute the atom index mapping if it hasn't already
-                # been created.
-                if len(self._atom_index_tally) == 0:
-                    # Loop over all molecules in the system and keep track
-                    # of the cumulative number of atoms.
-                    num_atoms = 0
-                    for num in self._sire_object.molNums():
-                        self._atom_index_tally[num] = num_atoms
-                        num_atoms += self._sire_object.molecule(num).nAtoms()
-
                 # Get the AtomIdx and MolNum from the Atom.
                 index = x.index()
                 mol_num = x._sire_object.molecule().number()
 
+                # Add the number of atoms in the preceding molecules.
                 try:
-                    index += self._atom_index_tally[mol_num]
+                    index += int(self._getOffsets()[self._molecule_index[mol_num], 0])
                 except KeyError:
                     raise KeyError("The atom belongs to molecule '%s' that is not part of "
                                 "this system!" % mol_num)
@@ -733,22 +765,13 @@ class System(_SireWrapper):
 
             # Residue.
             elif type(x) is _Residue:
-                # Only compute the residue index mapping if it hasn't already
-                # been created.
-                if len(self._residue_index_tally) == 0:
-                    # Loop over all molecules in the system and keep track
-                    # of the cumulative number of residues.
-                    num_residues = 0
-                    for num in self._sire_object.molNums():
-                        self._residue_index_tally[num] = num_residues
-                        num_residues += self._sire_object.molecule(num).nResidues()
-
                 # Get the ResIdx and MolNum from the Residue.
                 index = x.index()
                 mol_num = x._sire_object.molecule().number()
 
+                # Add the number of residues in the preceding molecules.
                 try:
-                    index += self._residue_index_tally[mol_num]
+                    index += int(self._getOffsets()[self._molecule_index[mol_num], 1])
                 except KeyError:
                     raise KeyError("The residue belongs to molecule '%s' that is not part of "
                                 "this system!" % mol_num)
@@ -757,14 +780,6 @@ class System(_SireWrapper):
 
             # Residue.
             elif type(x) is _Molecule:
-                # Only compute the molecule index mapping if it hasn't already
-                # been created.
-                if len(self._molecule_index) == 0:
-                    # Loop over all molecules in the system by index and map
-                    # the MolNum to index.
-                    for idx in range(0, self.nMolecules()):
-                        self._molecule_index[self._sire_object[_SireMol.MolIdx(idx)].number()] = idx
-
                 # Get the MolNum from the molecule.
                 mol_num = x._sire_object.molecule().number()
 
@@ -787,6 +802,123 @@ class System(_SireWrapper):
         else:
             return indices
 
+    def getIndices(self, item):
+        """Return the absolute indices of all of the atoms in a search result,
+           or in a set of atoms, residues, and molecules from this system.
+
+           Parameters
+           ----------
+
+           item : :class:`SearchResult <BioSimSpace._SireWrappers.SearchResult>`, \
+                  :class:`Atom <BioSimSpace._SireWrappers.Atom>`, \
+                  :class:`Residue <BioSimSpace._SireWrappers.Residue>`, \
+                  :class:`Molecule <BioSimSpace._SireWrappers.Molecule>`
+               A search result, or an Atom, Residue, or Molecule object from
+               the System, or a list containing objects of these types.
+
+           Returns
+           -------
+
+           indices : numpy.ndarray
+               The absolute indices of the atoms, in the order that they
+               appear in the item.
+        """
+
+        # Convert single object to list.
+        if type(item) is not tuple and type(item) is not list:
+            item = [item]
+
+        # Extract the Sire views.
+        views = []
+        for x in item:
+            if type(x) is _SearchResult:
+                views.extend(x._sire_object)
+            elif type(x) in [_Atom, _Residue, _Molecule]:
+                views.append(x._sire_object)
+            else:
+                raise TypeError("'item' must be of type 'BioSimSpace._SireWrappers.SearchResult', "
+                                "'BioSimSpace._SireWrappers.Atom', 'BioSimSpace._SireWrappers.Residue', "
+                                "or 'BioSimSpace._SireWrappers.Molecule'")
+
+        offsets = self._getOffsets()[:, 0]
+
+        # Work out the atom indices within each view, then shift them by the
+        # number of atoms in the preceding molecules.
+        indices = []
+        for view in views:
+            mol_num = view.molecule().number()
+
+            try:
+                offset = offsets[self._molecule_index[mol_num]]
+            except KeyError:
+                raise KeyError("The item belongs to molecule '%s' that is not part of "
+                               "this system!" % mol_num)
+
+            if type(view) is _SireMol.Atom:
+                indices.append([offset + view.index().value()])
+            else:
+                selection = view.selection()
+                if selection.selectedAll():
+                    indices.append(_np.arange(offset, offset + view.nAtoms()))
+                else:
+                    indices.append(offset + _np.array([x.value() for x in selection.selectedAtoms()], dtype=int))
+
+        if len(indices) == 0:
+            return _np.array([], dtype=int)
+
+        return _np.concatenate(indices).astype(int)
+
+    def atomFromIndex(self, index):
+        """Convert absolute atom indices to the molecule containing each atom
+           and the index of the atom within that molecule.
+
+           Parameters
+           ----------
+
+           index : int, [int]
+               The absolute index of an atom in the system, or a list of
+               indices.
+
+           Returns
+           -------
+
+           (molecule, index) : (:class:`Molecule <BioSimSpace._SireWrappers.Molecule>`, int), \
+                               [(:class:`Molecule <BioSimSpace._SireWrappers.Molecule>`, int)]
+               The molecule containing the atom and the index of the atom
+               within the molecule, or a list of these for each index.
+        """
+
+        is_single = isinstance(index, (int, _np.integer))
+
+        try:
+            indices = _np.asarray(index).reshape(-1)
+            if len(indices) > 0 and not _np.issubdtype(indices.dtype, _np.integer):
+                raise TypeError
+        except:
+            raise TypeError("'index' must be of type 'int', or a list of 'int' types.")
+
+        offsets = self._getOffsets()[:, 0]
+
+        if len(indices) > 0 and (indices.min() < 0 or indices.max() >= offsets[-1]):
+            raise IndexError("Atom indices must be in range (0 to %d)." % (offsets[-1] - 1))
+
+        # Find the molecule containing each atom using a binary search.
+        mol_idxs = _np.searchsorted(offsets, indices, side="right") - 1
+        local_idxs = indices - offsets[mol_idxs]
+
+        # Only create one Molecule object for each unique molecule.
+        molecules = {}
+        pairs = []
+        for mol_idx, local_idx in zip(mol_idxs.tolist(), local_idxs.tolist()):
+            if mol_idx not in molecules:
+                molecules[mol_idx] = _Molecule(self._sire_object.molecule(self._mol_nums[mol_idx]))
+            pairs.append((molecules[mol_idx], local_idx))
+
+        if is_single:
+            return pairs[0]
+        else:
+            return pairs
+
     def setBox(self, size, property_map={}):
         """Set the size of the periodic simulation box.
 
@@ -821,6 +953,7 @@ class System(_SireWrapper):
         box = _SireVol.PeriodicBox(_SireMaths.Vector(vec))
 
         # Set the "space" property.
+        self._detach()
         self._sire_object.setProperty(property_map.get("space", "space"), box)
 
     def getBox(self, property_map={}):
@@ -851,62 +984,66 @@ class System(_SireWrapper):
 
         return box
 
-    def translate(self, vector, property_map={}):
-        """Translate the system.
+    def getBoxArray(self, property_map={}):
+        """Get the size of the periodic simulation box as an array.
 
            Parameters
            ----------
 
-           vector : [:class:`Length <BioSimSpace.Types.Length>`]
-               The translation vector in Angstroms.
-
            property_map : dict
                A dictionary that maps system "properties" to their user defined
                values. This allows the user to refer to properties with their
                own naming scheme, e.g. { "charge" : "my-charge" }
+
+           Returns
+           -------
+
+           box_size : numpy.ndarray
+               The size of the box in each dimension in Angstrom, or None if
+               the system has no periodic box.
         """
 
-        # Convert tuple to a list.
-        if type(vector) is tuple:
-            vector = list(vector)
+        try:
+            box = self._sire_object.property(property_map.get("space", "space"))
+            return _np.array([x for x in box.dimensions()], dtype=float)
+        except:
+            return None
 
-        # Validate input.
-        if type(vector) is list:
-            vec = []
-            for x in vector:
-                if type(x) is int:
-                    vec.append(float(x))
-                elif type(x) is float:
-                    vec.append(x)
-                elif type(x) is _Length:
-                    vec.append(x.angstroms().magnitude())
-                else:
-                    raise TypeError("'vector' must contain 'int', 'float', or "
-                                    "'BioSimSpace.Types.Length' types only!")
-        else:
-            raise TypeError("'vector' must be of type 'list' or 'tuple'")
+    def setBoxArray(self, box, property_map={}):
+        """Set the size of the periodic simulation box from an array.
 
-        if type(property_map) is not dict:
-            raise TypeError("'property_map' must be of type 'dict'")
+           Parameters
+           ----------
 
-        # Translate each of the molecules in the system.
-        for n in self._sire_object.molNums():
-            # Copy the property map.
-            _property_map = property_map.copy()
+           box : numpy.ndarray
+               The size of the box in each dimension in Angstrom.
 
-            # If this is a perturbable molecule, use the coordinates at lambda = 0.
-            if self._sire_object.molecule(n).hasProperty("is_perturbable"):
-                _property_map["coordinates"] = "coordinates0"
+           property_map : dict
+               A dictionary that maps system "properties" to their user defined
+               values. This allows the user to refer to properties with their
+               own naming scheme, e.g. { "charge" : "my-charge" }
+        """
+
+        try:
+            box = _np.asarray(box, dtype=float)
+        except:
+            raise TypeError("'box' must be of type 'numpy.ndarray'")
 
-            mol = self._sire_object[n].move().translate(_SireMaths.Vector(vec), _property_map).commit()
-            self._sire_object.update(mol)
+        if box.shape != (3,):
+            raise ValueError("'box' must have shape (3,), found %s" % (box.shape,))
 
-    def _getAABox(self, property_map={}):
-        """Get the axis-aligned bounding box for the molecular system.
+        self.setBox([_Length(float(x), "angstrom") for x in box], property_map)
+
+    def getCoordinates(self, selection=None, property_map={}):
+        """Return the coordinates of the atoms in the system.
 
            Parameters
            ----------
 
+           selection : [int]
+               The absolute indices of the atoms of interest. If None, then
+               the coordinates of all atoms are returned.
+
            property_map : dict
                A dictionary that maps system "properties" to their user defined
                values. This allows the user to refer to properties with their
@@ -915,165 +1052,530 @@ class System(_SireWrapper):
            Returns
            -------
 
-           aabox : Sire.Vol.AABox
-               The axis-aligned bounding box for the molecule.
+           coordinates : numpy.ndarray
+               An array of shape (n_atoms, 3) containing the coordinates of
+               each atom in Angstrom.
         """
+        return self._getAtomVectors(_get_coordinates, "coordinates", selection, property_map)
 
-        # Initialise the coordinates vector.
-        coord = []
+    def setCoordinates(self, coordinates, property_map={}):
+        """Set the coordinates of all atoms in the system.
 
-        # Get all of the molecules in the system.
-        mols = self.getMolecules()
-
-        # Loop over all of the molecules.
-        for idx, mol in enumerate(mols):
+           Parameters
+           ----------
 
-            # Extract the atomic coordinates and append them to the vector.
-            try:
-                if "coordinates" in property_map:
-                    prop = property_map["coordinates"]
-                else:
-                    if mol.isMerged():
-                        prop = "coordinates0"
-                    else:
-                        prop = "coordinates"
-                coord.extend(mol._sire_object.property(prop).toVector())
-
-            except UserWarning as e:
-                msg = "Unable to compute the axis-aligned bounding " + \
-                      "box since a molecule has no 'coordinates' property."
-                if _isVerbose():
-                    raise _IncompatibleError(msg) from e
-                else:
-                    raise _IncompatibleError(msg) from None
+           coordinates : numpy.ndarray
+               An array of shape (nAtoms, 3) containing the coordinates of
+               each atom in Angstrom.
 
-        # Return the AABox for the coordinates.
-        return _SireVol.AABox(coord)
+           property_map : dict
+               A dictionary that maps system "properties" to their user defined
+               values. This allows the user to refer to properties with their
+               own naming scheme, e.g. { "charge" : "my-charge" }
+        """
+        self._setAtomVectors(_set_coordinates, "coordinates", coordinates, property_map)
 
-    def _renumberMolecules(self, molecules, is_rebuild=False):
-        """Helper function to renumber the molecules to be consistent with the
-           system.
+    def getVelocities(self, selection=None, property_map={}):
+        """Return the velocities of the atoms in the system.
 
            Parameters
            ----------
 
-           molecules : [:class:`Molecule <BioSimSpace._SireWrappers.Molecule>`]
-               A list of molecule objects.
+           selection : [int]
+               The absolute indices of the atoms of interest. If None, then
+               the velocities of all atoms are returned.
+
+           property_map : dict
+               A dictionary that maps system "properties" to their user defined
+               values. This allows the user to refer to properties with their
+               own naming scheme, e.g. { "charge" : "my-charge" }
 
            Returns
            -------
 
-           molecules : [:class:`Molecule <BioSimSpace._SireWrappers.Molecule>`]
-               The renumber list of molecule objects.
+           velocities : numpy.ndarray
+               An array of shape (n_atoms, 3) containing the velocity of each
+               atom in Angstrom per picosecond, or None if any of the
+               atoms have no velocity.
         """
 
-        # Renumber everything.
-        if is_rebuild:
-            num_molecules = 0
-            num_residues = 0
-            num_atoms = 0
+        # Molecules without velocities raise an IncompatibleError.
+        try:
+            return self._getAtomVectors(_get_velocities, "velocity", selection, property_map)
+        except _IncompatibleError:
+            return None
 
-        # Get the current number of molecules, residues, and atoms.
-        else:
-            num_molecules = self.nMolecules()
-            num_residues = self.nResidues()
-            num_atoms = self.nAtoms()
+    def setVelocities(self, velocities, property_map={}):
+        """Set the velocities of all atoms in the system.
 
-        # Create a list to hold the modified molecules.
-        new_molecules = []
+           Parameters
+           ----------
 
-        # Loop over all of the molecules.
-        for mol in molecules:
+           velocities : numpy.ndarray
+               An array of shape (nAtoms, 3) containing the velocity of each
+               atom in Angstrom per picosecond.
 
-            # Create a copy of the molecule.
-            new_mol = _Molecule(mol)
+           property_map : dict
+               A dictionary that maps system "properties" to their user defined
+               values. This allows the user to refer to properties with their
+               own naming scheme, e.g. { "charge" : "my-charge" }
+        """
+        self._setAtomVectors(_set_velocities, "velocity", velocities, property_map)
 
-            # Get the Sire molecule and make it editable.
-            edit_mol = new_mol._sire_object.edit()
+    def within(self, distance, selection, property_map={}):
+        """Find the atoms within a distance of any atom in a selection. The
+           minimum image convention is used for systems with an orthorhombic
+           periodic box.
 
-            # Renumber the molecule.
-            edit_mol = edit_mol.renumber(_SireMol.MolNum(num_molecules+1)).molecule()
-            num_molecules += 1
+           Parameters
+           ----------
 
-            # A hash mapping between old and new numbers.
-            num_hash = {}
+           distance : :class:`Length <BioSimSpace.Types.Length>`
+               The cutoff distance.
 
-            # Loop over all residues and add them to the hash.
-            for res in edit_mol.residues():
-                num_hash[res.number()] = _SireMol.ResNum(num_residues+1)
-                num_residues += 1
+           selection : str, [int], \
+                       :class:`SearchResult <BioSimSpace._SireWrappers.SearchResult>`, \
+                       :class:`Atom <BioSimSpace._SireWrappers.Atom>`, \
+                       :class:`Residue <BioSimSpace._SireWrappers.Residue>`, \
+                       :class:`Molecule <BioSimSpace._SireWrappers.Molecule>`
+               The selection. This can be a search query, a list of absolute
+               atom indices, or a search result, atom, residue, or molecule
+               from the system, or a list of these.
 
-            # Renumber the residues.
-            edit_mol = edit_mol.renumber(num_hash).molecule()
+           property_map : dict
+               A dictionary that maps system "properties" to their user defined
+               values. This allows the user to refer to properties with their
+               own naming scheme, e.g. { "charge" : "my-charge" }
 
-            # Clear the hash.
-            num_hash = {}
+           Returns
+           -------
 
-            # Loop over all of the atoms and add them to the hash.
-            for atom in edit_mol.atoms():
-                num_hash[atom.number()] = _SireMol.AtomNum(num_atoms+1)
-                num_atoms += 1
+           indices : numpy.ndarray
+               The sorted absolute indices of the atoms within the cutoff,
+               excluding the atoms in the selection.
 
-            # Renumber the atoms.
-            edit_mol = edit_mol.renumber(num_hash).molecule()
+           Examples
+           --------
 
-            # Commit the changes and replace the molecule.
-            new_mol._sire_object = edit_mol.commit()
+           Find the molecules with an atom within 5 Angstrom of a ligand.
 
-            # Append to the list of molecules.
-            new_molecules.append(new_mol)
+           >>> import BioSimSpace as BSS
+           >>> indices = system.within(5*BSS.Units.Length.angstrom, ligand)
+           >>> molecules = set(mol.number() for mol, _ in system.atomFromIndex(indices))
+        """
 
-        # Return the renumbered molecules.
-        return new_molecules
+        cutoff = self._validateCutoff(distance)
+        indices = self._getSelectionIndices(selection)
 
-    def _updateCoordinates(self, system, property_map0={}, property_map1={},
-            is_lambda1=False):
-        """Update the coordinates of atoms in the system.
+        if len(indices) == 0:
+            return _np.array([], dtype=int)
+
+        # Query the spatial index for all of the selected atoms at once.
+        tree = self._getNeighbourIndex(property_map)
+        neighbours = tree.query_ball_point(tree.data[indices], cutoff)
+        neighbours = _np.unique(_np.concatenate([_np.asarray(x, dtype=int) for x in neighbours]))
+
+        return _np.setdiff1d(neighbours, indices, assume_unique=True)
+
+    def neighbours(self, distance, selection=None, property_map={}):
+        """Find the neighbours of each atom in a selection, i.e. the atoms
+           within a distance of it. The minimum image convention is used for
+           systems with an orthorhombic periodic box.
 
            Parameters
            ----------
 
-           system : :class:`System <BioSimSpace._SireWrappers.System>`
-               A system containing the updated coordinates.
+           distance : :class:`Length <BioSimSpace.Types.Length>`
+               The cutoff distance.
 
-           property_map0 : dict
-               A dictionary that maps system "properties" to their user defined
-               values in this system.
+           selection : str, [int], \
+                       :class:`SearchResult <BioSimSpace._SireWrappers.SearchResult>`, \
+                       :class:`Atom <BioSimSpace._SireWrappers.Atom>`, \
+                       :class:`Residue <BioSimSpace._SireWrappers.Residue>`, \
+                       :class:`Molecule <BioSimSpace._SireWrappers.Molecule>`
+               The selection. This can be a search query, a list of absolute
+               atom indices, or a search result, atom, residue, or molecule
+               from the system, or a list of these. If None, then all atoms
+               are used.
 
-           property_map1 : dict
+           property_map : dict
                A dictionary that maps system "properties" to their user defined
-               values in the passed system.
+               values. This allows the user to refer to properties with their
+               own naming scheme, e.g. { "charge" : "my-charge" }
 
-           is_lambda1 : bool
-              Whether to update coordinates of perturbed molecules at lambda = 1.
-              By default, coordinates at lambda = 0 are used.
+           Returns
+           -------
+
+           neighbours : [numpy.ndarray]
+               The sorted absolute indices of the neighbours of each selected
+               atom, excluding the atom itself.
         """
 
-        # Validate the system.
-        if type(system) is not System:
-            raise TypeError("'system' must be of type 'BioSimSpace._SireWrappers.System'")
+        cutoff = self._validateCutoff(distance)
 
-        # Check that the passed system contains the same number of molecules.
-        if self.nMolecules() != system.nMolecules():
-            raise _IncompatibleError("The passed 'system' contains a different number of "
-                                     "molecules. Expected '%d', found '%d'"
-                                     % (self.nMolecules(), system.nMolecules()))
+        tree = self._getNeighbourIndex(property_map)
 
-        # Check that each molecule in the system contains the same number of atoms.
-        for idx in range(0, self.nMolecules()):
-            # Extract the number of atoms in the molecules.
+        if selection is None:
+            indices = _np.arange(tree.n)
+        else:
+            indices = self._getSelectionIndices(selection)
+
+        neighbours = tree.query_ball_point(tree.data[indices], cutoff)
+
+        return [_np.setdiff1d(_np.asarray(x, dtype=int), [idx])
+                    for x, idx in zip(neighbours, indices.tolist())]
+
+    def toSnapshot(self, shared_memory=False, property_map={}):
+        """Create a compact, picklable binary snapshot of the system. This
+           can be sent to worker processes much more cheaply than writing and
+           parsing molecular input files.
+
+           Parameters
+           ----------
+
+           shared_memory : bool
+               Whether to place the coordinates in a shared memory buffer.
+               The buffer can then be read, and updated, by worker processes
+               without pickling the coordinates again.
+
+           property_map : dict
+               A dictionary that maps system "properties" to their user defined
+               values. This allows the user to refer to properties with their
+               own naming scheme, e.g. { "charge" : "my-charge" }
+
+           Returns
+           -------
+
+           snapshot : :class:`Snapshot <BioSimSpace._SireWrappers.Snapshot>`
+               The snapshot of the system.
+        """
+        return _Snapshot(self, shared_memory=shared_memory, property_map=property_map)
+
+    def translate(self, vector, property_map={}):
+        """Translate the system.
+
+           Parameters
+           ----------
+
+           vector : [:class:`Length <BioSimSpace.Types.Length>`]
+               The translation vector in Angstroms.
+
+           property_map : dict
+               A dictionary that maps system "properties" to their user defined
+               values. This allows the user to refer to properties with their
+               own naming scheme, e.g. { "charge" : "my-charge" }
+        """
+
+        # Convert tuple to a list.
+        if type(vector) is tuple:
+            vector = list(vector)
+
+        # Validate input.
+        if type(vector) is list:
+            vec = []
+            for x in vector:
+                if type(x) is int:
+                    vec.append(float(x))
+                elif type(x) is float:
+                    vec.append(x)
+                elif type(x) is _Length:
+                    vec.append(x.angstroms().magnitude())
+                else:
+                    raise TypeError("'vector' must contain 'int', 'float', or "
+                                    "'BioSimSpace.Types.Length' types only!")
+        else:
+            raise TypeError("'vector' must be of type 'list' or 'tuple'")
+
+        if type(property_map) is not dict:
+            raise TypeError("'property_map' must be of type 'dict'")
+
+        vector = _SireMaths.Vector(vec)
+
+        # Translate each of the molecules in the system.
+        molecules = _SireMol.Molecules()
+        for n in self._mol_nums:
+            mol = self._sire_object.molecule(n)
+
+            # If this is a perturbable molecule, use the coordinates at lambda = 0.
+            if mol.hasProperty("is_perturbable"):
+                _property_map = property_map.copy()
+                _property_map["coordinates"] = "coordinates0"
+            else:
+                _property_map = property_map
+
+            molecules.add(mol.move().translate(vector, _property_map).commit())
+
+        # Update all of the molecules in the system at once. Make sure the
+        # Sire system isn't shared before editing.
+        self._detach()
+        self._sire_object.update(molecules)
+
+    def _getAABox(self, property_map={}):
+        """Get the axis-aligned bounding box for the molecular system.
+
+           Parameters
+           ----------
+
+           property_map : dict
+               A dictionary that maps system "properties" to their user defined
+               values. This allows the user to refer to properties with their
+               own naming scheme, e.g. { "charge" : "my-charge" }
+
+           Returns
+           -------
+
+           aabox : Sire.Vol.AABox
+               The axis-aligned bounding box for the molecule.
+        """
+
+        # Extract the coordinates of all atoms in the system.
+        try:
+            coordinates = self.getCoordinates(property_map=property_map)
+        except _IncompatibleError as e:
+            msg = "Unable to compute the axis-aligned bounding " + \
+                  "box since a molecule has no 'coordinates' property."
+            if _isVerbose():
+                raise _IncompatibleError(msg) from e
+            else:
+                raise _IncompatibleError(msg) from None
+
+        if len(coordinates) == 0:
+            return _SireVol.AABox()
+
+        # Work out the box from the minimum and maximum coordinates.
+        coord_min = coordinates.min(axis=0)
+        coord_max = coordinates.max(axis=0)
+
+        # Return the AABox for the coordinates.
+        return _SireVol.AABox(_SireMaths.Vector(*(0.5 * (coord_min + coord_max)).tolist()),
+                              _SireMaths.Vector(*(0.5 * (coord_max - coord_min)).tolist()))
+
+    def _getAtomVectors(self, getter, name, selection=None, property_map={}):
+        """Internal function to get a per-atom vector property of the system
+           as an array.
+
+           Parameters
+           ----------
+
+           getter : function
+               The function used to get the array for a molecule.
+
+           name : str
+               The default name of the property.
+
+           selection : [int]
+               The absolute indices of the atoms of interest. If None, then
+               all atoms are used.
+
+           property_map : dict
+               A dictionary that maps system "properties" to their user defined
+               values.
+
+           Returns
+           -------
+
+           array : numpy.ndarray
+               An array of shape (n_atoms, 3) containing the property values.
+        """
+
+        if type(property_map) is not dict:
+            raise TypeError("'property_map' must be of type 'dict'")
+
+        offsets = self._getOffsets()[:, 0]
+        num_atoms = int(offsets[-1])
+
+        # Work out the molecules that contain the selected atoms.
+        if selection is None:
+            mol_idxs = range(0, len(self._mol_nums))
+        else:
+            try:
+                selection = _np.asarray(selection, dtype=int).reshape(-1)
+            except:
+                raise TypeError("'selection' must be a list of 'int' types.")
+
+            if len(selection) > 0 and (selection.min() < 0 or selection.max() >= num_atoms):
+                raise IndexError("Atom indices must be in range (0 to %d)." % (num_atoms - 1))
+
+            mol_idxs = _np.unique(_np.searchsorted(offsets, selection, side="right") - 1)
+
+        array = _np.zeros((num_atoms, 3))
+
+        # Copy the values for each molecule into the array.
+        for idx in mol_idxs:
+            mol = self._sire_object.molecule(self._mol_nums[idx])
+            prop = _get_property_name(mol, name, property_map)
+            array[offsets[idx]:offsets[idx+1]] = getter(mol, prop)
+
+        if selection is None:
+            return array
+        else:
+            return array[selection]
+
+    def _setAtomVectors(self, setter, name, array, property_map={}):
+        """Internal function to set a per-atom vector property of the system
+           from an array. All of the molecules are updated at once.
+
+           Parameters
+           ----------
+
+           setter : function
+               The function used to set the array for a molecule.
+
+           name : str
+               The default name of the property.
+
+           array : numpy.ndarray
+               An array of shape (nAtoms, 3) containing the property values.
+
+           property_map : dict
+               A dictionary that maps system "properties" to their user defined
+               values.
+        """
+
+        if type(property_map) is not dict:
+            raise TypeError("'property_map' must be of type 'dict'")
+
+        offsets = self._getOffsets()[:, 0]
+        array = _validate_array(array, int(offsets[-1]), name)
+
+        # Create the updated molecules.
+        molecules = _SireMol.Molecules()
+        for idx, num in enumerate(self._mol_nums):
+            mol = self._sire_object.molecule(num)
+            prop = _get_property_name(mol, name, property_map)
+            molecules.add(setter(mol, prop, array[offsets[idx]:offsets[idx+1]]))
+
+        # Update all of the molecules in the system at once.
+        self._detach()
+        self._sire_object.update(molecules)
+
+    def _renumberMolecules(self, molecules, is_rebuild=False):
+        """Helper function to renumber the molecules to be consistent with the
+           system. The new numbers are worked out up front from the size of
+           each molecule, and only the numbers that change are edited.
+
+           Parameters
+           ----------
+
+           molecules : [:class:`Molecule <BioSimSpace._SireWrappers.Molecule>`]
+               A list of molecule objects.
+
+           is_rebuild : bool
+               Whether to number from one, rather than following on from the
+               molecules in the system.
+
+           Returns
+           -------
+
+           molecules : [:class:`Molecule <BioSimSpace._SireWrappers.Molecule>`]
+               The renumber list of molecule objects.
+        """
+
+        # Renumber everything.
+        if is_rebuild:
+            num_molecules = 0
+            num_residues = 0
+            num_atoms = 0
+
+        # Follow on from the existing molecules, residues, and atoms. Molecule
+        # numbers needn't be contiguous, so start after the largest.
+        else:
+            num_molecules = max([num.value() for num in self._mol_nums], default=0)
+            num_residues = self.nResidues()
+            num_atoms = self.nAtoms()
+
+        # Work out the first residue and atom number for each molecule.
+        sizes = _np.array([(mol._sire_object.nResidues(), mol._sire_object.nAtoms())
+                           for mol in molecules], dtype=int).reshape(-1, 2)
+        starts = _np.cumsum(sizes, axis=0) - sizes + [num_residues + 1, num_atoms + 1]
+
+        # Create a list to hold the modified molecules.
+        new_molecules = []
+
+        # Loop over all of the molecules.
+        for idx, (mol, (res_start, atom_start)) in enumerate(zip(molecules, starts.tolist())):
+            sire_mol = mol._sire_object
+            edit_mol = None
+
+            # Renumber the molecule.
+            mol_num = _SireMol.MolNum(num_molecules + idx + 1)
+            if sire_mol.number() != mol_num:
+                edit_mol = sire_mol.edit().renumber(mol_num).molecule()
+
+            # Map the residues and atoms whose numbers change.
+            res_hash = { res.number() : _SireMol.ResNum(res_start + x)
+                         for x, res in enumerate(sire_mol.residues())
+                         if res.number().value() != res_start + x }
+            atom_hash = { atom.number() : _SireMol.AtomNum(atom_start + x)
+                          for x, atom in enumerate(sire_mol.atoms())
+                          if atom.number().value() != atom_start + x }
+
+            if len(res_hash) > 0:
+                edit_mol = (edit_mol or sire_mol.edit()).renumber(res_hash).molecule()
+            if len(atom_hash) > 0:
+                edit_mol = (edit_mol or sire_mol.edit()).renumber(atom_hash).molecule()
+
+            # Commit the changes, if any. The molecule is copied so that the
+            # rest of its state, e.g. the force field, is kept.
+            if edit_mol is None:
+                new_molecules.append(mol)
+            else:
+                new_mol = _Molecule(mol)
+                new_mol._sire_object = edit_mol.commit()
+                new_molecules.append(new_mol)
+
+        # Return the renumbered molecules.
+        return new_molecules
+
+    def _updateCoordinates(self, system, property_map0={}, property_map1={},
+            is_lambda1=False):
+        """Update the coordinates of atoms in the system.
+
+           Parameters
+           ----------
+
+           system : :class:`System <BioSimSpace._SireWrappers.System>`
+               A system containing the updated coordinates.
+
+           property_map0 : dict
+               A dictionary that maps system "properties" to their user defined
+               values in this system.
+
+           property_map1 : dict
+               A dictionary that maps system "properties" to their user defined
+               values in the passed system.
+
+           is_lambda1 : bool
+              Whether to update coordinates of perturbed molecules at lambda = 1.
+              By default, coordinates at lambda = 0 are used.
+        """
+
+        # Validate the system.
+        if type(system) is not System:
+            raise TypeError("'system' must be of type 'BioSimSpace._SireWrappers.System'")
+
+        # Check that the passed system contains the same number of molecules.
+        if self.nMolecules() != system.nMolecules():
+            raise _IncompatibleError("The passed 'system' contains a different number of "
+                                     "molecules. Expected '%d', found '%d'"
+                                     % (self.nMolecules(), system.nMolecules()))
+
+        # Check that each molecule in the system contains the same number of atoms.
+        for idx in range(0, self.nMolecules()):
+            # Extract the number of atoms in the molecules.
             num_atoms0 = self._sire_object.molecule(_SireMol.MolIdx(idx)).nAtoms()
-            num_atoms1 = self._sire_object.molecule(_SireMol.MolIdx(idx)).nAtoms()
+            num_atoms1 = system._sire_object.molecule(_SireMol.MolIdx(idx)).nAtoms()
 
             if num_atoms0 != num_atoms1:
                 raise _IncompatibleError("Mismatch in atom count for molecule '%d': "
-                                         "Expected '%d', found '%d'" % (num_atoms0, num_atoms1))
+                                         "Expected '%d', found '%d'" % (idx, num_atoms0, num_atoms1))
 
         # Work out the name of the "coordinates" property.
         prop0 = property_map0.get("coordinates0", "coordinates")
         prop1 = property_map1.get("coordinates1", "coordinates")
 
-        # Loop over all molecules and update the coordinates.
+        # Create the updated molecules.
+        molecules = _SireMol.Molecules()
         for idx in range(0, self.nMolecules()):
             # Extract the molecules from each system.
             mol0 = self._sire_object.molecule(_SireMol.MolIdx(idx))
@@ -1094,8 +1596,99 @@ class System(_SireWrapper):
             except:
                 raise _IncompatibleError("Unable to update 'coordinates' for molecule index '%d'" % idx)
 
-            # Update the molecule in the original system.
-            self._sire_object.update(mol0)
+            molecules.add(mol0)
+
+        # Update all of the molecules in the original system at once. Make
+        # sure the Sire system isn't shared before editing.
+        self._detach()
+        self._sire_object.update(molecules)
+
+    def _setAmberWater(self, is_warn=False):
+        """Internal function to convert the water molecules in the system to
+           an AMBER compatible topology. The converted system is memoised on
+           the content of the original system and the water model, so that
+           processes created from the same system don't repeat the conversion.
+
+           Parameters
+           ----------
+
+           is_warn : bool
+               Whether to warn if the water model is guessed from the
+               number of atoms in each water molecule.
+
+           Returns
+           -------
+
+           water_model : str
+               The name of the water model. None if the system contains
+               no water molecules.
+        """
+
+        # Get the water molecules.
+        waters = self.getWaterMolecules()
+
+        if len(waters) == 0:
+            return None
+
+        # Try to get the name of the water model.
+        try:
+            water_model = self._sire_object.property("water_model").toString()
+
+        # If the system wasn't solvated by BioSimSpace, e.g. read from file, then
+        # try to guess the water model from the topology.
+        except:
+            num_point = waters[0].nAtoms()
+
+            if num_point == 3:
+                # TODO: Assume TIP3P. Not sure how to detect SPC/E.
+                water_model = "tip3p"
+            elif num_point == 4:
+                water_model = "tip4p"
+            elif num_point == 5:
+                water_model = "tip5p"
+            else:
+                raise RuntimeError("Unsupported %d-point water model!" % num_point)
+
+            if is_warn:
+                # Warn the user that we've guessed the water topology.
+                _warnings.warn("Guessed water topology: %r" % water_model)
+
+        # The version of a Sire system is incremented whenever it is modified,
+        # so the unique identifier and version identify its content.
+        key = (self._sire_object.UID().toString(),
+               self._sire_object.version().toString(),
+               water_model.upper())
+
+        try:
+            system = _amber_water_cache[key]
+
+        except KeyError:
+            # Convert the water molecules.
+            waters = _SireIO.setAmberWater(self._sire_object.search("water"), water_model.upper())
+
+            # Remove the existing water molecules from the system, then add
+            # the converted ones back in.
+            system = System(self._sire_object.__deepcopy__())
+            system.removeWaterMolecules()
+            system.addMolecules(_Molecules(waters.toMolecules()))
+            system = system._sire_object
+
+            # Store the converted system, discarding the oldest entry if the
+            # cache is full.
+            _amber_water_cache[key] = system
+            if len(_amber_water_cache) > _amber_water_cache_size:
+                _amber_water_cache.popitem(last=False)
+
+        # Update the system. The converted system is shared with the cache,
+        # so it will be copied on the first in-place edit.
+        self._sire_object = system
+        self._is_shared = True
+        self._version += 1
+
+        # Reset the index mappings.
+        self._reset_mappings()
+
+        return water_model
 
     @staticmethod
     def _createSireSystem(molecules):
@@ -1133,21 +1726,454 @@ class System(_SireWrapper):
 
         return system
 
+    def _getOffsets(self):
+        """Internal function to get the cumulative number of atoms, residues,
+           and chains preceding each molecule in the system. The index is
+           built on first use, then updated incrementally as molecules are
+           added, removed, or updated.
+
+           Returns
+           -------
+
+           offsets : numpy.ndarray
+               An array of shape (n_molecules + 1, 3) containing the number
+               of atoms, residues, and chains preceding each molecule. The
+               last row contains the totals.
+        """
+
+        if self._offsets is None:
+            self._sizes = self._getMoleculeSizes(self._mol_nums)
+            self._offsets = _offsets(self._sizes)
+
+        return self._offsets
+
+    def _getMoleculeIndex(self, index):
+        """Internal function to get the index of the molecule containing the
+           atom with a given absolute index, using a binary search.
+
+           Parameters
+           ----------
+
+           index : int
+               The absolute index of the atom.
+
+           Returns
+           -------
+
+           mol_idx : int
+               The index of the molecule containing the atom.
+        """
+
+        offsets = self._getOffsets()[:, 0]
+
+        if index < 0 or index >= offsets[-1]:
+            raise IndexError("Atom index '%d' is out of range (0 to %d)." % (index, offsets[-1] - 1))
+
+        return int(_np.searchsorted(offsets, index, side="right")) - 1
+
+    def _getMoleculeSizes(self, mol_nums):
+        """Internal function to get the number of atoms, residues, and chains
+           in each molecule.
+
+           Parameters
+           ----------
+
+           mol_nums : [Sire.Mol.MolNum]
+               The numbers of the molecules.
+
+           Returns
+           -------
+
+           sizes : numpy.ndarray
+               An array of shape (n_molecules, 3) containing the number of
+               atoms, residues, and chains in each molecule.
+        """
+
+        sizes = _np.zeros((len(mol_nums), 3), dtype=_np.int64)
+
+        for idx, num in enumerate(mol_nums):
+            mol = self._sire_object.molecule(num)
+            sizes[idx] = (mol.nAtoms(), mol.nResidues(), mol.nChains())
+
+        return sizes
+
+    def _detach(self):
+        """Make a deep copy of the Sire system if it is shared with another
+           object. This must be called before editing the Sire system in
+           place, so the version of the system is also incremented.
+        """
+        self._version += 1
+        super()._detach()
+
+    def _search(self, query):
+        """Internal function to search the system. The results are cached
+           until the system is next edited.
+
+           Parameters
+           ----------
+
+           query : str
+               The search query.
+
+           Returns
+           -------
+
+           search_result : Sire.Mol.SelectResult
+               The result of the search.
+        """
+
+        try:
+            version, search_result = self._search_cache[query]
+            if version == self._version:
+                return search_result
+        except KeyError:
+            pass
+
+        try:
+            # Query the Sire system.
+            search_result = _select(self._sire_object, query)
+
+        except Exception as e:
+            msg = "'Invalid search query: %r" % query
+            if _isVerbose():
+                raise ValueError(msg) from e
+            else:
+                raise ValueError(msg) from None
+
+        # Remove any results for previous versions of the system, then limit
+        # the size of the cache.
+        self._search_cache = { k : v for k, v in self._search_cache.items()
+                               if v[0] == self._version }
+        if len(self._search_cache) >= _search_cache_size:
+            self._search_cache.pop(next(iter(self._search_cache)))
+
+        self._search_cache[query] = (self._version, search_result)
+
+        return search_result
+
+    def _getNeighbourIndex(self, property_map={}):
+        """Internal function to get a spatial index of the atom coordinates.
+           The index is cached until the system is next edited.
+
+           Parameters
+           ----------
+
+           property_map : dict
+               A dictionary that maps system "properties" to their user defined
+               values.
+
+           Returns
+           -------
+
+           tree : scipy.spatial.cKDTree
+               A KD-tree of the atom coordinates in Angstrom. For periodic
+               systems, the coordinates are wrapped into the box.
+        """
+
+        if type(property_map) is not dict:
+            raise TypeError("'property_map' must be of type 'dict'")
+
+        key = (self._version, tuple(sorted(property_map.items())))
+
+        if self._neighbour_index is not None and self._neighbour_index[0] == key:
+            return self._neighbour_index[1]
+
+        coordinates = self.getCoordinates(property_map=property_map)
+        box = self.getBoxArray(property_map)
+
+        # Wrap the coordinates into the periodic box. Rounding can leave a
+        # coordinate on the upper edge, which is the same as the lower edge.
+        if box is not None:
+            coordinates = coordinates - box * _np.floor(coordinates / box)
+            coordinates[coordinates >= box] = 0
+            tree = _cKDTree(coordinates, boxsize=box)
+        else:
+            tree = _cKDTree(coordinates)
+
+        self._neighbour_index = (key, tree)
+
+        return tree
+
+    def _getSelectionIndices(self, selection):
+        """Internal function to convert a selection to absolute atom indices.
+
+           Parameters
+           ----------
+
+           selection : str, [int], \
+                       :class:`SearchResult <BioSimSpace._SireWrappers.SearchResult>`, \
+                       :class:`Atom <BioSimSpace._SireWrappers.Atom>`, \
+                       :class:`Residue <BioSimSpace._SireWrappers.Residue>`, \
+                       :class:`Molecule <BioSimSpace._SireWrappers.Molecule>`
+               The selection.
+
+           Returns
+           -------
+
+           indices : numpy.ndarray
+               The unique absolute indices of the selected atoms.
+        """
+
+        wrappers = (_SearchResult, _Atom, _Residue, _Molecule)
+
+        # A search query.
+        if type(selection) is str:
+            indices = self.getIndices(self.search(selection))
+
+        # Objects from the system.
+        elif type(selection) in wrappers or \
+            (type(selection) in (list, tuple) and len(selection) > 0 and
+             all(type(x) in wrappers for x in selection)):
+            indices = self.getIndices(selection)
+
+        # Absolute atom indices.
+        else:
+            try:
+                indices = _np.asarray(selection).reshape(-1)
+                if len(indices) > 0 and not _np.issubdtype(indices.dtype, _np.integer):
+                    raise TypeError
+            except:
+                raise TypeError("'selection' must be of type 'str', a list of 'int' types, or "
+                                "'BioSimSpace._SireWrappers' objects from the system.")
+
+            num_atoms = self.nAtoms()
+            if len(indices) > 0 and (indices.min() < 0 or indices.max() >= num_atoms):
+                raise IndexError("Atom indices must be in range (0 to %d)." % (num_atoms - 1))
+
+        return _np.unique(indices).astype(int)
+
+    @staticmethod
+    def _validateCutoff(distance):
+        """Internal function to validate a cutoff distance.
+
+           Parameters
+           ----------
+
+           distance : :class:`Length <BioSimSpace.Types.Length>`
+               The cutoff distance.
+
+           Returns
+           -------
+
+           cutoff : float
+               The cutoff in Angstrom.
+        """
+
+        if type(distance) is not _Length:
+            raise TypeError("'distance' must be of type 'BioSimSpace.Types.Length'")
+
+        cutoff = distance.angstroms().magnitude()
+
+        if cutoff < 0:
+            raise ValueError("'distance' must be positive.")
+
+        return cutoff
+
+    def _getMoleculeTypes(self):
+        """Internal function to return the type of each molecule in the system.
+           The types are computed on first use and are then kept up to date as
+           molecules are added, removed, or updated.
+
+           Returns
+           -------
+
+           mol_types : numpy.ndarray
+               The type of each molecule, in system order. This is one of
+               "water", "ion", "perturbable", "protein", or "other".
+        """
+
+        if self._mol_types is None:
+            self._mol_types = self._classifyMolecules(self._mol_nums)
+
+        return self._mol_types
+
+    def _classifyMolecules(self, mol_nums):
+        """Internal function to classify a set of molecules in the system.
+
+           Parameters
+           ----------
+
+           mol_nums : [Sire.Mol.MolNum]
+               The numbers of the molecules to classify.
+
+           Returns
+           -------
+
+           mol_types : numpy.ndarray
+               The type of each molecule.
+        """
+
+        mol_types = _np.full(len(mol_nums), "other", dtype="U11")
+
+        if len(mol_nums) == 0:
+            return mol_types
+
+        # Find the water molecules with a single search, rather than testing
+        # each molecule in turn. When classifying a subset of the molecules,
+        # only those molecules are searched.
+        try:
+            if len(mol_nums) == len(self._mol_nums):
+                waters = self._search("water")
+            else:
+                container = _SireMol.Molecules()
+                for num in mol_nums:
+                    container.add(self._sire_object.molecule(num))
+                waters = _select(container, "water")
+            waters = set(waters.toMolecules().molNums())
+        except:
+            waters = set()
+
+        # Classify the remaining molecules individually. There are typically
+        # very few of these, so this is cheap.
+        for idx, num in enumerate(mol_nums):
+            if num in waters:
+                mol_types[idx] = "water"
+                continue
+
+            mol = self._sire_object.molecule(num)
+
+            if mol.hasProperty("is_perturbable"):
+                mol_types[idx] = "perturbable"
+            elif mol.nAtoms() == 1:
+                mol_types[idx] = "ion"
+            elif any(res.name().value().upper() in _amino_acids for res in mol.residues()):
+                mol_types[idx] = "protein"
+
+        return mol_types
+
     def _reset_mappings(self):
         """Internal function to reset index mapping dictionaries."""
 
-        # Clear dictionaries.
-        self._molecule_index = {}
-        self._atom_index_tally = {}
-        self._residue_index_tally = {}
+        # Store the molecule numbers and rebuild the MolNum to index mapping.
+        self._mol_nums = self._sire_object.molNums()
+        self._molecule_index = { num : idx for idx, num in enumerate(self._mol_nums) }
 
-        # Rebuild the MolNum to index mapping.
-        for idx in range(0, self.nMolecules()):
-            self._molecule_index[self._sire_object[_SireMol.MolIdx(idx)].number()] = idx
+        # The index of molecule sizes and the molecule types are rebuilt
+        # on demand.
+        self._sizes = None
+        self._offsets = None
+        self._mol_types = None
+
+    def _append_mappings(self, num_molecules):
+        """Internal function to update the index mappings after molecules have
+           been appended to the system.
+
+           Parameters
+           ----------
+
+           num_molecules : int
+               The number of molecules in the system before the new molecules
+               were added.
+        """
+
+        mol_nums = self._sire_object.molNums()
+        new_nums = mol_nums[num_molecules:]
+
+        # The existing molecules have changed, so rebuild the mappings.
+        if len(mol_nums) < num_molecules or any(num in self._molecule_index for num in new_nums):
+            self._reset_mappings()
+            return
+
+        self._mol_nums = mol_nums
+        for idx, num in enumerate(new_nums):
+            self._molecule_index[num] = num_molecules + idx
+
+        # Append the sizes of the new molecules.
+        if self._offsets is not None:
+            sizes = self._getMoleculeSizes(new_nums)
+            self._sizes = _np.concatenate([self._sizes, sizes])
+            self._offsets = _np.concatenate([self._offsets, self._offsets[-1] + _np.cumsum(sizes, axis=0)])
+
+        # Classify the new molecules.
+        if self._mol_types is not None:
+            self._mol_types = _np.concatenate([self._mol_types, self._classifyMolecules(new_nums)])
+
+    def _remove_mappings(self, mol_nums):
+        """Internal function to update the index mappings after molecules have
+           been removed from the system.
+
+           Parameters
+           ----------
+
+           mol_nums : [Sire.Mol.MolNum]
+               The numbers of the molecules that were removed.
+        """
+
+        removed = [self._molecule_index[num] for num in mol_nums if num in self._molecule_index]
+
+        self._mol_nums = self._sire_object.molNums()
+
+        # The remaining molecules don't match, so rebuild the mappings.
+        if len(self._mol_nums) != len(self._molecule_index) - len(set(removed)):
+            self._reset_mappings()
+            return
+
+        self._molecule_index = { num : idx for idx, num in enumerate(self._mol_nums) }
+
+        # Remove the sizes of the molecules.
+        if self._offsets is not None:
+            self._sizes = _np.delete(self._sizes, removed, axis=0)
+            self._offsets = _offsets(self._sizes)
+
+        # Remove the types of the molecules.
+        if self._mol_types is not None:
+            self._mol_types = _np.delete(self._mol_types, removed)
+
+    def _update_mappings(self, mol_nums):
+        """Internal function to update the index mappings after molecules have
+           been updated in place.
+
+           Parameters
+           ----------
+
+           mol_nums : [Sire.Mol.MolNum]
+               The numbers of the molecules that were updated.
+        """
+
+        indices = [self._molecule_index[num] for num in mol_nums]
+
+        # Re-classify the updated molecules.
+        if self._mol_types is not None:
+            self._mol_types[indices] = self._classifyMolecules(mol_nums)
+
+        if self._offsets is None:
+            return
+
+        sizes = self._getMoleculeSizes(mol_nums)
+
+        # Only update the offsets if a molecule has changed size.
+        if (self._sizes[indices] != sizes).any():
+            self._sizes[indices] = sizes
+            self._offsets = _offsets(self._sizes)
+
+def _offsets(sizes):
+    """Internal helper function to compute the cumulative sizes of molecules.
+
+       Parameters
+       ----------
+
+       sizes : numpy.ndarray
+           An array of shape (n_molecules, 3) containing the number of atoms,
+           residues, and chains in each molecule.
+
+       Returns
+       -------
+
+       offsets : numpy.ndarray
+           An array of shape (n_molecules + 1, 3) containing the number of
+           atoms, residues, and chains preceding each molecule.
+    """
+    offsets = _np.zeros((len(sizes) + 1, 3), dtype=_np.int64)
+    _np.cumsum(sizes, axis=0, out=offsets[1:])
+    return offsets
 
 # Import at bottom of module to avoid circular dependency.
 from ._atom import Atom as _Atom
 from ._molecule import Molecule as _Molecule
+from ._molecule import _get_coordinates, _get_property_name, _get_velocities, \
+                       _set_coordinates, _set_velocities, _validate_array
 from ._molecules import Molecules as _Molecules
 from ._residue import Residue as _Residue
 from ._search_result import SearchResult as _SearchResult
+from ._search_result import _select
+from ._snapshot import Snapshot as _Snapshot
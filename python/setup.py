@@ -64,6 +64,7 @@ finally:
                       "pytest",
                       "pyyaml",
                       "rdkit",
+                      "scipy",
                       "watchdog"]
 
         print("Adding conda-forge channel")
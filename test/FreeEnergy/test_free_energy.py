@@ -0,0 +1,110 @@
+import BioSimSpace as BSS
+
+from BioSimSpace.FreeEnergy._free_energy import _parse_exchange_statistics, _replica_exchange_args
+from BioSimSpace.FreeEnergy._network import _cycle_closure
+
+import pytest
+
+# The replica exchange section at the end of a GROMACS log file.
+replex_log = """
+Replica exchange statistics
+Repl  4999 attempts, 2500 odd, 2499 even
+Repl  average probabilities:
+Repl     0    1    2    3
+Repl      .26  .31  .40
+Repl  number of exchanges:
+Repl     0    1    2    3
+Repl      650  775  999
+"""
+
+def test_exchange_statistics(tmp_path):
+    # Parse the average exchange probabilities from a log file.
+    log_file = tmp_path / "gromacs.log"
+    log_file.write_text(replex_log)
+
+    stats = _parse_exchange_statistics(str(log_file), [0.0, 0.25, 0.5, 1.0])
+
+    assert stats == [(0.0, 0.25, 0.26), (0.25, 0.5, 0.31), (0.5, 1.0, 0.40)]
+
+    # There are no statistics for a missing file, or one without an
+    # exchange section.
+    assert _parse_exchange_statistics(str(tmp_path / "missing.log"), [0.0, 1.0]) is None
+
+    log_file.write_text("Finished mdrun\n")
+    assert _parse_exchange_statistics(str(log_file), [0.0, 1.0]) is None
+
+def test_replica_exchange_args():
+    # Launch one MPI rank per window, running all of the window directories
+    # together.
+    args = ["mdrun", "-v", "-deffnm", "gromacs"]
+    work_dirs = ["lambda_0.0000", "lambda_0.5000", "lambda_1.0000"]
+
+    mpi_args = _replica_exchange_args(args, work_dirs, 1000, "gmx_mpi")
+
+    assert mpi_args == ["-np", "3", "gmx_mpi", "mdrun", "-v", "-deffnm", "gromacs",
+                        "-multidir"] + work_dirs + ["-replex", "1000"]
+
+    # The arguments of the window are unchanged.
+    assert args == ["mdrun", "-v", "-deffnm", "gromacs"]
+
+def test_cycle_closure():
+    # A closed cycle where the free energies sum to a known hysteresis.
+    data = { (0, 1) : (1.0, 0.1),
+             (1, 2) : (2.0, 0.2),
+             (0, 2) : (3.5, 0.2) }
+
+    cycles = _cycle_closure(data)
+
+    assert len(cycles) == 1
+
+    cycle, closure, error = cycles[0]
+    assert sorted(cycle) == [0, 1, 2]
+    assert closure.kcal_per_mol().magnitude() == pytest.approx(-0.5)
+    assert error.kcal_per_mol().magnitude() == pytest.approx(0.3)
+
+    # Reversing an edge, and the sign of its free energy, gives the same result.
+    data[(2, 1)] = (-2.0, 0.2)
+    del data[(1, 2)]
+    cycles = _cycle_closure(data)
+    assert len(cycles) == 1
+    assert abs(cycles[0][1].kcal_per_mol().magnitude()) == pytest.approx(0.5)
+
+def test_cycle_closure_independent_cycles():
+    # A tree has no cycles.
+    data = { (0, 1) : (1.0, 0.1),
+             (1, 2) : (1.0, 0.1) }
+    assert _cycle_closure(data) == []
+
+    # A square with a diagonal has two independent cycles, both of which
+    # close exactly.
+    data = { (0, 1) : (1.0, 0.1),
+             (1, 2) : (1.0, 0.1),
+             (2, 3) : (-1.5, 0.1),
+             (3, 0) : (-0.5, 0.1),
+             (0, 2) : (2.0, 0.1) }
+
+    cycles = _cycle_closure(data)
+
+    assert len(cycles) == 2
+    for cycle, closure, error in cycles:
+        assert closure.kcal_per_mol().magnitude() == pytest.approx(0.0)
+
+def test_amber_water():
+    # Load the alanine-dipeptide system. This contains TIP3P water molecules.
+    system = BSS.IO.readMolecules(BSS.IO.glob("test/io/amber/ala/*"))
+
+    system0 = system.copy()
+    system1 = system.copy()
+
+    with pytest.warns(UserWarning):
+        assert system0._setAmberWater(is_warn=True) == "tip3p"
+    assert system1._setAmberWater() == "tip3p"
+
+    # The conversion of the same system is only done once.
+    assert system0._sire_object is system1._sire_object
+    assert system0.nWaterMolecules() == system.nWaterMolecules()
+
+    # Editing one of the converted systems doesn't change the other.
+    system0.removeMolecules(system0[0])
+    assert system0.nMolecules() == system.nMolecules() - 1
+    assert system1.nMolecules() == system.nMolecules()
@@ -0,0 +1,69 @@
+import BioSimSpace as BSS
+
+import pytest
+
+# Glob the input files.
+files = BSS.IO.glob("test/io/amber/ala/*")
+
+# Load the molecular system.
+system = BSS.IO.readMolecules(files)
+
+def create_process(name):
+    """Create a SOMD minimisation process."""
+
+    # Create a short minimisation protocol.
+    protocol = BSS.Protocol.Minimisation(steps=100)
+
+    # Initialise the SOMD process.
+    return BSS.Process.Somd(system, protocol, name=name, platform="CPU")
+
+def test_replace_process():
+    """Test replacing a process in the runner."""
+
+    # Create a runner with two processes.
+    runner = BSS.Process.ProcessRunner([create_process("test0"), create_process("test1")], nest_dirs=False)
+
+    # Replace the second process.
+    process = create_process("test2")
+    runner.replaceProcess(1, process)
+
+    assert runner.nProcesses() == 2
+    assert runner.processes()[1] is process
+
+    # The index must be valid.
+    with pytest.raises(IndexError):
+        runner.replaceProcess(2, create_process("test3"))
+
+    # Only processes can be added.
+    with pytest.raises(TypeError):
+        runner.replaceProcess(0, system)
+
+def test_wait_all():
+    """Test waiting for processes that were started individually."""
+
+    # Create a runner with two processes.
+    runner = BSS.Process.ProcessRunner([create_process("test0"), create_process("test1")], nest_dirs=False)
+
+    # Start the processes, then wait for them to finish.
+    for process in runner.processes():
+        process.start()
+    runner.waitAll()
+
+    assert runner.nRunning() == 0
+    assert runner.nError() == 0
+
+def test_start_all_workers():
+    """Test running processes with a limited number of workers."""
+
+    # Create a runner with three processes.
+    runner = BSS.Process.ProcessRunner([create_process("test%d" % x) for x in range(3)], nest_dirs=False)
+
+    # The number of workers must be valid.
+    with pytest.raises(ValueError):
+        runner.startAll(num_workers=0)
+
+    # Run the processes, two at a time.
+    runner.startAll(num_workers=2)
+
+    assert runner.nRunning() == 0
+    assert runner.nError() == 0
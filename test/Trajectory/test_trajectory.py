@@ -0,0 +1,454 @@
+import BioSimSpace as BSS
+
+from BioSimSpace.Trajectory._cluster import gromos, kMedoids
+
+import mdtraj
+import numpy as np
+import os
+import pytest
+import shutil
+
+# The topology of the alanine-dipeptide system.
+topology = "test/io/amber/ala/ala.top"
+
+# The number of trajectory frames.
+n_frames = 10
+
+# The trajectory formats to test.
+formats = ["xtc", "trr", "dcd", "nc"]
+
+# The AMBER time unit in picoseconds. MDTraj writes DCD headers with a time
+# step of one AKMA unit and a frame interval of one step.
+akma = 0.04888821
+
+# The expected time stamps (ps) for each format.
+times = { "xtc" : 2.0 * np.arange(1, n_frames + 1),
+          "trr" : 2.0 * np.arange(1, n_frames + 1),
+          "nc"  : 2.0 * np.arange(1, n_frames + 1),
+          "dcd" : akma * np.arange(n_frames) }
+
+def _get_coordinates(system):
+    """Get the coordinates of all atoms in a system in Angstrom."""
+    return np.array([[v.x(), v.y(), v.z()] for mol in system.getMolecules()
+        for v in mol._sire_object.property("coordinates").toVector()])
+
+@pytest.fixture(scope="module")
+def reference(tmp_path_factory):
+    # Load the alanine-dipeptide system with MDTraj. This contains an
+    # alanine-dipeptide and 630 water molecules. MDTraj identifies the
+    # format of each file from its extension.
+    tmp_dir = tmp_path_factory.mktemp("reference")
+    shutil.copyfile(topology, str(tmp_dir / "ala.prm7"))
+    shutil.copyfile("test/io/amber/ala/ala.crd", str(tmp_dir / "ala.rst7"))
+    return mdtraj.load(str(tmp_dir / "ala.rst7"), top=str(tmp_dir / "ala.prm7"))
+
+@pytest.fixture(scope="module")
+def coordinates(reference):
+    # Shift the coordinates of each frame by a different amount (nm) so that
+    # the frames can be told apart, and add some noise so that the frames
+    # aren't rigid translations of each other.
+    rng = np.random.RandomState(42)
+    return np.array([reference.xyz[0] + 0.01 * x + 0.02 * rng.standard_normal(reference.xyz[0].shape)
+                     for x in range(n_frames)], dtype="float32")
+
+@pytest.fixture(scope="module")
+def traj_files(tmp_path_factory, reference, coordinates):
+    # Write the trajectory in each format.
+    tmp_dir = tmp_path_factory.mktemp("trajectory")
+
+    traj = mdtraj.Trajectory(coordinates, reference.topology,
+                             time=2.0 * np.arange(1, n_frames + 1),
+                             unitcell_lengths=np.tile(reference.unitcell_lengths[0], (n_frames, 1)),
+                             unitcell_angles=np.full((n_frames, 3), 90.0))
+
+    # PDB files don't support random access, so are streamed.
+    files = {}
+    for format in formats + ["pdb"]:
+        files[format] = str(tmp_dir / ("traj.%s" % format))
+        traj.save(files[format])
+
+    return files
+
+@pytest.fixture(scope="module")
+def cluster_file(tmp_path_factory, reference):
+    # Write a trajectory containing two distinct conformations of the
+    # alanine-dipeptide, each with small fluctuations.
+    rng = np.random.RandomState(7)
+    xyz0 = reference.xyz[0]
+    xyz1 = xyz0.copy()
+    xyz1[:22] += 0.1 * rng.standard_normal((22, 3))
+    xyz = np.array([(xyz0 if x < n_frames // 2 else xyz1) + 0.005 * rng.standard_normal(xyz0.shape)
+                    for x in range(n_frames)], dtype="float32")
+
+    traj = mdtraj.Trajectory(xyz, reference.topology,
+                             unitcell_lengths=np.tile(reference.unitcell_lengths[0], (n_frames, 1)),
+                             unitcell_angles=np.full((n_frames, 3), 90.0))
+
+    file = str(tmp_path_factory.mktemp("cluster") / "traj.dcd")
+    traj.save(file)
+
+    return file
+
+def _first_atom(traj, offset=0.0):
+    """Get the x coordinate of the first atom in each frame of a chunk."""
+    return traj.xyz[:, 0, 0] + offset
+
+@pytest.mark.parametrize("format", formats)
+def test_chunks(traj_files, coordinates, format):
+    # Stream the trajectory in chunks, only reading a subset of atoms.
+    traj = BSS.Trajectory.Trajectory(trajectory=traj_files[format], topology=topology)
+    atoms = np.arange(22, 25)
+
+    chunks = list(traj.iterChunks(chunk=3, atoms=atoms))
+
+    assert [chunk.n_frames for chunk in chunks] == [3, 3, 3, 1]
+    xyz = np.concatenate([chunk.xyz for chunk in chunks])
+    assert np.allclose(xyz, coordinates[:, atoms], atol=1e-3)
+
+@pytest.mark.parametrize("format", formats)
+def test_iter_frames(traj_files, coordinates, format):
+    # Stream every third frame as a System.
+    traj = BSS.Trajectory.Trajectory(trajectory=traj_files[format], topology=topology)
+
+    frames = list(traj.iterFrames(stride=3, chunk=2))
+
+    assert len(frames) == 4
+    for frame, x in zip(frames, [0, 3, 6, 9]):
+        assert frame.nAtoms() == coordinates.shape[1]
+        assert np.allclose(_get_coordinates(frame), 10 * coordinates[x], atol=1e-2)
+
+@pytest.mark.parametrize("format", formats)
+def test_index(traj_files, format):
+    # Make sure that the frame index contains the correct number of frames
+    # and time stamps.
+    index = BSS.Trajectory._index.getIndex(traj_files[format])
+    assert index["n_frames"] == n_frames
+    assert np.allclose(index["times"], times[format])
+
+    traj = BSS.Trajectory.Trajectory(trajectory=traj_files[format], topology=topology)
+    assert traj.nFrames() == n_frames
+    assert np.allclose(traj._getTimes(), times[format])
+
+@pytest.mark.parametrize("format", formats)
+def test_frames(traj_files, coordinates, format):
+    traj = BSS.Trajectory.Trajectory(trajectory=traj_files[format], topology=topology)
+
+    # Read frames by index, including negative and NumPy integer indices.
+    frames = traj.getFrames([0, 3, -1, np.int64(5)])
+
+    assert len(frames) == 4
+    for frame, x in zip(frames, [0, 3, n_frames - 1, 5]):
+        assert frame.nAtoms() == coordinates.shape[1]
+        assert np.allclose(_get_coordinates(frame), 10 * coordinates[x], atol=1e-2)
+
+    with pytest.raises(ValueError):
+        traj.getFrames(n_frames)
+
+@pytest.mark.parametrize("format", ["xtc", "trr"])
+def test_growing(traj_files, coordinates, format, tmp_path, monkeypatch):
+    from BioSimSpace.Trajectory import _index
+
+    # Work out where each frame starts in the complete trajectory.
+    offsets = _index.getIndex(traj_files[format])["offsets"]
+    with open(traj_files[format], "rb") as file:
+        data = file.read()
+
+    # Write the first six frames, as if the trajectory were still running.
+    file = str(tmp_path / ("traj.%s" % format))
+    with open(file, "wb") as f:
+        f.write(data[:offsets[6]])
+
+    traj = BSS.Trajectory.Trajectory(trajectory=file, topology=topology)
+    assert traj.nFrames() == 6
+
+    # The index must now be extended, rather than rebuilt.
+    def build_index(path, format):
+        raise AssertionError("The index was rebuilt.")
+    monkeypatch.setattr(_index, "_build_index", build_index)
+
+    # Append the remaining frames, with the last one only partially written.
+    with open(file, "ab") as f:
+        f.write(data[offsets[6]:-10])
+
+    assert traj.nFrames() == n_frames - 1
+    frames = traj.getFrames([5, n_frames - 2])
+    for frame, x in zip(frames, [5, n_frames - 2]):
+        assert np.allclose(_get_coordinates(frame), 10 * coordinates[x], atol=1e-2)
+
+    # Finish writing the last frame.
+    with open(file, "ab") as f:
+        f.write(data[-10:])
+
+    assert traj.nFrames() == n_frames
+    frame = traj.getFrames(-1)[0]
+    assert np.allclose(_get_coordinates(frame), 10 * coordinates[-1], atol=1e-2)
+
+@pytest.mark.parametrize("format", formats)
+def test_time_stamps(traj_files, coordinates, format):
+    traj = BSS.Trajectory.Trajectory(trajectory=traj_files[format], topology=topology)
+
+    # Find the frame closest to a time stamp.
+    time = times[format][3] + 0.1 * (times[format][4] - times[format][3])
+    frame = traj.getFrames(BSS.Types.Time(time, "picosecond"))[0]
+    assert np.allclose(_get_coordinates(frame), 10 * coordinates[3], atol=1e-2)
+
+    # Find the frames within a time window.
+    start = BSS.Types.Time(times[format][2], "picosecond")
+    end = BSS.Types.Time(times[format][6], "picosecond")
+    assert traj.getFrameIndices(start, end) == [2, 3, 4, 5, 6]
+    assert traj.getFrameIndices() == list(range(n_frames))
+
+@pytest.mark.parametrize("format", ["dcd", "nc"])
+def test_memory_map(traj_files, coordinates, format):
+    # Memory map the coordinates of formats with a fixed frame layout.
+    traj = BSS.Trajectory.Trajectory(trajectory=traj_files[format], topology=topology)
+
+    xyz = traj.getCoordinates()
+
+    assert xyz.shape == (n_frames, coordinates.shape[1], 3)
+    assert np.allclose(xyz[[0, 3, -1]], 10 * coordinates[[0, 3, -1]], atol=1e-3)
+
+def test_memory_map_cache(traj_files, coordinates, tmp_path):
+    from BioSimSpace.Trajectory import _index
+
+    # Copy the trajectory so that it can be modified.
+    file = str(tmp_path / "traj.dcd")
+    shutil.copyfile(traj_files["dcd"], file)
+
+    xyz = _index.memoryMap(file)
+    handle = _index._mmap_cache[file][1]
+
+    # Changing the file replaces the entry and closes the old handle. Arrays
+    # that are still in use remain valid.
+    stat = os.stat(file)
+    os.utime(file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert _index.memoryMap(file) is not xyz
+    assert handle.closed
+    assert np.allclose(xyz[-1], 10 * coordinates[-1], atol=1e-3)
+
+    # The cache is bounded, with the oldest entries evicted first.
+    for x in range(_index._mmap_cache_size):
+        copy = str(tmp_path / ("traj%d.dcd" % x))
+        shutil.copyfile(traj_files["dcd"], copy)
+        _index.memoryMap(copy)
+    assert len(_index._mmap_cache) == _index._mmap_cache_size
+    assert file not in _index._mmap_cache
+
+@pytest.mark.parametrize("format", formats + ["pdb"])
+def test_analyse(traj_files, coordinates, format):
+    traj = BSS.Trajectory.Trajectory(trajectory=traj_files[format], topology=topology)
+
+    # Map a kernel over the chunks. The results are concatenated in frame order.
+    result = traj.analyse(_first_atom, chunk=3, offset=1.0)
+    assert np.allclose(result, coordinates[:, 0, 0] + 1.0, atol=1e-3)
+
+    # Combine the per-chunk results with a custom reduction.
+    assert traj.analyse(_first_atom, chunk=3, reduce=len) == 4
+
+    # The kernel must be callable.
+    with pytest.raises(TypeError):
+        traj.analyse(None)
+
+@pytest.mark.parametrize("format", formats)
+def test_parallel(traj_files, reference, format):
+    # Analysing the chunks in parallel gives the same result as analysing
+    # them in serial.
+    traj = BSS.Trajectory.Trajectory(trajectory=traj_files[format], topology=topology)
+    kernel = BSS.Trajectory._analysis.rmsdKernel
+
+    serial = traj.analyse(kernel, chunk=3, reference=reference)
+    parallel = traj.analyse(kernel, chunk=3, num_workers=2, reference=reference)
+
+    assert len(serial) == n_frames
+    assert np.allclose(serial, parallel)
+
+    assert np.allclose(traj.rmsf(chunk=3), traj.rmsf(chunk=3, num_workers=2))
+
+def test_read_frames(traj_files, coordinates):
+    # Read frames from a trajectory that is streamed from file.
+    traj = BSS.Trajectory.Trajectory(trajectory=traj_files["pdb"], topology=topology)
+
+    frames = traj._readFrames([1, 3, 4])
+    assert np.allclose(frames.xyz, coordinates[[1, 3, 4]], atol=1e-3)
+
+    # Frames that aren't in the file can't be read.
+    with pytest.raises(ValueError):
+        traj._readFrames([n_frames])
+
+@pytest.mark.parametrize("format", formats)
+def test_write(traj_files, coordinates, format, tmp_path):
+    traj = BSS.Trajectory.Trajectory(trajectory=traj_files[format], topology=topology)
+
+    # Write every other frame of the trajectory, keeping all atoms.
+    files = traj.write(str(tmp_path / "all"), format="dcd", stride=2)
+    assert files[0] == str(tmp_path / "all.dcd")
+    assert all(os.path.isfile(file) for file in files)
+
+    written = mdtraj.load(files[0], top=traj_files["pdb"])
+    assert written.n_frames == n_frames // 2
+    assert np.allclose(written.xyz, coordinates[::2], atol=1e-3)
+
+    # Keep an atom subset that splits a water molecule, using a frame window.
+    # The topology can't be written in the original format, so a matching PDB
+    # file is written instead.
+    atoms = list(range(0, 23))
+    files = traj.write(str(tmp_path / "subset"), format="dcd", atoms=atoms,
+                       start=1, end=8, stride=3, topology=True)
+    assert files == [str(tmp_path / "subset.dcd"), str(tmp_path / "subset.pdb")]
+
+    written = mdtraj.load(files[0], top=files[1])
+    assert written.n_atoms == len(atoms)
+    assert written.n_frames == 3
+    assert np.allclose(written.xyz, coordinates[[1, 4, 7]][:, atoms], atol=1e-3)
+
+    # The PDB file matches the first frame that was written.
+    pdb = mdtraj.load(files[1])
+    assert pdb.n_atoms == len(atoms)
+    assert np.allclose(pdb.xyz[0], coordinates[1, atoms], atol=1e-3)
+
+    # The topology isn't written when it isn't requested.
+    files = traj.write(str(tmp_path / "no_top"), format="dcd", atoms=atoms, topology=False)
+    assert files == [str(tmp_path / "no_top.dcd")]
+    assert not os.path.isfile(str(tmp_path / "no_top.pdb"))
+
+    # The input trajectory can't be overwritten.
+    if format == "dcd":
+        with pytest.raises(ValueError):
+            traj.write(os.path.splitext(traj_files[format])[0], format="dcd")
+
+def test_topology_cache(tmp_path):
+    from BioSimSpace.Trajectory import _trajectory
+
+    # Copy the topology so that it can be modified.
+    top_file = str(tmp_path / "ala.prm7")
+    shutil.copyfile(topology, top_file)
+
+    # The topology is only parsed once.
+    info = _trajectory._get_topology_info(top_file)
+    mdtraj_top = _trajectory._get_mdtraj_topology(top_file)
+    assert _trajectory._get_topology_info(top_file) is info
+    assert _trajectory._get_mdtraj_topology(top_file) is mdtraj_top
+
+    # Changing the modification time of the file invalidates the entry.
+    stat = os.stat(top_file)
+    os.utime(top_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert _trajectory._get_topology_info(top_file) is not info
+    assert _trajectory._get_mdtraj_topology(top_file) is not mdtraj_top
+
+    # The cache is bounded, with the oldest entries evicted first.
+    for x in range(_trajectory._topology_cache_size):
+        file = str(tmp_path / ("ala%d.prm7" % x))
+        shutil.copyfile(topology, file)
+        _trajectory._get_topology_info(file)
+    assert len(_trajectory._topology_cache) == _trajectory._topology_cache_size
+    assert os.path.abspath(top_file) not in _trajectory._topology_cache
+
+@pytest.mark.parametrize("format", ["xtc", "dcd"])
+@pytest.mark.parametrize("in_memory", [False, True])
+@pytest.mark.parametrize("num_workers", [1, 2])
+def test_analyses(traj_files, reference, format, in_memory, num_workers):
+    # Compare each analysis to the equivalent MDTraj calculation on the
+    # entire trajectory.
+    traj = BSS.Trajectory.Trajectory(trajectory=traj_files[format], topology=topology)
+    if in_memory:
+        traj._loadTrajectory()
+
+    expected = mdtraj.load(traj_files[format], top=reference.topology)
+
+    # The atoms of the alanine-dipeptide and some nearby waters.
+    atoms = list(range(0, 22))
+    waters = list(range(22, 100))
+
+    kwargs = {"chunk" : 3, "num_workers" : num_workers}
+
+    # RMSD.
+    rmsd = traj.rmsd(frame=0, atoms=atoms, **kwargs)
+    assert np.allclose(rmsd, mdtraj.rmsd(expected, expected, 0, atom_indices=atoms), atol=1e-5)
+
+    # RMSF, about the mean structure after aligning to the first frame.
+    rmsf = traj.rmsf(frame=0, atoms=atoms, **kwargs)
+    aligned = expected.slice(range(n_frames), copy=True).superpose(expected, 0, atom_indices=atoms)
+    xyz = aligned.xyz[:, atoms].astype("float64")
+    assert np.allclose(rmsf, np.sqrt(((xyz - xyz.mean(axis=0))**2).sum(axis=2).mean(axis=0)), atol=1e-5)
+
+    # Distances.
+    distances = traj.distances([0, 1, 2], [22, 23, 24], **kwargs)
+    assert np.allclose(distances, mdtraj.compute_distances(expected, [[0, 22], [1, 23], [2, 24]]), atol=1e-5)
+
+    # Contacts between two selections, and within a selection.
+    cutoff = BSS.Types.Length(4.5, "angstrom")
+    pairs = np.array([[x, y] for x in atoms for y in waters])
+    contacts = traj.contacts(atoms, waters, cutoff=cutoff, **kwargs)
+    assert list(contacts) == list((mdtraj.compute_distances(expected, pairs) < 0.45).sum(axis=1))
+
+    pairs = np.array([[x, y] for x in atoms for y in atoms if x < y])
+    contacts = traj.contacts(atoms, cutoff=cutoff, **kwargs)
+    assert list(contacts) == list((mdtraj.compute_distances(expected, pairs) < 0.45).sum(axis=1))
+
+    # Radius of gyration.
+    masses = np.array([x.element.mass for x in reference.topology.atoms])[atoms]
+    rg = traj.radiusOfGyration(atoms=atoms, **kwargs)
+    assert np.allclose(rg, mdtraj.compute_rg(expected.atom_slice(atoms), masses=masses), atol=1e-5)
+
+    # Hydrogen bonds.
+    hbonds = traj.hbonds(**kwargs)
+    assert len(hbonds) == n_frames
+    for x, y in zip(hbonds, mdtraj.wernet_nilsson(expected)):
+        assert np.array_equal(x, y)
+
+    # Solvent accessible surface area.
+    sasa = traj.sasa(atoms=atoms, **kwargs)
+    assert np.allclose(sasa, mdtraj.shrake_rupley(expected)[:, atoms].sum(axis=1), rtol=1e-4)
+
+def test_kmedoids():
+    # Cluster points on a line, which form three well separated groups.
+    x = np.array([0, 0.1, 0.2, 5, 5.1, 10, 10.2, 10.3, 10.4])
+    distances = np.abs(x[:, None] - x[None, :])
+
+    medoids = kMedoids(distances, 3)
+
+    # The medoid of each group is the member with the smallest total
+    # distance to the others, taking the first member in a tie.
+    assert sorted(medoids) == [1, 3, 6]
+    labels = np.argmin(distances[:, medoids], axis=1)
+    assert len(set(labels[:3])) == 1
+    assert len(set(labels[3:5])) == 1
+    assert len(set(labels[5:])) == 1
+    assert len(set(labels)) == 3
+
+    # The result is deterministic.
+    assert list(kMedoids(distances, 3)) == list(medoids)
+
+    # The number of clusters is limited by the number of frames.
+    assert sorted(kMedoids(distances, 20)) == list(range(len(x)))
+
+def test_gromos():
+    # Cluster the same points using a neighbour cutoff. The largest group is
+    # found first, and ties are broken by taking the first frame.
+    x = np.array([0, 0.1, 0.2, 5, 5.1, 10, 10.2, 10.3, 10.4])
+    distances = np.abs(x[:, None] - x[None, :])
+
+    assert list(gromos(distances, 0.25)) == [6, 0, 3]
+
+    # Each frame is its own cluster if the cutoff is too small.
+    assert sorted(gromos(distances, 0.01)) == list(range(len(x)))
+
+@pytest.mark.parametrize("method, kwargs", [("kmedoids", {"num_clusters" : 2}),
+                                            ("gromos", {"cutoff" : BSS.Types.Length(0.5, "angstrom")})])
+def test_cluster_landmarks(cluster_file, method, kwargs):
+    # Clustering a subset of landmark frames gives the same assignments as
+    # clustering all of the frames.
+    traj = BSS.Trajectory.Trajectory(trajectory=cluster_file, topology=topology)
+    atoms = list(range(0, 22))
+
+    _, exact = traj.cluster(atoms=atoms, method=method, landmarks=n_frames, **kwargs)
+    representatives, labels = traj.cluster(atoms=atoms, method=method, landmarks=4, chunk=3, **kwargs)
+
+    assert labels == exact
+    assert len(representatives) == 2
+
+    # The frames of each conformation are in the same cluster.
+    half = n_frames // 2
+    assert labels[:half] == [labels[0]] * half
+    assert labels[half:] == [labels[-1]] * half
+    assert labels[0] != labels[-1]
@@ -1,6 +1,9 @@
 import BioSimSpace as BSS
 
+import numpy as np
+import pickle
 import pytest
+import sys
 
 # Glob the input files.
 files = BSS.IO.glob("test/io/amber/ala/*")
@@ -97,3 +100,298 @@ def test_molecule_reindexing():
         assert system.getIndex(residue.toMolecule()) == index
 
         index += 1
+
+def test_system_from_molecules():
+    # Create systems from a single molecule, a list of molecules, and a
+    # Molecules container.
+    molecule = system[0]
+    waters = system.getWaterMolecules()
+
+    system0 = BSS._SireWrappers.System(molecule)
+    system1 = molecule.toSystem()
+    system2 = BSS._SireWrappers.System([molecule, waters[0], waters[1]])
+    system3 = BSS._SireWrappers.System(waters)
+
+    assert system0.nMolecules() == system1.nMolecules() == 1
+    assert system0.nAtoms() == system1.nAtoms() == molecule.nAtoms()
+    assert system2.nMolecules() == 3
+    assert system2.nAtoms() == molecule.nAtoms() + 6
+    assert system3.nMolecules() == len(waters)
+    assert system3.nAtoms() == 3 * len(waters)
+
+def test_index_after_edits():
+    # Build a system from a list of molecules, then make sure that the atom
+    # counts and absolute indices stay consistent as it is edited.
+    molecule = system[0]
+    waters = system.getWaterMolecules()
+
+    new_system = BSS._SireWrappers.System([molecule, waters[0]])
+    assert new_system.nAtoms() == molecule.nAtoms() + 3
+
+    # Add a molecule.
+    new_system.addMolecules(waters[1])
+    assert new_system.nMolecules() == 3
+    assert new_system.nAtoms() == molecule.nAtoms() + 6
+    assert new_system.getIndex(new_system[2].getAtoms()[0]) == molecule.nAtoms() + 3
+    assert new_system.getIndex(new_system[2]) == 2
+    assert list(new_system.getIndices(new_system[2])) == [molecule.nAtoms() + x for x in range(3, 6)]
+
+    # Remove the first water molecule. The last water now follows the
+    # alanine-dipeptide.
+    new_system.removeMolecules(new_system[1])
+    assert new_system.nMolecules() == 2
+    assert new_system.nAtoms() == molecule.nAtoms() + 3
+    assert new_system.getIndex(new_system[1].getAtoms()[0]) == molecule.nAtoms()
+    assert new_system.getIndex(new_system[1]) == 1
+    assert list(new_system.getIndices(new_system[1])) == [molecule.nAtoms() + x for x in range(0, 3)]
+
+    # Update a molecule in place.
+    new_system.updateMolecules(new_system[0])
+    assert new_system.nAtoms() == molecule.nAtoms() + 3
+    assert new_system.nResidues() == molecule.nResidues() + 1
+    assert new_system.getIndex(new_system[1].getAtoms()[0]) == molecule.nAtoms()
+    assert list(new_system.getIndices(new_system[0])) == list(range(0, molecule.nAtoms()))
+
+def test_shared_wrappers():
+    # Create two systems that wrap the same Sire system.
+    system0 = system.copy()
+    system1 = BSS._SireWrappers.System(system0)
+
+    num_molecules = system0.nMolecules()
+    num_atoms = system0.nAtoms()
+
+    # Editing one wrapper mustn't change the other.
+    system0.removeMolecules(system0[-1])
+    assert system0.nMolecules() == num_molecules - 1
+    assert system1.nMolecules() == num_molecules
+    assert system1.nAtoms() == num_atoms
+    assert system1._sire_object.nMolecules() == num_molecules
+
+    # The same applies in the other direction.
+    system1.setBox(3 * [BSS.Types.Length(30, "angstrom")])
+    assert system0.getBox() != system1.getBox()
+
+    # Editing the copy mustn't change the original system.
+    system2 = system0.copy()
+    system2.removeMolecules(system2[-1])
+    assert system0.nMolecules() == num_molecules - 1
+    assert system2.nMolecules() == num_molecules - 2
+
+    # The original system is unchanged.
+    assert system.nMolecules() == num_molecules
+
+def test_coordinates():
+    # Make sure that coordinates can be read and written as NumPy arrays.
+    new_system = system.copy()
+
+    coords = new_system.getCoordinates()
+    assert coords.shape == (system.nAtoms(), 3)
+
+    # The system coordinates match those of the individual molecules.
+    assert np.allclose(coords[22:25], new_system[1].getCoordinates())
+
+    # Only the selected atoms are returned, in order.
+    assert np.allclose(new_system.getCoordinates(selection=[23, 0]), coords[[23, 0]])
+
+    # Round-trip a set of modified coordinates.
+    new_coords = coords + 1.5
+    new_system.setCoordinates(new_coords)
+    assert np.allclose(new_system.getCoordinates(), new_coords)
+    assert np.allclose(new_system[1].getCoordinates(), new_coords[22:25])
+
+    # The original system is unchanged.
+    assert np.allclose(system.getCoordinates(), coords)
+
+    # The array must contain a row for each atom.
+    with pytest.raises(ValueError):
+        new_system.setCoordinates(coords[:-1])
+
+    # Round-trip the box.
+    box = new_system.getBoxArray()
+    new_system.setBoxArray(box + 1)
+    assert np.allclose(new_system.getBoxArray(), box + 1)
+
+def test_velocities():
+    # The input files don't contain velocities.
+    new_system = system.copy()
+    assert new_system.getVelocities() is None
+    assert new_system[0].getVelocities() is None
+
+    # Round-trip a set of velocities.
+    rng = np.random.RandomState(42)
+    velocities = rng.standard_normal((system.nAtoms(), 3))
+    new_system.setVelocities(velocities)
+    assert np.allclose(new_system.getVelocities(), velocities)
+    assert np.allclose(new_system[1].getVelocities(), velocities[22:25])
+    assert np.allclose(new_system.getVelocities(selection=[23, 0]), velocities[[23, 0]])
+
+    # The coordinates are unchanged.
+    assert np.allclose(new_system.getCoordinates(), system.getCoordinates())
+
+def test_indices():
+    # Convert a search result to absolute atom indices in one call and make
+    # sure these match the per-atom indices.
+    results = system.search("waters and element oxygen")
+    indices = system.getIndices(results)
+
+    assert len(indices) == 630
+    assert list(indices) == [system.getIndex(atom) for atom in results]
+
+    # The indices of a molecule are contiguous.
+    assert list(system.getIndices(system[1])) == [22, 23, 24]
+    assert list(system.getIndices([system[2], system[0]])) == [25, 26, 27] + list(range(0, 22))
+
+    # Convert the indices back to atoms.
+    molecule, index = system.atomFromIndex(23)
+    assert molecule == system[1]
+    assert index == 1
+
+    pairs = system.atomFromIndex(indices[:2])
+    assert [(mol, idx) for mol, idx in pairs] == [(system[1], 0), (system[2], 0)]
+
+    with pytest.raises(IndexError):
+        system.atomFromIndex(system.nAtoms())
+
+def test_search_cache():
+    # Make sure that cached search results are invalidated when the system
+    # is edited.
+    new_system = BSS._SireWrappers.System(system.getWaterMolecules()[0:3])
+
+    assert new_system.nWaterMolecules() == 3
+    assert len(new_system.search("water")) == 3
+
+    new_system.removeMolecules(new_system[0])
+
+    assert new_system.nWaterMolecules() == 2
+    assert len(new_system.search("water")) == 2
+
+def test_renumber():
+    # Add molecules with renumbering and make sure that the numbers follow
+    # on from those in the system, in the order that the molecules were
+    # passed.
+    waters = system.getWaterMolecules()
+
+    new_system = BSS._SireWrappers.System([waters[0], waters[1]])
+    new_system.addMolecules([waters[3], waters[2]], renumber=True)
+
+    assert new_system.nMolecules() == 4
+
+    # The molecules are added in order.
+    assert new_system[2].getAtoms()[0]._sire_object.number().value() == 7
+    assert new_system[3].getAtoms()[0]._sire_object.number().value() == 10
+
+    # The coordinates of the molecules are unchanged.
+    assert (new_system[2].getCoordinates() == waters[3].getCoordinates()).all()
+    assert (new_system[3].getCoordinates() == waters[2].getCoordinates()).all()
+
+def test_pickle():
+    # Make sure that systems and molecules survive a pickle round-trip.
+    new_system = pickle.loads(pickle.dumps(system))
+
+    assert new_system.nMolecules() == system.nMolecules()
+    assert new_system.nAtoms() == system.nAtoms()
+    assert new_system.nWaterMolecules() == system.nWaterMolecules()
+    assert np.allclose(new_system.getCoordinates(), system.getCoordinates())
+    assert np.allclose(new_system.getBoxArray(), system.getBoxArray())
+
+    # The index is still valid.
+    assert new_system.getIndex(new_system[2].getAtoms()[0]) == 25
+
+    molecule = pickle.loads(pickle.dumps(system[0]))
+    assert molecule.nAtoms() == system[0].nAtoms()
+    assert np.allclose(molecule.getCoordinates(), system[0].getCoordinates())
+
+def test_snapshot():
+    # Restore a system from a pickled snapshot.
+    snapshot = pickle.loads(pickle.dumps(system.toSnapshot()))
+    assert not snapshot.isShared()
+
+    new_system = snapshot.toSystem()
+    assert new_system.nMolecules() == system.nMolecules()
+    assert new_system.nAtoms() == system.nAtoms()
+    assert np.allclose(new_system.getCoordinates(), system.getCoordinates())
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="Requires Python 3.8 or later.")
+def test_snapshot_shared_memory():
+    coords = system.getCoordinates()
+
+    with system.toSnapshot(shared_memory=True) as snapshot:
+        assert snapshot.isShared()
+        assert np.allclose(snapshot.getCoordinates(), coords)
+
+        # The coordinates are only stored in the buffer.
+        data = BSS._SireWrappers._sire_wrapper._deserialise(snapshot._data)
+        assert not BSS._SireWrappers.System(data).getCoordinates().any()
+
+        # A copy of the snapshot attaches to the same buffer, so updates to
+        # the coordinates are seen by both.
+        copy = pickle.loads(pickle.dumps(snapshot))
+        copy.getCoordinates()[0] += 1
+        assert np.allclose(snapshot.getCoordinates()[0], coords[0] + 1)
+        assert np.allclose(snapshot.toSystem().getCoordinates()[0], coords[0] + 1)
+        copy.close()
+
+    # The buffer is released on leaving the context.
+    assert snapshot.getCoordinates() is None
+
+    # The original system is unchanged.
+    assert np.allclose(system.getCoordinates(), coords)
+
+def _min_image_distances(coords, box, indices):
+    """Brute-force minimum image distances from the atoms in 'indices' to
+       all atoms.
+    """
+    delta = coords[:, None, :] - coords[indices][None, :, :]
+    delta -= box * np.round(delta / box)
+    return np.sqrt((delta * delta).sum(axis=2))
+
+def test_within_periodic():
+    # Compare the atoms within a cutoff of the alanine-dipeptide to a brute
+    # force search using the minimum image convention.
+    cutoff = 5
+    coords = system.getCoordinates()
+    box = system.getBoxArray()
+    selection = system.getIndices(system[0])
+
+    dist = _min_image_distances(coords, box, selection).min(axis=1)
+    expected = np.setdiff1d(np.where(dist <= cutoff)[0], selection)
+
+    indices = system.within(BSS.Types.Length(cutoff, "angstrom"), system[0])
+    assert len(indices) > 0
+    assert list(indices) == list(expected)
+
+    # The same atoms are found when selecting by absolute index.
+    assert list(system.within(BSS.Types.Length(cutoff, "angstrom"), list(selection))) == list(expected)
+
+    # Translating the system by a box vector doesn't change the result.
+    new_system = system.copy()
+    new_system.translate([float(box[0]), 0, 0])
+    assert list(new_system.within(BSS.Types.Length(cutoff, "angstrom"), new_system[0])) == list(expected)
+
+    # Atoms are found across the periodic boundary. Move a water so that it
+    # is only close to the alanine-dipeptide through the minimum image.
+    coords = new_system.getCoordinates()
+    idx = new_system.getIndices(new_system[0])[0]
+    water = new_system.getIndices(new_system[1])
+    coords[water] = coords[idx] + [box[0] - 2, 0, 0] + (coords[water] - coords[water[0]])
+    new_system.setCoordinates(coords)
+    assert set(water).issubset(new_system.within(BSS.Types.Length(3.5, "angstrom"), [idx]))
+
+def test_neighbours_periodic():
+    # Compare the neighbours of a set of atoms to a brute force search.
+    cutoff = 4
+    coords = system.getCoordinates()
+    box = system.getBoxArray()
+    selection = [0, 10, 22, 1000, system.nAtoms() - 1]
+
+    dist = _min_image_distances(coords, box, selection)
+    neighbours = system.neighbours(BSS.Types.Length(cutoff, "angstrom"), selection)
+
+    assert len(neighbours) == len(selection)
+    for x, idx in enumerate(selection):
+        expected = np.setdiff1d(np.where(dist[:, x] <= cutoff)[0], [idx])
+        assert list(neighbours[x]) == list(expected)
+
+    # A negative cutoff is invalid.
+    with pytest.raises(ValueError):
+        system.neighbours(BSS.Types.Length(-1, "angstrom"))